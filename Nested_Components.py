@@ -1,41 +1,27 @@
-from langchain.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
-from typing import List, Optional
-
-class UpdatedComponent(BaseModel):
-    """Represents the updated component."""
-    name: str = Field(..., description="The name of the updated component.")
-    html: str = Field(..., description="The updated HTML code.")
-    css: str = Field(..., description="The updated CSS code.")
-    spec_ts: str = Field(..., description="The updated spec.ts file.")
-    ts: str = Field(..., description="The updated TypeScript (.ts) code.")
-
-class ComponentUpdateResult(BaseModel):
-    """
-    Represents the result of updating one or more Angular components.
-    It includes a list of updated components and an optional note on any required page-level integration changes.
-    """
-    updated_components: List[UpdatedComponent] = Field(..., description="A list of updated Angular components.")
-    # associated_page_note: Optional[str] = Field(None, description="Optional note on any page-level integration changes required.")
-
-
-class UpdatedPage(BaseModel):
-    """Represents the updated page."""
-    name: str = Field(..., description="The name of the updated page.")
-    html: str = Field(..., description="The updated HTML code for the page.")
-    css: str = Field(..., description="The updated CSS code for the page.")
-    spec_ts: str = Field(..., description="The updated spec.ts file for the page.")
-    ts: str = Field(..., description="The updated TypeScript (.ts) code for the page.")
-
-# Get the format instructions
-output_parser_1 = PydanticOutputParser(pydantic_object=ComponentUpdateResult)
-output_parser_2 = PydanticOutputParser(pydantic_object=UpdatedPage)
-
-format_instructions_1 = output_parser_1.get_format_instructions()
-format_instructions_2 = output_parser_2.get_format_instructions()
-
-def update_angular_component(html_path, css_path, image_path, lexicon_components, page_name, page_angular_code, page_angular_components, page_angular_components_code, usr_inst):
+from component_diff import materialize_edits, materialize_result_edits, response_format
+from component_interface import page_update_needed
+from llm import encode_image, invoke_structured, read_file
+from schemas import get_format_instructions, get_parser, get_schema, lazy_module_attributes, schema_to_dict
+from tracing import current_span, traced
+
+# Schemas, parsers and format instructions are built on first use (see schemas.py).
+__getattr__ = lazy_module_attributes(__name__, {
+    "UpdatedComponent": (get_schema, "UpdatedComponent"),
+    "ComponentUpdateResult": (get_schema, "ComponentUpdateResult"),
+    "UpdatedPage": (get_schema, "UpdatedPage"),
+    "output_parser_1": (get_parser, "ComponentUpdateResult"),
+    "output_parser_2": (get_parser, "UpdatedPage"),
+    "format_instructions_1": (get_format_instructions, "ComponentUpdateResult"),
+    "format_instructions_2": (get_format_instructions, "UpdatedPage"),
+})
+
+@traced("Nested_Components.update_angular_component")
+def update_angular_component(html_path, css_path, image_path, lexicon_components, page_name, page_angular_code, page_angular_components, page_angular_components_code, usr_inst, response_mode="full", model=None):
     
+    # response_mode="diff" asks for per-file unified diffs instead of full files (see component_diff.py).
+    schema_name, file_rule = response_format("ComponentUpdateResult", response_mode)
+    format_instructions_1 = get_format_instructions(schema_name)
+
     new_html = read_file(html_path)
     new_css = read_file(css_path)
     new_image = encode_image(image_path)
@@ -48,7 +34,7 @@ def update_angular_component(html_path, css_path, image_path, lexicon_components
         - Any dependent sub-components that may also need to be updated as a consequence.
     
         For each component that requires an update, provide updated files: **.ts**, **.html**, **.css**, and **.spec.ts**.  
-        If a file does not require changes, return the existing content as-is.
+        {file_rule}
 
         <<INPUTS>>
 
@@ -78,7 +64,7 @@ def update_angular_component(html_path, css_path, image_path, lexicon_components
 
         # COMPONENT GENERATION
         - Update the `.ts`, `.html`, `.css`, and `.spec.ts` files for the identified component to match the new structure.
-        - **If any file does not require changes**, provide the existing content as-is.
+        - {file_rule}
 
         1. **TypeScript File (.ts)**  
         - Define the component class, decorators, and metadata.  
@@ -126,11 +112,30 @@ def update_angular_component(html_path, css_path, image_path, lexicon_components
         
         <<OUTPUT>>
 """
-## need to get output from model and parse it to json format to send to next invocation of model as input - updated components names, code, note for integration to page 
 
-def update_angular_page(updated_component_result, page_name, page_code, page_angular_components, page_angular_components_code, usr_inst):
-    
+    # Parse the model output so it can be sent to update_angular_page as input - updated components names and code.
+    result = invoke_structured(prompt_step1, schema_name, model, task="component_update")
+    if response_mode == "diff":
+        existing = page_angular_components_code if isinstance(page_angular_components_code, dict) else {}
+        result = materialize_result_edits(result, existing)
+    return result
+
+@traced("Nested_Components.update_angular_page")
+def update_angular_page(updated_component_result, page_name, page_code, page_angular_components, page_angular_components_code, usr_inst, response_mode="full", model=None, skip_unchanged_interface=True):
     
+    # Skip the page call when no updated component's interface (selector, inputs, outputs,
+    # public methods) changed: the existing page still fits (see component_interface.py).
+    if skip_unchanged_interface:
+        result = updated_component_result if isinstance(updated_component_result, dict) else schema_to_dict(updated_component_result)
+        needed, reasons = page_update_needed(result.get("updated_components", []), page_angular_components_code)
+        current_span().set(page_update_needed=needed, reasons=reasons)
+        if not needed:
+            return None
+
+    # Diffs need the existing page files as a dict ({"ts": ..., "html": ..., ...}).
+    page_mode = response_mode if isinstance(page_code, dict) else "full"
+    schema_name, file_rule = response_format("UpdatedPage", page_mode)
+    format_instructions_2 = get_format_instructions(schema_name)
 
     prompt_step2 = f"""
         You are an expert Angular 18+ developer. Your task is to **update an existing Angular page** by integrating the updated component(s) provided.  
@@ -160,7 +165,7 @@ def update_angular_page(updated_component_result, page_name, page_code, page_ang
 
         ## PAGE UPDATING
          Update the `.ts`, `.html`, `.css`, and `.spec.ts` files for the page.
-        - **If any file does not require changes**, provide the existing content as-is.
+        - {file_rule}
 
         ### 1. TYPESCRIPT (.ts) FILE
         - Update the page's class and metadata to reference the updated component.
@@ -204,4 +209,9 @@ def update_angular_page(updated_component_result, page_name, page_code, page_ang
         {format_instructions_2}
 
         <<OUTPUT>>
-        """
\ No newline at end of file
+        """
+
+    updated_page = invoke_structured(prompt_step2, schema_name, model, task="page_update")
+    if page_mode == "diff":
+        updated_page = materialize_edits(updated_page, page_code, "UpdatedPage")
+    return updated_page
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from component_registry import get_registry
+from lexicon_index import narrow_lexicon
+from schemas import schema_to_dict
+
+# === Configuration ===
+DEFAULT_WORKERS = 4
+CHECKPOINT_FILENAME = "checkpoint.jsonl"
+
+# Component/page dict key -> file suffix written to disk.
+FILE_SUFFIXES = {"ts": ".ts", "html": ".html", "css": ".css", "spec_ts": ".spec.ts"}
+
+# === Manifest ===
+def load_manifest(manifest_path: str) -> List[Dict]:
+    """
+    Load a page manifest: a JSON list of page jobs (or {"pages": [...]}).
+
+    Each job has an "id" (defaults to "page_name"), an optional "pipeline"
+    ("testing", "nested", "iterative", "scaffold" or "visual_qa", default "testing") and the pipeline inputs:
+      - keys ending in "_path" (html_path, css_path, image_path, page_image_path)
+        are passed through, resolved relative to the manifest
+      - keys ending in "_file" are loaded from disk and passed under the name without
+        the suffix, e.g. "page_angular_code_file" -> page_angular_code (.json files are parsed)
+      - "angular_root" points at the existing Angular source tree; the code inputs
+        (page_angular_code, page_angular_components, page_angular_components_code,
+        components_json) are then taken from a ComponentRegistry for the page component
+        "page_component" (defaults to page_name) unless given explicitly
+      - anything else (page_name, usr_inst, ...) is passed as-is
+    When the job has both a structured Lexicon catalog and the page's AltNodes
+    ("lexicon_components_file" and "alt_nodes_file"), the catalog is narrowed to the
+    candidates matched per region (see lexicon_index.py) before it reaches the prompt.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    pages = manifest["pages"] if isinstance(manifest, dict) else manifest
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    jobs = []
+    for page in pages:
+        job = dict(page)
+        job.setdefault("id", job.get("page_name"))
+        if not job["id"]:
+            raise Exception(f"Manifest entry without id or page_name: {page}")
+        job.setdefault("pipeline", "testing")
+        for key, value in page.items():
+            if key.endswith("_path") or key.endswith("_file") or key == "angular_root":
+                job[key] = os.path.join(base_dir, value)
+        jobs.append(job)
+    return jobs
+
+def load_job_inputs(job: Dict) -> Dict:
+    """Resolve a manifest job into the keyword inputs of its pipeline."""
+    inputs = {}
+    for key, value in job.items():
+        if key in ("id", "pipeline", "angular_root", "page_component"):
+            continue
+        if key.endswith("_file"):
+            with open(value, "r", encoding="utf-8") as f:
+                inputs[key[:-len("_file")]] = json.load(f) if value.endswith(".json") else f.read()
+        else:
+            inputs[key] = value
+    if "angular_root" in job:
+        registry = get_registry(job["angular_root"])
+        page_component = job.get("page_component", job.get("page_name"))
+        for key, value in registry.page_inputs(page_component).items():
+            inputs.setdefault(key, value)
+    if inputs.get("alt_nodes") and inputs.get("lexicon_components"):
+        inputs["lexicon_components"] = narrow_lexicon(inputs["lexicon_components"], inputs["alt_nodes"])
+    return inputs
+
+# === Pipelines ===
+def run_testing_pipeline(inputs: Dict, response_mode: str = "full", model=None) -> Dict:
+    """update_angular_component -> update_angular_page from testing.py."""
+    import testing
+
+    component = testing.update_angular_component(
+        inputs["html_path"], inputs["css_path"], inputs["image_path"], inputs.get("lexicon_components", ""),
+        inputs["page_name"], inputs["page_image_path"], inputs["page_angular_code"],
+        inputs.get("page_angular_components", []), inputs.get("page_angular_components_code", {}),
+        inputs.get("usr_inst", ""), response_mode=response_mode, model=model,
+    )
+    page = testing.update_angular_page(
+        component.name, schema_to_dict(component), inputs["page_image_path"], inputs["page_name"],
+        inputs["page_angular_code"], inputs.get("page_angular_components", []),
+        inputs.get("page_angular_components_code", {}), inputs.get("usr_inst", ""),
+        response_mode=response_mode, model=model,
+    )
+    # update_angular_page returns None when the component interface is unchanged (page kept as is).
+    return {"updated_components": [schema_to_dict(component)], "updated_page": schema_to_dict(page) if page else None}
+
+def run_nested_pipeline(inputs: Dict, response_mode: str = "full", model=None) -> Dict:
+    """update_angular_component -> update_angular_page from Nested_Components.py."""
+    import Nested_Components
+
+    result = Nested_Components.update_angular_component(
+        inputs["html_path"], inputs["css_path"], inputs["image_path"], inputs.get("lexicon_components", ""),
+        inputs["page_name"], inputs["page_angular_code"], inputs.get("page_angular_components", []),
+        inputs.get("page_angular_components_code", {}), inputs.get("usr_inst", ""),
+        response_mode=response_mode, model=model,
+    )
+    page = Nested_Components.update_angular_page(
+        schema_to_dict(result), inputs["page_name"], inputs["page_angular_code"],
+        inputs.get("page_angular_components", []), inputs.get("page_angular_components_code", {}),
+        inputs.get("usr_inst", ""), response_mode=response_mode, model=model,
+    )
+    return {"updated_components": schema_to_dict(result)["updated_components"],
+            "updated_page": schema_to_dict(page) if page else None}
+
+def run_iterative_pipeline(inputs: Dict, response_mode: str = "full", model=None) -> Dict:
+    """analyze_and_update from iterative_flow_update.py."""
+    import iterative_flow_update
+
+    return iterative_flow_update.analyze_and_update(
+        inputs["html_path"], inputs["css_path"], inputs["image_path"], inputs.get("lexicon_components", ""),
+        inputs["page_name"], inputs["page_angular_code"], inputs.get("components_json", {}),
+        inputs.get("usr_inst", ""), response_mode=response_mode, model=model,
+    )
+
+def run_scaffold_pipeline(inputs: Dict, response_mode: str = "full", model=None) -> Dict:
+    """
+    scaffold_design from scaffold.py: no model calls. Simple top-level frames of
+    "alt_nodes" become components; the rest are listed under "needs_model".
+    """
+    import scaffold
+
+    result = scaffold.scaffold_design(inputs["alt_nodes"], inputs.get("component_map"))
+    return {"updated_components": result["components"], "needs_model": result["needs_model"]}
+
+def run_visual_qa_pipeline(inputs: Dict, response_mode: str = "full", model=None) -> Dict:
+    """
+    visual_qa from visual_qa.py: "design_image_path" (Figma screenshot) against
+    "implementation_image_path" (Angular screenshot), prefiltered locally.
+    """
+    import visual_qa
+
+    return {"visual_qa": visual_qa.visual_qa(inputs["design_image_path"], inputs["implementation_image_path"],
+                                             model=model, prefilter=inputs.get("prefilter", True))}
+
+PIPELINES: Dict[str, Callable] = {
+    "testing": run_testing_pipeline,
+    "nested": run_nested_pipeline,
+    "iterative": run_iterative_pipeline,
+    "scaffold": run_scaffold_pipeline,
+    "visual_qa": run_visual_qa_pipeline,
+}
+
+# === Results & checkpoint ===
+def _write_atomic(path: str, content: str):
+    """Write `content` to `path` via a temporary file so a crash never leaves a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def write_page_result(output_dir: str, page_id: str, result: Dict) -> str:
+    """
+    Write a page result under <output_dir>/<page_id>/:
+      - result.json with everything the pipeline returned
+      - components/<name>/<name>.{ts,html,css,spec.ts} for each updated component
+      - page/<name>.{ts,html,css,spec.ts} for the updated page, unless the page step
+        was skipped (updated_page None: no component interface changed)
+    Returns the page directory.
+    """
+    page_dir = os.path.join(output_dir, page_id)
+    targets = [(os.path.join(page_dir, "components", c["name"]), c) for c in result.get("updated_components", [])]
+    if result.get("updated_page"):
+        targets.append((os.path.join(page_dir, "page"), result["updated_page"]))
+    for directory, files in targets:
+        for key, suffix in FILE_SUFFIXES.items():
+            if key in files:
+                _write_atomic(os.path.join(directory, files["name"] + suffix), files[key])
+    # result.json goes last: its presence means the page is complete on disk.
+    _write_atomic(os.path.join(page_dir, "result.json"), json.dumps(result, indent=4))
+    return page_dir
+
+def load_checkpoint(output_dir: str) -> Dict[str, Dict]:
+    """Return the last checkpoint record per page id (later lines win)."""
+    path = os.path.join(output_dir, CHECKPOINT_FILENAME)
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial last line from a crash.
+            records[record["id"]] = record
+    return records
+
+# === Runner ===
+class BatchRunner:
+    """
+    Runs page jobs through their pipeline with a bounded worker pool.
+
+    Every finished page is written to disk right away and recorded in
+    <output_dir>/checkpoint.jsonl, so a rerun skips the pages that are already done.
+    """
+
+    def __init__(self, output_dir: str, workers: int = DEFAULT_WORKERS, response_mode: str = "full",
+                 model=None, retry_failed: bool = True, pipelines: Optional[Dict[str, Callable]] = None):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.response_mode = response_mode
+        self.model = model
+        self.retry_failed = retry_failed
+        self.pipelines = pipelines or PIPELINES
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _record(self, record: Dict):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(os.path.join(self.output_dir, CHECKPOINT_FILENAME), "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def pending_jobs(self, jobs: List[Dict]) -> List[Dict]:
+        """Drop the jobs that the checkpoint already marks as done (or failed, unless retrying)."""
+        records = load_checkpoint(self.output_dir)
+        skip = {"done"} if self.retry_failed else {"done", "failed"}
+        return [job for job in jobs if records.get(job["id"], {}).get("status") not in skip]
+
+    def run_job(self, job: Dict) -> Dict:
+        """Run a single page job, write its result and checkpoint it. Never raises."""
+        start = time.perf_counter()
+        try:
+            pipeline_name = job.get("pipeline", "testing")
+            if pipeline_name not in self.pipelines:
+                raise Exception(f"Unknown pipeline: {pipeline_name}")
+            pipeline = self.pipelines[pipeline_name]
+            result = pipeline(load_job_inputs(job), response_mode=self.response_mode, model=self.model)
+            write_page_result(self.output_dir, job["id"], result)
+            record = {"id": job["id"], "status": "done"}
+        except Exception as e:
+            record = {"id": job["id"], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        self._record(record)
+        return record
+
+    def run(self, jobs: List[Dict], progress: bool = True) -> Dict:
+        """
+        Run all pending jobs and return a report with counts, elapsed time and pages/hour.
+        """
+        pending = self.pending_jobs(jobs)
+        report = {"total": len(jobs), "skipped": len(jobs) - len(pending), "done": 0, "failed": 0, "errors": {}}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.run_job, job) for job in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                report[record["status"]] += 1
+                if record["status"] == "failed":
+                    report["errors"][record["id"]] = record["error"]
+                if progress:
+                    finished = report["done"] + report["failed"]
+                    print(f"[{finished}/{len(pending)}] {record['id']}: {record['status']} ({record['seconds']}s)")
+        elapsed = time.perf_counter() - start
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["pages_per_hour"] = round(report["done"] / elapsed * 3600, 1) if elapsed > 0 else 0.0
+        return report
+
+# === Main Execution ===
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run page updates for every page in a manifest.")
+    parser.add_argument("manifest", help="Path to the JSON page manifest.")
+    parser.add_argument("--output-dir", default="batch_output", help="Where results and the checkpoint are written.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of pages processed concurrently.")
+    parser.add_argument("--response-mode", choices=["full", "diff"], default="full")
+    parser.add_argument("--no-retry-failed", action="store_true", help="Also skip pages that failed in a previous run.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Estimate calls, tokens, cost and wall time for the pending pages without calling a model.")
+    args = parser.parse_args()
+
+    runner = BatchRunner(args.output_dir, workers=args.workers, response_mode=args.response_mode,
+                         retry_failed=not args.no_retry_failed)
+    if args.dry_run:
+        from dry_run import estimate_pages, format_estimate
+
+        print(format_estimate(estimate_pages(runner.pending_jobs(load_manifest(args.manifest)),
+                                             response_mode=args.response_mode, workers=args.workers)))
+        raise SystemExit(0)
+    report = runner.run(load_manifest(args.manifest))
+    print(f"Done: {report['done']}, failed: {report['failed']}, skipped: {report['skipped']} "
+          f"in {report['elapsed_seconds']}s ({report['pages_per_hour']} pages/hour)")
+    for page_id, error in report["errors"].items():
+        print(f"  {page_id}: {error}")
@@ -0,0 +1,669 @@
+import argparse
+import importlib
+import importlib.util
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+# Test doubles and synthetic inputs live with the tests; benchmarks drive the same ones.
+from tests.fakes import (FakeTierEndpoint, FigmaStubServer, ModelStubServer, synthetic_alt_nodes,
+                         synthetic_angular_corpus, synthetic_component_response, synthetic_figma_document,
+                         synthetic_list_screen, synthetic_screenshot, synthetic_source)
+
+# === Configuration ===
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that CLI invocations and worker processes import on startup.
+PIPELINE_MODULES = ["testing", "Nested_Components", "iterative_flow_update", "id_chunking", "schemas", "main",
+                    "figma_altnodes", "visual_qa", "ingest_server", "model_router",
+                    "dry_run"]
+
+# Modules that must never be pulled in just by importing a pipeline module.
+HEAVY_MODULES = ["langchain", "langchain_openai", "pydantic", "openai", "dotenv", "numpy", "PIL"]
+
+# Stored scaling results, one JSON file per git revision.
+RESULTS_DIR = os.path.join(REPO_DIR, ".benchmarks")
+
+# A stored result counts as regressed when time or peak memory grows by more than this fraction.
+REGRESSION_THRESHOLD = 0.2
+
+# Timing differences below this many milliseconds are treated as noise.
+REGRESSION_MIN_MS = 1.0
+
+# Throughput targets for scaling benchmarks ({bench: minimum per_second}), checked on
+# every run at sizes of at least TARGET_MIN_SIZE, with or without a stored baseline.
+THROUGHPUT_TARGETS = {
+    # 100k+ nodes in well under a second.
+    "figma_altnodes.document_to_altnodes": 100_000,
+}
+
+# Smaller runs are dominated by fixed costs and not held to THROUGHPUT_TARGETS.
+TARGET_MIN_SIZE = 50_000
+
+# === Import time ===
+def measure_import_time(module: str) -> Dict:
+    """
+    Import `module` in a fresh interpreter under `python -X importtime` and
+    parse the report written to stderr.
+
+    Returns a dict with:
+      - module: the module name
+      - cumulative_us: cumulative import time of `module` in microseconds
+      - imported: names of every module that got imported along the way
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(f"Failed to import {module}: {result.stderr.strip().splitlines()[-1]}")
+
+    cumulative_us = 0
+    imported = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <indented name>"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.append(name)
+        if name == module:
+            cumulative_us = int(cumulative)
+    return {"module": module, "cumulative_us": cumulative_us, "imported": imported}
+
+def bench_import_time(modules: List[str] = PIPELINE_MODULES, repeat: int = 5) -> List[Dict]:
+    """
+    Measure the best-of-`repeat` import time for each module. That none of them
+    eagerly imports one of HEAVY_MODULES is asserted in tests/test_imports.py.
+    """
+    results = []
+    for module in modules:
+        runs = [measure_import_time(module) for _ in range(repeat)]
+        results.append({
+            "module": module,
+            "best_ms": min(run["cumulative_us"] for run in runs) / 1000,
+        })
+    return results
+
+# === Structured output parsing ===
+def _best_of(func: Callable, repeat: int) -> float:
+    """Return the best wall time of `repeat` calls to `func`, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_structured_output(sizes_kb: List[int] = [16, 256, 2048], repeat: int = 5) -> List[Dict]:
+    """
+    Time structured_output on synthetic UpdatedComponent responses of increasing size,
+    for both clean and broken output. Validation and the langchain baseline are only
+    measured when pydantic / langchain are installed.
+    """
+    from structured_output import loads_lenient, parse_structured_output
+
+    has_pydantic = importlib.util.find_spec("pydantic") is not None
+    try:
+        from schemas import get_parser
+        get_parser("UpdatedComponent")
+        has_langchain = True
+    except ImportError:
+        has_langchain = False
+
+    results = []
+    for size in sizes_kb:
+        for broken in (False, True):
+            response = synthetic_component_response(size, broken=broken)
+            row = {
+                "size_kb": size,
+                "broken": broken,
+                "decode_ms": _best_of(lambda: loads_lenient(response), repeat) * 1000,
+            }
+            if has_pydantic:
+                row["parse_ms"] = _best_of(lambda: parse_structured_output(response, "UpdatedComponent"), repeat) * 1000
+            if has_langchain:
+                try:
+                    row["langchain_ms"] = _best_of(lambda: get_parser("UpdatedComponent").parse(response), repeat) * 1000
+                except Exception:
+                    row["langchain_ms"] = None  # langchain could not parse it at all
+            results.append(row)
+    return results
+
+# === Rate limiting ===
+def bench_rate_limiter(requests: int = 60, workers: int = 16, tpm: int = 120000, rpm: int = 600) -> List[Dict]:
+    """
+    Fire `requests` prompts of mixed size (a quarter of them duplicates) from `workers`
+    threads at a ModelStubServer, once calling it directly and once through
+    llm.invoke_model and the shared scheduler. That the scheduled run sees no 429s is
+    asserted in tests/test_rate_limiter.py; this reports the timings.
+    """
+    from llm import invoke_model
+    from rate_limiter import configure_scheduler, is_rate_limit_error
+
+    rng = random.Random(0)
+    prompts = [synthetic_source(rng.choice([1, 2, 8, 24]), seed=i) for i in range(requests - requests // 4)]
+    prompts += rng.sample(prompts, requests // 4)
+    rng.shuffle(prompts)
+
+    results = []
+    for mode in ("direct", "scheduled"):
+        endpoint = ModelStubServer(tpm=tpm, rpm=rpm)
+        scheduler = configure_scheduler(tpm=tpm, rpm=rpm, max_concurrency=workers, max_retries=0)
+
+        def call(prompt):
+            try:
+                if mode == "direct":
+                    endpoint.invoke(prompt)
+                else:
+                    invoke_model(prompt, model=endpoint)
+                return True
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                return False
+
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                ok = sum(pool.map(call, prompts))
+        finally:
+            endpoint.close()
+        results.append({
+            "mode": mode,
+            "succeeded": ok,
+            "rate_limited": endpoint.rejected,
+            "endpoint_calls": endpoint.calls,
+            "coalesced": scheduler.stats["coalesced"] if mode == "scheduled" else 0,
+            "seconds": time.perf_counter() - start,
+        })
+    configure_scheduler()
+    return results
+
+# === Model routing ===
+def bench_model_routing(requests: int = 40, workers: int = 8, fast_failure_rate: float = 0.1) -> List[Dict]:
+    """
+    A mixed workload (component lists, component and page updates, upgrade chunks of
+    mixed size) through llm.invoke_structured against two fake tiers, once with every
+    task on the large tier and once routed. Reports wall time, calls per tier and the
+    escalations caused by fast-tier parse failures.
+    """
+    from llm import invoke_structured
+    from model_router import configure_router
+    from rate_limiter import configure_scheduler
+
+    rng = random.Random(0)
+    tasks = ["component_list", "component_update", "page_update", "chunk_upgrade"]
+    workload = [(rng.choice(tasks), synthetic_source(rng.choice([1, 2, 8, 24]), seed=i)) for i in range(requests)]
+
+    results = []
+    for mode in ("single", "routed"):
+        fast = FakeTierEndpoint("fake-fast", 0.02, 0.005, parse_failure_rate=fast_failure_rate)
+        large = FakeTierEndpoint("fake-large", 0.05, 0.02)
+        tiers = None if mode == "routed" else {task: "large" for task in tasks}
+        router = configure_router(models={"fast": fast, "large": large}, task_tiers=tiers)
+        configure_scheduler(tpm=0, rpm=0, max_concurrency=workers)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda item: invoke_structured(item[1], "ComponentUpdateList", task=item[0]), workload))
+        stats = router.stats()
+        results.append({
+            "mode": mode,
+            "seconds": time.perf_counter() - start,
+            "fast_calls": fast.calls,
+            "large_calls": large.calls,
+            "escalations": sum(route["escalations"] for route in stats.values()),
+            "routes": stats,
+        })
+    configure_router()
+    configure_scheduler()
+    return results
+
+# === Figma image export (local stub server) ===
+def bench_image_export(nodes: int = 200, workers: int = 8) -> List[Dict]:
+    """
+    Export `nodes` frame images from a FigmaStubServer: a cold run, a warm run (all
+    cached), and a run after a file version bump with per-node content versions,
+    where only the one changed frame is re-rendered. The request counts are asserted in
+    tests/test_figma.py; this reports the timings.
+    """
+    import shutil
+    import tempfile
+
+    from figma import export_images
+
+    stub = FigmaStubServer()
+    cache_dir = tempfile.mkdtemp(prefix="figma_cache_")
+    node_ids = [f"1:{index}" for index in range(nodes)]
+    content_versions = {node_id: "a" for node_id in node_ids}
+    runs = [
+        ("cold", {}),
+        ("warm", {}),
+        ("content versions, cold", {"versions": content_versions}),
+        ("1 frame changed", {"versions": dict(content_versions, **{node_ids[0]: "b"})}),
+    ]
+    results = []
+    try:
+        for label, kwargs in runs:
+            before = dict(stub.counts)
+            start = time.perf_counter()
+            paths = export_images("FILE", "token", node_ids, cache_dir=cache_dir, workers=workers,
+                                  api_url=stub.url, **kwargs)
+            seconds = time.perf_counter() - start
+            results.append({
+                "run": label,
+                "exported": len(paths),
+                "seconds": seconds,
+                **{f"{kind}_requests": stub.counts.get(kind, 0) - before.get(kind, 0) for kind in stub.counts},
+            })
+    finally:
+        stub.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+# === Tree helpers ===
+def count_nodes(nodes) -> int:
+    """Number of nodes in a tree (a node or a list of nodes)."""
+    stack = list(nodes) if isinstance(nodes, list) else [nodes]
+    total = 0
+    while stack:
+        current = stack.pop()
+        total += 1
+        stack.extend(current.get("children") or [])
+    return total
+
+# === Throughput, memory and scaling ===
+def _peak_memory_kb(func: Callable) -> float:
+    """Peak Python heap allocated while running `func` once, in KB."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def _scaling_rows(name: str, cases: List, run: Callable, size_of: Callable, unit: str, repeat: int) -> List[Dict]:
+    """
+    Time `run(case)` for each case and add throughput, peak memory and the scaling
+    exponent against the previous case (1.0 = linear, 2.0 = quadratic).
+    """
+    rows = []
+    for case in cases:
+        size = size_of(case)
+        seconds = _best_of(lambda: run(case), repeat)
+        row = {
+            "bench": name,
+            "size": size,
+            "unit": unit,
+            "ms": seconds * 1000,
+            "per_second": size / seconds if seconds > 0 else float("inf"),
+            "peak_kb": _peak_memory_kb(lambda: run(case)),
+        }
+        if rows and seconds > 0 and rows[-1]["ms"] > 0:
+            previous = rows[-1]
+            row["scaling"] = math.log(row["ms"] / previous["ms"]) / math.log(size / previous["size"])
+        rows.append(row)
+    return rows
+
+def bench_renderer(depths: List[int] = [3, 4, 5, 6], fanout: int = 4, repeat: int = 3) -> List[Dict]:
+    """build_html_document on synthetic AltNode trees of growing depth."""
+    from main import build_html_document
+
+    cases = [synthetic_alt_nodes(depth=depth, fanout=fanout) for depth in depths]
+    return _scaling_rows("render.build_html_document", cases, build_html_document, count_nodes, "nodes", repeat)
+
+def bench_template_reuse(items: List[int] = [50, 200, 800], repeat: int = 3) -> List[Dict]:
+    """build_html_document on list-heavy screens with and without repeated-subtree templates."""
+    from main import build_html_document
+
+    rows = []
+    for count in items:
+        nodes = synthetic_list_screen(items=count)
+        for reuse in (False, True):
+            seconds = _best_of(lambda: build_html_document(nodes, reuse_templates=reuse), repeat)
+            rows.append({
+                "items": count,
+                "reuse_templates": reuse,
+                "ms": seconds * 1000,
+                "kb": len(build_html_document(nodes, reuse_templates=reuse)) / 1024,
+            })
+    return rows
+
+def bench_minify(depth: int = 5, fanout: int = 4, items: int = 200) -> List[Dict]:
+    """Size of build_html_document's output, pretty-printed and minified, raw and gzipped/brotli'd."""
+    import gzip
+
+    from main import build_html_document
+
+    rows = []
+    for screen, nodes in (("tree", synthetic_alt_nodes(depth=depth, fanout=fanout)),
+                          ("list", synthetic_list_screen(items=items))):
+        for minify in (False, True):
+            data = build_html_document(nodes, minify=minify).encode("utf-8")
+            row = {"screen": screen, "minify": minify, "kb": len(data) / 1024,
+                   "gz_kb": len(gzip.compress(data, compresslevel=9)) / 1024}
+            try:
+                import brotli
+                row["br_kb"] = len(brotli.compress(data, quality=11)) / 1024
+            except ImportError:
+                pass
+            rows.append(row)
+    return rows
+
+def bench_extractor(depths: List[int] = [3, 4, 5, 6], fanout: int = 4, repeat: int = 3) -> List[Dict]:
+    """extract_relevant_metadata on synthetic raw Figma documents of growing depth."""
+    from figma import extract_relevant_metadata
+
+    cases = [synthetic_figma_document(depth=depth, fanout=fanout) for depth in depths]
+    return _scaling_rows("figma.extract_relevant_metadata", cases, extract_relevant_metadata, count_nodes,
+                         "nodes", repeat)
+
+def bench_altnode_convert(pages: List[int] = [1, 2, 5], depth: int = 8, fanout: int = 4,
+                          repeat: int = 3) -> List[Dict]:
+    """document_to_altnodes (Figma REST -> AltNodes) on synthetic documents of growing size."""
+    importlib.import_module("numpy")  # Imported up front so the first timed run does not pay for it.
+    from figma_altnodes import document_to_altnodes
+
+    cases = [synthetic_figma_document(depth=depth, fanout=fanout, pages=count) for count in pages]
+    return _scaling_rows("figma_altnodes.document_to_altnodes", cases, document_to_altnodes, count_nodes,
+                         "nodes", repeat)
+
+def bench_visual_prefilter(pages: int = 20, changed_every: int = 4, seed: int = 0) -> Dict:
+    """
+    visual_qa's local prefilter over `pages` screenshot pairs rendered at twice the
+    design's pixel ratio with a small offset and noise; every `changed_every`-th page
+    has one changed block. Reports model calls avoided and image payload sent to the
+    model, against sending both full screenshots for every page (extrapolated from the
+    first page).
+    """
+    import numpy as np
+
+    from visual_qa import ScreenshotDiff, encode_png
+
+    rng = np.random.default_rng(seed)
+    calls = 0
+    full_bytes = crop_bytes = 0
+    start = time.perf_counter()
+    for page in range(pages):
+        design = synthetic_screenshot(seed=seed + page)
+        implementation = np.full_like(design, 255)
+        implementation[4:, 2:] = design[:-4, :-2]
+        if page % changed_every == 0:
+            y, x = rng.integers(0, design.shape[0] - 80), rng.integers(0, design.shape[1] - 400)
+            implementation[y:y + 40, x:x + 300] = (220, 30, 30)
+        implementation = np.clip(implementation.astype(np.int16) + rng.integers(-4, 5, implementation.shape),
+                                 0, 255).astype(np.uint8)
+        implementation = implementation.repeat(2, axis=0).repeat(2, axis=1)
+        diff = ScreenshotDiff(design, implementation)
+        if page == 0:
+            # Encoding full screenshots dominates the run; the pages are alike, so one pair is measured.
+            full_bytes = (len(encode_png(design)) + len(encode_png(implementation))) * pages
+        if not diff.accurate:
+            calls += 1
+            crop_bytes += sum(len(pair["design"]) + len(pair["implementation"]) for pair in diff.crops())
+    return {"pages": pages, "model_calls": calls, "seconds": time.perf_counter() - start,
+            "full_kb": full_bytes / 1024, "sent_kb": crop_bytes / 1024}
+
+def bench_parallel_extract(pages: int = 8, depth: int = 6, workers: List[int] = [1, 2, 4, 8]) -> List[Dict]:
+    """
+    extract_document_parallel on a `pages`-page document: merged (always serial) and
+    sharded for each worker count (the node-count threshold is disabled so every count
+    really runs in a pool). Speedup is relative to sharding with one worker; every run's
+    output is checked against serial extraction. figma.PARALLEL_MIN_NODES comes from
+    these timings at a few document sizes.
+    """
+    import shutil
+    import tempfile
+
+    from figma import extract_document_parallel, load_shards, project
+
+    document = synthetic_figma_document(depth=depth, fanout=4, pages=pages)
+    nodes = count_nodes(document)
+    expected = project(document, "full")
+    rows = []
+    baseline = None
+    for mode, count in [("sharded", count) for count in workers] + [("merged", 1)]:
+        shard_dir = tempfile.mkdtemp(prefix="shards_") if mode == "sharded" else None
+        try:
+            start = time.perf_counter()
+            result = extract_document_parallel(document, workers=count, shard_dir=shard_dir, min_nodes=0)
+            seconds = time.perf_counter() - start
+            assert (load_shards(result) if shard_dir else result) == expected, \
+                f"{mode} extraction with {count} workers differs from serial extraction"
+        finally:
+            if shard_dir:
+                shutil.rmtree(shard_dir, ignore_errors=True)
+        baseline = baseline or seconds
+        rows.append({"mode": mode, "workers": count, "nodes": nodes, "seconds": seconds,
+                     "speedup": baseline / seconds})
+    return rows
+
+def bench_projections(depth: int = 6, fanout: int = 4, repeat: int = 3) -> List[Dict]:
+    """
+    Each named extraction projection on one synthetic document: time and serialized size,
+    after a hand-written "diff" extractor as the reference the compiled ones should beat.
+    """
+    from figma import PROJECTIONS, projector
+
+    document = synthetic_figma_document(depth=depth, fanout=fanout)
+    diff = PROJECTIONS["diff"]["fields"]
+
+    def handwritten_diff(node):
+        out = {"id": node.get("id"), "name": node.get("name"), "type": node.get("type")}
+        for key, keys in diff.items():
+            if key in node:
+                value = node[key]
+                out[key] = ([{k: item[k] for k in keys if k in item} for item in value] if isinstance(value, list)
+                            else {k: value[k] for k in keys if k in value})
+        if node.get("type") == "TEXT" and "characters" in node:
+            out["characters"] = node["characters"]
+        if "children" in node:
+            out["children"] = [handwritten_diff(child) for child in node["children"]]
+        return out
+
+    seconds = _best_of(lambda: handwritten_diff(document), repeat)
+    rows = [{"projection": "diff (hand-written)", "nodes": count_nodes(document), "ms": seconds * 1000,
+             "kb": len(json.dumps(handwritten_diff(document))) / 1024}]
+    for name in PROJECTIONS:
+        extract = projector(name)
+        seconds = _best_of(lambda: extract(document), repeat)
+        rows.append({"projection": name, "nodes": count_nodes(document), "ms": seconds * 1000,
+                     "kb": len(json.dumps(extract(document))) / 1024})
+    return rows
+
+def bench_chunker(file_counts: List[int] = [10, 40, 160], repeat: int = 3) -> List[Dict]:
+    """chunk_code over synthetic Angular corpora of growing size (throughput in lines)."""
+    from id_chunking import chunk_code
+
+    cases = ["\n".join(synthetic_angular_corpus(files=files).values()) for files in file_counts]
+    return _scaling_rows("id_chunking.chunk_code", cases, chunk_code, lambda code: code.count("\n") + 1,
+                         "lines", repeat)
+
+def bench_dry_run(file_counts: List[int] = [100, 400, 1600]) -> List[Dict]:
+    """dry_run.estimate_project over synthetic Angular trees: it has to stay a matter of seconds."""
+    import shutil
+    import tempfile
+    from dry_run import estimate_project
+
+    rows = []
+    for files in file_counts:
+        src_dir = tempfile.mkdtemp(prefix="dry_run_")
+        try:
+            for rel_path, source in synthetic_angular_corpus(files=files).items():
+                path = os.path.join(src_dir, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(source)
+            start = time.perf_counter()
+            report = estimate_project(src_dir)
+            rows.append({"files": files, "seconds": time.perf_counter() - start, "calls": report["calls"],
+                         "continuations": report["continuations"],
+                         "tokens": report["prompt_tokens"] + report["completion_tokens"],
+                         "tokenizer": report["tokenizer"]})
+        finally:
+            shutil.rmtree(src_dir, ignore_errors=True)
+    return rows
+
+# === Stored results ===
+def git_revision() -> str:
+    """Short hash of HEAD (with a -dirty suffix for uncommitted changes), or "unknown"."""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(rows: List[Dict], results_dir: str = RESULTS_DIR) -> str:
+    """Store benchmark rows as <results_dir>/<revision>.json and return the path."""
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{git_revision()}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"revision": git_revision(), "time": time.time(), "python": sys.version.split()[0],
+                   "results": rows}, f, indent=2)
+    return path
+
+def compare_results(baseline_path: str, rows: List[Dict], threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """
+    Compare `rows` against a stored run. Returns the rows whose time or peak memory
+    grew by more than `threshold` (as a fraction) for the same bench and size;
+    timing differences under REGRESSION_MIN_MS are ignored.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(row["bench"], row["size"]): row for row in json.load(f)["results"]}
+    regressions = []
+    for row in rows:
+        old = baseline.get((row["bench"], row["size"]))
+        if not old:
+            continue
+        for metric in ("ms", "peak_kb"):
+            if metric == "ms" and row[metric] - old[metric] < REGRESSION_MIN_MS:
+                continue
+            if old[metric] > 0 and row[metric] > old[metric] * (1 + threshold):
+                regressions.append({"bench": row["bench"], "size": row["size"], "metric": metric,
+                                    "before": old[metric], "after": row[metric]})
+    return regressions
+
+def missed_targets(rows: List[Dict], targets: Dict[str, float] = THROUGHPUT_TARGETS,
+                   min_size: int = TARGET_MIN_SIZE) -> List[Dict]:
+    """Scaling rows at least `min_size` large that fall short of their throughput target."""
+    return [{"bench": row["bench"], "size": row["size"], "per_second": row["per_second"],
+             "target": targets[row["bench"]]}
+            for row in rows
+            if row["bench"] in targets and row["size"] >= min_size and row["per_second"] < targets[row["bench"]]]
+
+# === Main Execution ===
+if __name__ == '__main__':
+    suites = ["import", "structured", "rate", "routing", "images", "render", "reuse", "minify", "extract", "projection", "parallel", "altnodes", "visual", "chunk", "dryrun"]
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmarks.")
+    parser.add_argument("--only", nargs="+", choices=suites, default=suites, help="Suites to run (default: all).")
+    parser.add_argument("--save", action="store_true", help=f"Store scaling results under {RESULTS_DIR}.")
+    parser.add_argument("--compare", help="Stored results file to check the scaling results against.")
+    args = parser.parse_args()
+
+    failed = False
+    if "import" in args.only:
+        print("== import time ==")
+        for row in bench_import_time():
+            print(f"{row['module']:<24} {row['best_ms']:>8.2f} ms")
+
+    if "structured" in args.only:
+        print("== structured output ==")
+        for row in bench_structured_output():
+            extra = "".join(
+                f"  {key}={value:.2f}" if value is not None else f"  {key}=failed"
+                for key, value in row.items() if key in ("parse_ms", "langchain_ms")
+            )
+            print(f"{row['size_kb']:>6} KB  broken={row['broken']!s:<5}  decode_ms={row['decode_ms']:.2f}{extra}")
+
+    if "rate" in args.only:
+        print("== rate limiting (local model stub) ==")
+        for row in bench_rate_limiter():
+            print(f"{row['mode']:<10} ok={row['succeeded']:<4} 429s={row['rate_limited']:<4} "
+                  f"endpoint_calls={row['endpoint_calls']:<4} coalesced={row['coalesced']:<4} {row['seconds']:.2f}s")
+
+    if "routing" in args.only:
+        from model_router import format_stats
+
+        print("== model routing (fake tiers) ==")
+        for row in bench_model_routing():
+            print(f"{row['mode']:<7} {row['seconds']:.2f}s  fast_calls={row['fast_calls']} "
+                  f"large_calls={row['large_calls']} escalations={row['escalations']}")
+            print(format_stats(row["routes"]))
+
+    if "images" in args.only:
+        print("== image export (stub server) ==")
+        for row in bench_image_export():
+            print(f"{row['run']:<24} exported={row['exported']:<4} {row['seconds']:>6.2f}s  "
+                  f"files={row['files_requests']} images={row['images_requests']} renders={row['renders_requests']}")
+
+    if "projection" in args.only:
+        print("== extraction projections ==")
+        for row in bench_projections():
+            print(f"{row['projection']:<10} {row['nodes']} nodes  {row['ms']:>8.2f} ms {row['kb']:>9.1f} KB")
+
+    if "visual" in args.only:
+        print("== visual QA prefilter (synthetic screenshots) ==")
+        row = bench_visual_prefilter()
+        print(f"{row['pages']} pages  model_calls={row['model_calls']}  {row['seconds']:.2f}s  "
+              f"payload {row['full_kb']:.0f} KB -> {row['sent_kb']:.0f} KB")
+
+    if "parallel" in args.only:
+        print(f"== parallel extraction by page ({os.cpu_count()} CPUs) ==")
+        for row in bench_parallel_extract():
+            print(f"{row['mode']:<8} workers={row['workers']:<3} {row['nodes']} nodes  "
+                  f"{row['seconds']:>7.3f}s  speedup={row['speedup']:.2f}x")
+
+    if "reuse" in args.only:
+        print("== template reuse (list screens) ==")
+        for row in bench_template_reuse():
+            print(f"{row['items']:>6} items  reuse={row['reuse_templates']!s:<5} {row['ms']:>9.2f} ms {row['kb']:>9.1f} KB")
+
+    if "minify" in args.only:
+        print("== minified output ==")
+        for row in bench_minify():
+            br = f" br={row['br_kb']:.1f} KB" if "br_kb" in row else ""
+            print(f"{row['screen']:<6} minify={row['minify']!s:<5} {row['kb']:>9.1f} KB  gz={row['gz_kb']:.1f} KB{br}")
+
+    if "dryrun" in args.only:
+        print("== dry-run estimate (synthetic projects) ==")
+        for row in bench_dry_run():
+            print(f"{row['files']:>6} files  {row['seconds']:>6.2f}s  calls={row['calls']} "
+                  f"continuations={row['continuations']} tokens={row['tokens']} [{row['tokenizer']}]")
+
+    scaling = []
+    for suite, bench in (("render", bench_renderer), ("extract", bench_extractor),
+                         ("altnodes", bench_altnode_convert), ("chunk", bench_chunker)):
+        if suite in args.only:
+            scaling += bench()
+    if scaling:
+        print("== scaling ==")
+        for row in scaling:
+            exponent = f"  scaling={row['scaling']:.2f}" if "scaling" in row else ""
+            print(f"{row['bench']:<32} {row['size']:>8} {row['unit']:<6} {row['ms']:>9.2f} ms "
+                  f"{row['per_second']:>12.0f}/s  peak={row['peak_kb']:>9.0f} KB{exponent}")
+        for miss in missed_targets(scaling):
+            print(f"TARGET MISSED {miss['bench']} size={miss['size']}: "
+                  f"{miss['per_second']:.0f}/s < {miss['target']:.0f}/s")
+            failed = True
+        if args.save:
+            print(f"Saved {save_results(scaling)}")
+        if args.compare:
+            regressions = compare_results(args.compare, scaling)
+            for reg in regressions:
+                print(f"REGRESSION {reg['bench']} size={reg['size']} {reg['metric']}: "
+                      f"{reg['before']:.2f} -> {reg['after']:.2f}")
+            failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
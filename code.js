@@ -171,7 +171,11 @@ figma.ui.onmessage = (msg) => __awaiter(void 0, void 0, void 0, function* () {
             // Build AltNodes from each selected node.
             const altNodes = [];
             for (const node of selection) {
-                altNodes.push(yield createAltNode(node));
+                const altNode = yield createAltNode(node);
+                altNodes.push(altNode);
+                // Stream each AltNode as soon as it is built (the UI forwards it to the
+                // local ingest server when live preview is on).
+                figma.ui.postMessage({ type: "alt-node-batch", altNodes: [altNode], first: altNodes.length === 1 });
             }
             // Send the AltNode JSON back to the UI with a distinct message type.
             figma.ui.postMessage({ type: "display-alt-nodes", altNodes });
@@ -251,7 +251,11 @@ figma.ui.onmessage = async (msg) => {
       
       const altNodes: AltNode[] = [];
       for (const node of selection) {
-        altNodes.push(await createAltNode(node));
+        const altNode = await createAltNode(node);
+        altNodes.push(altNode);
+        // Stream each AltNode as soon as it is built (the UI forwards it to the
+        // local ingest server when live preview is on).
+        figma.ui.postMessage({ type: "alt-node-batch", altNodes: [altNode], first: altNodes.length === 1 });
       }
       
       figma.ui.postMessage({ type: "display-alt-nodes", altNodes });
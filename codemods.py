@@ -0,0 +1,421 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# === Rule-based Angular 7 -> 15 codemods ===
+# Deterministic rewrites for the mechanical parts of the upgrade, applied before
+# anything is sent to the model. Each transform takes the source text and returns
+# (new text, number of rewrites). UNSUPPORTED_PATTERNS lists what still needs the model.
+
+# --- @angular/http -> @angular/common/http ---
+HTTP_RENAMES = {"HttpModule": "HttpClientModule", "Http": "HttpClient", "Headers": "HttpHeaders"}
+
+_HTTP_IMPORT = re.compile(r"import\s*\{([^}]*)\}\s*from\s*['\"]@angular/http['\"];?")
+
+
+def migrate_http_module(code: str) -> Tuple[str, int]:
+    """
+    HttpModule -> HttpClientModule, Http -> HttpClient, Headers -> HttpHeaders.
+    Only runs when every name imported from '@angular/http' has a direct replacement.
+    """
+    match = _HTTP_IMPORT.search(code)
+    if not match:
+        return code, 0
+    names = [name.strip() for name in match.group(1).split(",") if name.strip()]
+    if not names or any(name not in HTTP_RENAMES for name in names):
+        return code, 0
+    new_names = ", ".join(HTTP_RENAMES[name] for name in names)
+    code = code[:match.start()] + f"import {{ {new_names} }} from '@angular/common/http';" + code[match.end():]
+    count = 1
+    for old, new in HTTP_RENAMES.items():
+        if old in names:
+            # \b keeps "Http" from matching inside "HttpClient"; quotes and dots keep strings and members intact.
+            code, n = re.subn(rf"(?<![\w.'\"]){old}\b(?!['\"])", new, code)
+            count += n
+    return code, count
+
+
+# --- RxJS 5 patch operators -> pipeable operators ---
+OPERATOR_RENAMES = {"do": "tap", "catch": "catchError", "switch": "switchAll", "finally": "finalize"}
+
+# A chain is only converted when its receiver is provably an Observable (see
+# _is_observable): operator names like map, filter, catch and finally also exist on
+# arrays and promises. Other chains are left for the model.
+HTTP_CLIENT_METHODS = ("get", "post", "put", "patch", "delete", "head", "options", "request", "jsonp")
+OBSERVABLE_TYPES = ("Observable", "Subject", "BehaviorSubject", "ReplaySubject", "AsyncSubject", "EventEmitter")
+OBSERVABLE_CREATORS = ("of", "from", "throwError", "forkJoin", "combineLatest", "timer", "interval")
+
+_PATCH_IMPORT = re.compile(r"^\s*import\s+['\"]rxjs/add/operator/(\w+)['\"];?[ \t]*\n?", re.MULTILINE)
+_DEEP_CLASS_IMPORT = re.compile(
+    r"from\s+['\"]rxjs/(Observable|Subject|BehaviorSubject|ReplaySubject|AsyncSubject|Subscription|Observer)['\"]"
+)
+_STATIC_IMPORT = re.compile(r"^\s*import\s+['\"]rxjs/add/observable/\w+['\"];?[ \t]*\n?", re.MULTILINE)
+_STATIC_CALL = re.compile(r"\bObservable\.(of|from|throw|forkJoin|combineLatest|merge|timer|interval)\(")
+_STATIC_EMPTY = re.compile(r"\bObservable\.empty\(\s*\)")
+STATIC_RENAMES = {"throw": "throwError"}
+
+
+def _matching_paren(code: str, open_index: int) -> int:
+    """Index of the ')' matching the '(' at `open_index`, skipping strings. -1 if unbalanced."""
+    depth = 0
+    quote = None
+    i = open_index
+    while i < len(code):
+        char = code[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+def _matching_open(code: str, close_index: int) -> int:
+    """Index of the '(' / '[' / '<' opening the bracket that closes at `close_index`. -1 if unbalanced."""
+    # Type arguments may hold brackets ("Foo[]"), but call arguments may hold arrows ("=>").
+    pairs = {">": "<"} if code[close_index] == ">" else {")": "(", "]": "[", "}": "{"}
+    opening = set(pairs.values())
+    stack = []
+    i = close_index
+    while i >= 0:
+        char = code[i]
+        if char in "'\"`":
+            # Skip the string literal, backwards.
+            i -= 1
+            while i >= 0 and not (code[i] == char and (i == 0 or code[i - 1] != "\\")):
+                i -= 1
+        elif char in pairs:
+            stack.append(pairs[char])
+        elif char in opening:
+            if not stack or stack.pop() != char:
+                return -1
+            if not stack:
+                return i
+        i -= 1
+    return -1
+
+
+def _receiver(code: str, end: int) -> str:
+    """
+    The expression a method chain starting at `end` is called on, e.g. `this.http.get<Foo>(url)`
+    for `this.http.get<Foo>(url).map(...)`: identifiers joined by dots, with call arguments,
+    indexes and type arguments, plus a leading `new`.
+    """
+    i = end
+    while True:
+        while i > 0 and code[i - 1].isspace():
+            i -= 1
+        while i > 0 and code[i - 1] in ")]>":
+            open_index = _matching_open(code, i - 1)
+            if open_index == -1:
+                return code[i:end].strip()
+            i = open_index
+        start = i
+        while i > 0 and (code[i - 1].isalnum() or code[i - 1] in "_$"):
+            i -= 1
+        if i == start:
+            break
+        dot = i
+        while dot > 0 and code[dot - 1].isspace():
+            dot -= 1
+        if dot > 0 and code[dot - 1] == ".":
+            i = dot - 1
+            if i > 0 and code[i - 1] == "?":
+                i -= 1
+            continue
+        new = re.search(r"\bnew\s+$", code[:i])
+        if new:
+            i = new.start()
+        break
+    return code[i:end].strip()
+
+
+def _declared_names(code: str, types) -> set:
+    """Names declared (as fields, parameters or variables) with one of `types`."""
+    pattern = r"(\w+\$?)\s*[?!]?\s*:\s*(?:" + "|".join(types) + r")\b"
+    return set(re.findall(pattern, code))
+
+
+def _is_observable(receiver: str, code: str) -> bool:
+    """
+    True if `receiver` is provably an Observable: an HttpClient call, an identifier that
+    ends in $ or is declared with an Observable type, an RxJS creation function or
+    `new Subject()`, or the result of .pipe() / .asObservable().
+    """
+    receiver = re.sub(r"\s+", "", receiver)
+    path = re.sub(r"^this\.", "", receiver)
+    http = re.match(r"(\w+)\.(" + "|".join(HTTP_CLIENT_METHODS) + r")(<.*>)?\(.*\)$", path)
+    if http:
+        return http.group(1) in _declared_names(code, ("HttpClient", "Http"))
+    if re.fullmatch(r"[\w$]+(\??\.[\w$]+)*", path):
+        name = re.split(r"\??\.", path)[-1]
+        return name.endswith("$") or name in _declared_names(code, OBSERVABLE_TYPES)
+    if re.match(r"(Observable\.\w+|" + "|".join(OBSERVABLE_CREATORS) + r")(<.*>)?\(.*\)$", path):
+        return True
+    if re.match(r"new(" + "|".join(OBSERVABLE_TYPES[1:]) + r")\b", path):
+        return True
+    return bool(re.search(r"\.(pipe|asObservable)\(.*\)$", path))
+
+
+def _add_named_import(code: str, module: str, names: List[str]) -> str:
+    """Add `names` to an existing `import { ... } from module` or insert a new import at the top."""
+    if not names:
+        return code
+    pattern = re.compile(r"import\s*\{([^}]*)\}\s*from\s*['\"]" + re.escape(module) + r"['\"];?")
+    match = pattern.search(code)
+    if match:
+        existing = [name.strip() for name in match.group(1).split(",") if name.strip()]
+        merged = existing + [name for name in names if name not in existing]
+        return code[:match.start()] + f"import {{ {', '.join(merged)} }} from '{module}';" + code[match.end():]
+    imports = list(re.finditer(r"^import[^;]*;[ \t]*$", code, re.MULTILINE))
+    line = f"import {{ {', '.join(names)} }} from '{module}';"
+    if imports:
+        end = imports[-1].end()
+        return code[:end] + "\n" + line + code[end:]
+    return line + "\n" + code
+
+
+def migrate_rxjs_operators(code: str) -> Tuple[str, int]:
+    """
+    Rewrite patched operator chains (`obs.map(f).filter(g)`) into `obs.pipe(map(f), filter(g))`,
+    drop the `rxjs/add/...` imports and switch to `rxjs` / `rxjs/operators` imports.
+    Only operators the file actually patched in are touched, and only on receivers that
+    are provably Observables (see _is_observable); see remaining_patch_operators for the rest.
+    """
+    patched = set(_PATCH_IMPORT.findall(code))
+    count = 0
+    if patched:
+        chain_pattern = re.compile(r"\.(" + "|".join(sorted(map(re.escape, patched))) + r")\s*\(")
+        used = set()
+        result = []
+        cursor = 0
+        pos = 0
+        while True:
+            match = chain_pattern.search(code, pos)
+            if not match:
+                break
+            # Collect a run of consecutive patched operator calls.
+            calls = []
+            end = match.start()
+            next_match = match
+            while next_match and next_match.start() == end:
+                close = _matching_paren(code, next_match.end() - 1)
+                if close == -1:
+                    break
+                calls.append((next_match.group(1), code[next_match.end():close]))
+                end = close + 1
+                whitespace = re.match(r"\s*", code[end:]).end()
+                next_match = chain_pattern.match(code, end + whitespace)
+                if next_match:
+                    end += whitespace
+            if not calls or not _is_observable(_receiver(code, match.start()), code):
+                pos = match.end()
+                continue
+            operators = [f"{OPERATOR_RENAMES.get(name, name)}({args})" for name, args in calls]
+            used.update(OPERATOR_RENAMES.get(name, name) for name, _ in calls)
+            result.append(code[cursor:match.start()])
+            result.append(f".pipe({', '.join(operators)})")
+            cursor = pos = end
+            count += 1
+        result.append(code[cursor:])
+        code = "".join(result)
+        # Keep the patch import of any operator still called as a method (e.g. a `.catch(`
+        # chain on a receiver that may be a Promise); the chunks calling it go to the model.
+        remaining = {name for name in patched if re.search(r"\." + re.escape(name) + r"\s*\(", code)}
+
+        def _drop_import(match):
+            return match.group(0) if match.group(1) in remaining else ""
+
+        code, n = _PATCH_IMPORT.subn(_drop_import, code)
+        count += n - len(remaining)
+        code = _add_named_import(code, "rxjs/operators", sorted(used))
+
+    statics = set()
+
+    def _static(match):
+        name = STATIC_RENAMES.get(match.group(1), match.group(1))
+        statics.add(name)
+        return f"{name}("
+
+    code, n = _STATIC_CALL.subn(_static, code)
+    count += n
+    code, n = _STATIC_EMPTY.subn("EMPTY", code)
+    if n:
+        statics.add("EMPTY")
+        count += n
+    code, n = _STATIC_IMPORT.subn("", code)
+    count += n
+    code, n = _DEEP_CLASS_IMPORT.subn("from 'rxjs'", code)
+    count += n
+    if statics:
+        code = _add_named_import(code, "rxjs", sorted(statics))
+    return code, count
+
+
+# --- @ViewChild / @ContentChild static flags ---
+_QUERY = re.compile(
+    r"@(ViewChild|ContentChild)\(\s*([^,(){}]+?)\s*(?:,\s*\{([^{}]*)\}\s*)?\)"
+    r"(\s*(?:(?:public|private|protected|readonly)\s+)*)(\w+)"
+)
+
+
+def migrate_view_child_static(code: str) -> Tuple[str, int]:
+    """
+    Add `{ static: true }` to queries that are read in ngOnInit, as the Angular 8
+    migration does, merging it into an existing options object (`{ read: ElementRef }`).
+    Other queries, and queries that already set static, are left as they are
+    (static: false is the Angular 9+ default).
+    """
+    on_init = re.search(r"ngOnInit\s*\([^)]*\)\s*(?::\s*void\s*)?\{", code)
+    if not on_init:
+        return code, 0
+    close = code.find("{", on_init.start())
+    depth = 0
+    body_end = len(code)
+    for i in range(close, len(code)):
+        if code[i] == "{":
+            depth += 1
+        elif code[i] == "}":
+            depth -= 1
+            if depth == 0:
+                body_end = i
+                break
+    body = code[close:body_end]
+
+    def _rewrite(match):
+        kind, selector, options, modifiers, member = match.groups()
+        if not re.search(rf"\bthis\.{member}\b", body) or (options and re.search(r"\bstatic\s*:", options)):
+            return match.group(0)
+        options = options.strip().rstrip(",").strip() if options else ""
+        merged = f"{{ {options}, static: true }}" if options else "{ static: true }"
+        return f"@{kind}({selector}, {merged}){modifiers}{member}"
+
+    new_code = _QUERY.sub(_rewrite, code)
+    return new_code, int(new_code != code)
+
+
+# --- entryComponents removal ---
+_ENTRY_COMPONENTS = re.compile(r"\n?[ \t]*entryComponents\s*:\s*\[")
+
+
+def remove_entry_components(code: str) -> Tuple[str, int]:
+    """Remove `entryComponents: [...]` from @NgModule/@Component metadata (not needed with Ivy)."""
+    count = 0
+    while True:
+        match = _ENTRY_COMPONENTS.search(code)
+        if not match:
+            return code, count
+        depth = 0
+        end = match.end() - 1
+        for i in range(end, len(code)):
+            if code[i] == "[":
+                depth += 1
+            elif code[i] == "]":
+                depth -= 1
+                if depth == 0:
+                    end = i + 1
+                    break
+        start = match.start()
+        trailing = re.match(r"\s*,", code[end:])
+        if trailing:
+            end += trailing.end()
+        else:
+            # Last property: drop the comma before it instead.
+            before = code[:start].rstrip()
+            if before.endswith(","):
+                start = len(before) - 1
+        code = code[:start] + code[end:]
+        count += 1
+
+
+# --- ModuleWithProviders generic ---
+_MODULE_WITH_PROVIDERS = re.compile(r"(:\s*)ModuleWithProviders\b(?!\s*<)")
+
+
+def migrate_module_with_providers(code: str) -> Tuple[str, int]:
+    """`ModuleWithProviders` return types -> `ModuleWithProviders<EnclosingModule>`."""
+    count = 0
+
+    def _rewrite(match):
+        nonlocal count
+        classes = re.findall(r"export\s+class\s+(\w+)", code[:match.start()])
+        if not classes:
+            return match.group(0)
+        count += 1
+        return f"{match.group(1)}ModuleWithProviders<{classes[-1]}>"
+
+    code = _MODULE_WITH_PROVIDERS.sub(_rewrite, code)
+    return code, count
+
+
+# --- Misc renames ---
+SIMPLE_RENAMES = [
+    (re.compile(r"ViewEncapsulation\.Native\b"), "ViewEncapsulation.ShadowDom"),
+    (re.compile(r"/deep/"), "::ng-deep"),
+]
+
+
+def migrate_simple_renames(code: str) -> Tuple[str, int]:
+    count = 0
+    for pattern, replacement in SIMPLE_RENAMES:
+        code, n = pattern.subn(replacement, code)
+        count += n
+    return code, count
+
+
+TRANSFORMS = [
+    ("http_module", migrate_http_module),
+    ("rxjs_operators", migrate_rxjs_operators),
+    ("view_child_static", migrate_view_child_static),
+    ("entry_components", remove_entry_components),
+    ("module_with_providers", migrate_module_with_providers),
+    ("simple_renames", migrate_simple_renames),
+]
+
+# Patterns the rewrite pass does not handle; chunks containing any of these go to the model.
+UNSUPPORTED_PATTERNS = [
+    ("angular_http", re.compile(r"['\"]@angular/http['\"]|\bRequestOptions\b|\bURLSearchParams\b")),
+    ("response_json", re.compile(r"\.json\(\)")),
+    ("rxjs_patch_import", re.compile(r"['\"]rxjs/add/|['\"]rxjs-compat")),
+    ("rxjs_deep_import", re.compile(r"from\s+['\"]rxjs/(?!operators['\"]|testing['\"])")),
+    ("renderer_v1", re.compile(r"\bRenderer\b(?!2)")),
+    ("removed_di_api", re.compile(r"\bReflectiveInjector\b|\bOpaqueToken\b")),
+    ("template_tag", re.compile(r"<template[\s>]")),
+    ("module_with_providers", _MODULE_WITH_PROVIDERS),
+]
+
+
+def apply_codemods(code: str) -> Tuple[str, Dict[str, int]]:
+    """Run every transform over `code`. Returns (new code, rewrites per transform)."""
+    stats = {}
+    for name, transform in TRANSFORMS:
+        code, count = transform(code)
+        if count:
+            stats[name] = count
+    return code, stats
+
+
+def remaining_patch_operators(code: str) -> List[str]:
+    """Operators whose `rxjs/add/operator/...` import is still in `code` after the codemods."""
+    return sorted(set(_PATCH_IMPORT.findall(code)))
+
+
+def unsupported_patterns(code: str, patch_operators: Iterable[str] = ()) -> List[str]:
+    """
+    Names of the UNSUPPORTED_PATTERNS found in `code`. `patch_operators` (see
+    remaining_patch_operators for the whole file) adds "rxjs_patch_operator" when `code`
+    calls one of them as a method, i.e. a chain migrate_rxjs_operators left alone.
+    """
+    names = [name for name, pattern in UNSUPPORTED_PATTERNS if pattern.search(code)]
+    operators = "|".join(map(re.escape, patch_operators))
+    if operators and re.search(r"\.(" + operators + r")\s*\(", code):
+        names.append("rxjs_patch_operator")
+    return names
@@ -0,0 +1,177 @@
+import re
+from typing import Dict, List, Tuple
+
+# === Diff response mode ===
+# Instead of returning all four component files in full, the model can return a
+# FileEdit per file: "unchanged", a unified diff against the existing file, or the
+# full content as a fallback. The edits are applied locally here.
+
+COMPONENT_FILES = ("ts", "html", "css", "spec_ts")
+
+# Full-mode schema -> diff-mode schema.
+EDIT_SCHEMAS = {
+    "UpdatedComponent": "UpdatedComponentEdits",
+    "ComponentUpdateResult": "ComponentUpdateEditsResult",
+    "UpdatedPage": "UpdatedPageEdits",
+}
+
+# Rule that replaces "If any file does not require changes, provide the existing content as-is."
+FILE_RULES = {
+    "full": "**If any file does not require changes**, provide the existing content as-is.",
+    "diff": (
+        "**Do not repeat existing files.** For each file return a FileEdit: "
+        "mode 'unchanged' with empty content if the file does not require changes, "
+        "or mode 'diff' with a unified diff (`@@ -start,count +start,count @@` hunks with 3 lines of context) "
+        "against the existing file. Use mode 'full' only for a file that does not exist yet."
+    ),
+}
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class DiffApplyError(Exception):
+    """Raised when a diff returned by the model does not apply to the existing file."""
+
+
+def response_format(schema_name: str, response_mode: str = "full") -> Tuple[str, str]:
+    """
+    Return (schema name to request, rule for unchanged files) for the given response mode.
+    """
+    if response_mode not in FILE_RULES:
+        raise ValueError(f"Unknown response mode: {response_mode}")
+    if response_mode == "diff":
+        return EDIT_SCHEMAS[schema_name], FILE_RULES["diff"]
+    return schema_name, FILE_RULES["full"]
+
+
+def _parse_hunks(diff: str) -> List[Dict]:
+    """
+    Split a unified diff into hunks of {"start", "old", "new"} where `old` and `new`
+    are the lines the hunk expects and produces. File headers are ignored.
+    """
+    hunks = []
+    hunk = None
+    for line in diff.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            # "-N,0" is a pure insertion after line N; otherwise the hunk starts at line N.
+            old_start = int(header.group(1))
+            start = old_start if header.group(2) == "0" else max(old_start - 1, 0)
+            hunk = {"start": start, "old": [], "new": []}
+            hunks.append(hunk)
+            continue
+        if hunk is None or line.startswith("\\"):
+            # Preamble ("---"/"+++" headers) or "\ No newline at end of file".
+            continue
+        if line.startswith("-"):
+            hunk["old"].append(line[1:])
+        elif line.startswith("+"):
+            hunk["new"].append(line[1:])
+        else:
+            # Context line; models often drop the leading space on blank lines.
+            text = line[1:] if line.startswith(" ") else line
+            hunk["old"].append(text)
+            hunk["new"].append(text)
+    return hunks
+
+
+def _find_block(lines: List[str], block: List[str], expected: int, start: int) -> int:
+    """
+    Find `block` in `lines` at or after `start`, searching outward from `expected`
+    since model line numbers are often off. Falls back to a whitespace-insensitive
+    match. Returns the index or -1.
+    """
+    size = len(block)
+    if size == 0:
+        return min(max(expected, start), len(lines))
+    candidates = sorted(range(start, len(lines) - size + 1), key=lambda i: abs(i - expected))
+    for i in candidates:
+        if lines[i:i + size] == block:
+            return i
+    stripped = [line.strip() for line in block]
+    for i in candidates:
+        if [line.strip() for line in lines[i:i + size]] == stripped:
+            return i
+    return -1
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """
+    Apply a unified diff to `original` and return the new text.
+    Hunks are located by their content, with the header line numbers only used as a hint.
+    """
+    hunks = _parse_hunks(diff)
+    if not hunks:
+        raise DiffApplyError("Diff contains no hunks.")
+    lines = original.splitlines()
+    result = []
+    cursor = 0
+    for hunk in hunks:
+        index = _find_block(lines, hunk["old"], hunk["start"], cursor)
+        if index == -1:
+            preview = "\n".join(hunk["old"][:3])
+            raise DiffApplyError(f"Hunk does not apply near line {hunk['start'] + 1}:\n{preview}")
+        result.extend(lines[cursor:index])
+        result.extend(hunk["new"])
+        cursor = index + len(hunk["old"])
+    result.extend(lines[cursor:])
+    text = "\n".join(result)
+    if original.endswith("\n"):
+        text += "\n"
+    return text
+
+
+def apply_file_edit(original: str, edit) -> str:
+    """Return the new file content for a FileEdit (pydantic model or dict)."""
+    mode = edit["mode"] if isinstance(edit, dict) else edit.mode
+    content = edit.get("content", "") if isinstance(edit, dict) else edit.content
+    if mode == "unchanged":
+        return original
+    if mode == "full":
+        return content
+    return apply_unified_diff(original, content)
+
+
+def apply_component_edits(edits, existing: Dict[str, str]) -> Dict[str, str]:
+    """
+    Apply UpdatedComponentEdits / UpdatedPageEdits against the existing files
+    ({"ts": ..., "html": ..., "css": ..., "spec_ts": ...}).
+    Returns {"name": ..., "ts": ..., "html": ..., "css": ..., "spec_ts": ...}.
+    """
+    name = edits["name"] if isinstance(edits, dict) else edits.name
+    files = {"name": name}
+    for key in COMPONENT_FILES:
+        edit = edits[key] if isinstance(edits, dict) else getattr(edits, key)
+        try:
+            files[key] = apply_file_edit(existing.get(key, ""), edit)
+        except DiffApplyError as e:
+            raise DiffApplyError(f"{name}.{key}: {e}") from e
+    return files
+
+
+def materialize_edits(edits, existing: Dict[str, str], schema_name: str):
+    """
+    Apply edits and validate the result as the full-mode schema (e.g. "UpdatedComponent"),
+    so downstream code sees the same objects in both response modes.
+    """
+    from schemas import get_schema
+
+    schema = get_schema(schema_name)
+    validator = getattr(schema, "model_validate", None) or schema.parse_obj
+    return validator(apply_component_edits(edits, existing))
+
+
+def materialize_result_edits(result_edits, existing_components: Dict[str, Dict[str, str]]):
+    """
+    Apply a ComponentUpdateEditsResult against the existing components (name -> files)
+    and return the equivalent ComponentUpdateResult.
+    """
+    from schemas import get_schema
+
+    updated = [
+        apply_component_edits(edits, existing_components.get(edits.name, {}))
+        for edits in result_edits.updated_components
+    ]
+    schema = get_schema("ComponentUpdateResult")
+    validator = getattr(schema, "model_validate", None) or schema.parse_obj
+    return validator({"updated_components": updated})
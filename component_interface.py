@@ -0,0 +1,155 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# === Component interface analysis ===
+# What a page depends on when it uses a component: the selector it writes in its
+# template (and exportAs, for template references), the @Input/@Output bindings, and
+# the public members it can call through a template reference or @ViewChild. When an
+# updated component keeps all of these, the page code stays valid and the
+# page-integration model call can be skipped.
+
+# Methods every component may have that pages never call directly.
+LIFECYCLE_HOOKS = {
+    "constructor", "ngOnChanges", "ngOnInit", "ngDoCheck", "ngAfterContentInit", "ngAfterContentChecked",
+    "ngAfterViewInit", "ngAfterViewChecked", "ngOnDestroy",
+}
+
+# Statement keywords that look like method declarations to the member regex.
+_KEYWORDS = {"if", "for", "while", "switch", "catch", "function", "return", "new", "super", "else", "do", "try"}
+
+_COMMENTS = re.compile(r"/\*.*?\*/|//[^\n]*", re.S)
+_STRINGS = re.compile(r"'(?:\\.|[^'\\])*'|\"(?:\\.|[^\"\\])*\"|`(?:\\.|[^`\\])*`", re.S)
+_SELECTOR = re.compile(r"""selector\s*:\s*['"`]([^'"`]+)['"`]""")
+_EXPORT_AS = re.compile(r"""exportAs\s*:\s*['"`]([^'"`]+)['"`]""")
+_METADATA_LIST = r"""\b{key}\s*:\s*\[([^\]]*)\]"""
+_CLASS = re.compile(r"export\s+class\s+(\w+)[^{]*\{")
+_DECORATED_MEMBER = re.compile(
+    r"@(Input|Output)\s*\(\s*(?:['\"]([^'\"]*)['\"])?[^)]*\)\s*"
+    r"((?:(?:public|readonly|override|declare)\s+)*)(?:(set|get)\s+)?(\w+)\s*([!?]?)\s*(?::\s*([^=;(]+))?"
+    r"(?:=\s*new\s+EventEmitter\s*(<[^>]*>)?)?"
+)
+_METHOD = re.compile(r"(?:^|[;}\n])\s*((?:(?:public|private|protected|static|async|override|get|set)\s+)*)(\w+)\s*\(([^)]*)\)")
+_PROPERTY = re.compile(r"(?:^|[;}\n])\s*((?:(?:public|private|protected|static|readonly|override)\s+)*)(\w+)\s*[!?]?\s*[:=]")
+
+
+def _strip(ts: str) -> str:
+    """Comments removed and string literals blanked (kept as '' so positions of code stay readable)."""
+    return _STRINGS.sub("''", _COMMENTS.sub("", ts))
+
+
+def _class_body(code: str) -> Tuple[Optional[str], str]:
+    """Name and member-level text (depth 1 inside the class braces) of the first exported class."""
+    match = _CLASS.search(code)
+    if not match:
+        return None, ""
+    depth = 1
+    members = []
+    for char in code[match.end():]:
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                break
+            if depth == 1:
+                members.append("}")
+                continue
+        if depth == 1:
+            members.append(char)
+    return match.group(1), "".join(members)
+
+
+def _normalize(text: Optional[str]) -> Optional[str]:
+    return re.sub(r"\s+", "", text) if text else None
+
+
+def _metadata_names(code: str, key: str) -> Dict[str, Dict]:
+    """inputs: ['value', 'label: title'] in @Component metadata -> {public name: binding}."""
+    bindings = {}
+    match = re.search(_METADATA_LIST.format(key=key), code)
+    if match:
+        for entry in re.findall(r"""['"]([^'"]+)['"]""", match.group(1)):
+            prop, _, alias = (part.strip() for part in entry.partition(":"))
+            bindings[alias or prop] = {"property": prop, "type": None}
+    return bindings
+
+
+def extract_interface(ts: str) -> Dict:
+    """
+    The public interface of an Angular component from its .ts source:
+    {"class", "selector", "export_as", "inputs": {binding name: {"property", "type"}},
+     "outputs": {...}, "methods": {name: parameter list}, "properties": [public fields]}.
+    """
+    # Metadata string values are read before strings are blanked.
+    without_comments = _COMMENTS.sub("", ts)
+    selector = _SELECTOR.search(without_comments)
+    export_as = _EXPORT_AS.search(without_comments)
+    inputs = _metadata_names(without_comments, "inputs")
+    outputs = _metadata_names(without_comments, "outputs")
+
+    for kind, alias, _, _, name, _, member_type, emitted_type in _DECORATED_MEMBER.findall(without_comments):
+        bindings = inputs if kind == "Input" else outputs
+        if not member_type and emitted_type:
+            member_type = "EventEmitter" + emitted_type
+        bindings[alias or name] = {"property": name, "type": _normalize(member_type)}
+
+    class_name, members = _class_body(_strip(ts))
+    # Decorator calls are not members.
+    members = re.sub(r"@\w+\s*\([^)]*\)", "", members)
+    methods = {}
+    for modifiers, name, params in _METHOD.findall(members):
+        if name in _KEYWORDS or name in LIFECYCLE_HOOKS or "private" in modifiers or "protected" in modifiers:
+            continue
+        methods[name] = _normalize(params) or ""
+    properties = sorted({
+        name for modifiers, name in _PROPERTY.findall(members)
+        if name not in _KEYWORDS and "private" not in modifiers and "protected" not in modifiers
+    })
+    return {
+        "class": class_name,
+        "selector": selector.group(1).strip() if selector else None,
+        "export_as": export_as.group(1) if export_as else None,
+        "inputs": inputs,
+        "outputs": outputs,
+        "methods": methods,
+        "properties": properties,
+    }
+
+
+def interface_changes(old_ts: str, new_ts: str) -> List[str]:
+    """Differences between two versions of a component's interface, e.g. ["input removed: title"]."""
+    old, new = extract_interface(old_ts), extract_interface(new_ts)
+    changes = []
+    for key in ("class", "selector", "export_as"):
+        if old[key] != new[key]:
+            changes.append(f"{key}: {old[key]} -> {new[key]}")
+    for key, label in (("inputs", "input"), ("outputs", "output"), ("methods", "method")):
+        for name in sorted(old[key].keys() - new[key].keys()):
+            changes.append(f"{label} removed: {name}")
+        for name in sorted(new[key].keys() - old[key].keys()):
+            changes.append(f"{label} added: {name}")
+        for name in sorted(old[key].keys() & new[key].keys()):
+            if old[key][name] != new[key][name]:
+                changes.append(f"{label} changed: {name}")
+    for name in sorted(set(old["properties"]) - set(new["properties"])):
+        changes.append(f"property removed: {name}")
+    return changes
+
+
+def page_update_needed(updated_components: List[Dict], existing_components: Dict[str, Dict]) -> Tuple[bool, List[str]]:
+    """
+    Whether the page has to be re-integrated after `updated_components` (dicts with
+    "name" and "ts"), given the existing component code ({name: {"ts": ...}}).
+    New components, components without code to compare and any interface change all
+    need the page step. Returns (needed, reasons).
+    """
+    reasons = []
+    existing_components = existing_components if isinstance(existing_components, dict) else {}
+    for component in updated_components:
+        name = component.get("name")
+        existing = existing_components.get(name)
+        if not isinstance(existing, dict) or not existing.get("ts") or not component.get("ts"):
+            reasons.append(f"{name}: no existing code to compare")
+            continue
+        reasons += [f"{name}: {change}" for change in interface_changes(existing["ts"], component["ts"])]
+    return bool(reasons), reasons
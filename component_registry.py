@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+# === Configuration ===
+# File suffix -> component dict key. Longest suffixes first so ".spec.ts" wins over ".ts".
+# When a component has files for the same key (both a .scss and a .css stylesheet), the
+# one listed first is used and the other is reported under "shadowed".
+COMPONENT_SUFFIXES = [
+    (".component.spec.ts", "spec_ts"),
+    (".component.scss", "css"),
+    (".component.css", "css"),
+    (".component.html", "html"),
+    (".component.ts", "ts"),
+]
+
+# Directories that never contain project components.
+SKIP_DIRS = {"node_modules", ".git", "dist", ".angular", "coverage"}
+
+_CLASS_PATTERN = re.compile(r"export\s+class\s+(\w+)")
+_SELECTOR_PATTERN = re.compile(r"""selector\s*:\s*['"`]([^'"`]+)['"`]""")
+_TAG_PATTERN = re.compile(r"<([a-zA-Z][\w-]*)")
+
+
+def _file_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _suffix_rank(rel_path: str) -> int:
+    """Position of the path's suffix in COMPONENT_SUFFIXES (lower wins)."""
+    return next(i for i, (suffix, _) in enumerate(COMPONENT_SUFFIXES) if rel_path.endswith(suffix))
+
+
+class ComponentRegistry:
+    """
+    Snapshot of every Angular component under an Angular source tree.
+
+    The tree is scanned once; afterwards refresh() only stats files and re-reads the
+    ones whose mtime or size changed. The snapshot (contents + content hashes) can be
+    saved to disk so a new process starts from it instead of re-reading the project.
+
+    Components are keyed by their class name (e.g. "AccountSummaryComponent") and hold
+    {"ts", "html", "css", "spec_ts"}, the shape the prompt pipelines expect.
+    """
+
+    def __init__(self, root: str, snapshot_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.snapshot_path = snapshot_path
+        # relative path -> {"key", "base", "mtime_ns", "size", "sha256", "content"}
+        self.files: Dict[str, Dict] = {}
+        self._index = None
+        self._lock = threading.Lock()
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot(snapshot_path)
+        self.refresh()
+
+    # --- Scanning ---
+    def _walk(self):
+        """Yield (relative path, component key, component base path, stat) for component files."""
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                    continue
+                for suffix, key in COMPONENT_SUFFIXES:
+                    if entry.name.endswith(suffix):
+                        rel_path = os.path.relpath(entry.path, self.root)
+                        yield rel_path, key, rel_path[:-len(suffix)], entry.stat()
+                        break
+
+    def refresh(self) -> List[str]:
+        """
+        Bring the snapshot up to date with the tree.
+        Only new or modified files (by mtime/size) are read. Returns the changed relative paths.
+        """
+        changed = []
+        seen = set()
+        with self._lock:
+            for rel_path, key, base, stat in self._walk():
+                seen.add(rel_path)
+                known = self.files.get(rel_path)
+                if known and known["mtime_ns"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+                    continue
+                with open(os.path.join(self.root, rel_path), "r", encoding="utf-8") as f:
+                    content = f.read()
+                sha256 = _file_hash(content)
+                if known and known["sha256"] == sha256:
+                    # Touched but not modified.
+                    known["mtime_ns"] = stat.st_mtime_ns
+                    continue
+                self.files[rel_path] = {
+                    "key": key, "base": base, "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size, "sha256": sha256, "content": content,
+                }
+                changed.append(rel_path)
+            for rel_path in set(self.files) - seen:
+                del self.files[rel_path]
+                changed.append(rel_path)
+            if changed:
+                self._index = None
+        return changed
+
+    # --- Persistence ---
+    def save_snapshot(self, path: Optional[str] = None):
+        """Write the snapshot (contents, hashes, mtimes) to a JSON file."""
+        path = path or self.snapshot_path
+        with self._lock:
+            data = {"root": self.root, "files": self.files}
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str):
+        """Load a snapshot written by save_snapshot (ignored if it belongs to another root)."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("root") == self.root:
+            self.files = data["files"]
+            self._index = None
+
+    # --- Component view ---
+    def _components(self) -> Dict[str, Dict]:
+        """
+        Group files into components: name -> {"base", "selector", "files": {key: content},
+        "shadowed": [relative paths not used because a preferred file has the same key]}.
+        Rebuilt lazily only after something changed.
+        """
+        index = self._index
+        if index is not None:
+            return index
+        with self._lock:
+            # Sorted by suffix preference, so the preferred file of each key comes first.
+            by_base: Dict[str, Dict[str, str]] = {}
+            shadowed: Dict[str, List[str]] = {}
+            for rel_path in sorted(self.files, key=lambda path: (_suffix_rank(path), path)):
+                record = self.files[rel_path]
+                files = by_base.setdefault(record["base"], {})
+                if record["key"] in files:
+                    shadowed.setdefault(record["base"], []).append(rel_path)
+                else:
+                    files[record["key"]] = record["content"]
+            index = {}
+            for base, files in by_base.items():
+                ts = files.get("ts", "")
+                class_match = _CLASS_PATTERN.search(ts)
+                selector_match = _SELECTOR_PATTERN.search(ts)
+                name = class_match.group(1) if class_match else os.path.basename(base)
+                index[name] = {
+                    "base": base,
+                    "selector": selector_match.group(1) if selector_match else None,
+                    "files": {key: files.get(key, "") for key in ("ts", "html", "css", "spec_ts")},
+                    "shadowed": shadowed.get(base, []),
+                }
+            self._index = index
+        return index
+
+    def component_names(self) -> List[str]:
+        return sorted(self._components())
+
+    def shadowed_files(self) -> Dict[str, List[str]]:
+        """{component name: files ignored in favour of a preferred one}, e.g. a .css next to a .scss."""
+        return {name: list(c["shadowed"]) for name, c in self._components().items() if c["shadowed"]}
+
+    def component_code(self, name: str) -> Dict[str, str]:
+        """Return {"ts", "html", "css", "spec_ts"} for one component."""
+        components = self._components()
+        if name not in components:
+            raise KeyError(f"Unknown component: {name}")
+        return dict(components[name]["files"])
+
+    def components_json(self, names: Optional[List[str]] = None) -> Dict[str, Dict[str, str]]:
+        """Return {name: {"ts", "html", "css", "spec_ts"}} for `names` (default: all components)."""
+        names = self.component_names() if names is None else names
+        return {name: self.component_code(name) for name in names}
+
+    def components_used_by(self, name: str) -> List[str]:
+        """
+        Names of the components a component renders, directly or nested,
+        found by matching element tags in its template against component selectors.
+        """
+        components = self._components()
+        by_selector = {c["selector"]: n for n, c in components.items() if c["selector"]}
+        used = []
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            for tag in _TAG_PATTERN.findall(components[current]["files"]["html"]):
+                child = by_selector.get(tag)
+                if child and child != name and child not in used:
+                    used.append(child)
+                    pending.append(child)
+        return used
+
+    def page_inputs(self, page_name: str) -> Dict:
+        """
+        Code inputs for the prompt pipelines for one page component:
+        page_angular_code, page_angular_components, page_angular_components_code and components_json.
+        """
+        used = self.components_used_by(page_name)
+        components_code = self.components_json(used)
+        return {
+            "page_angular_code": self.component_code(page_name),
+            "page_angular_components": used,
+            "page_angular_components_code": components_code,
+            "components_json": components_code,
+        }
+
+
+# Registries shared within a process (e.g. by every batch_runner worker), keyed by root.
+_REGISTRIES: Dict[str, ComponentRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_registry(root: str, snapshot_path: Optional[str] = None) -> ComponentRegistry:
+    """Return the shared registry for `root`, refreshing it if it already exists."""
+    root = os.path.abspath(root)
+    with _REGISTRIES_LOCK:
+        registry = _REGISTRIES.get(root)
+        if registry is None:
+            registry = _REGISTRIES[root] = ComponentRegistry(root, snapshot_path)
+            return registry
+    registry.refresh()
+    return registry
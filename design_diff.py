@@ -0,0 +1,171 @@
+import json
+import re
+from typing import Dict, Iterable, Optional
+
+# === Structural design diff ===
+# Answers "which components changed between two design snapshots" locally, by
+# comparing nodes by id. Works on both the filtered Figma metadata produced by
+# figma.extract_relevant_metadata and the AltNodes produced by the plugin.
+
+# Bounding boxes are compared after rounding to this many pixels, so sub-pixel
+# jitter between exports does not show up as a change.
+DEFAULT_TOLERANCE = 0.5
+
+
+def _normalize_name(value: str) -> str:
+    """"Account Summary", "account-summary" and "AccountSummaryComponent" -> "accountsummary"."""
+    name = re.sub(r"[^a-z0-9]", "", value.lower())
+    return name[:-len("component")] if name.endswith("component") and name != "component" else name
+
+
+def _round(value, tolerance: float):
+    if isinstance(value, (int, float)) and tolerance:
+        return round(value / tolerance) * tolerance
+    return value
+
+
+def node_properties(node: Dict, tolerance: float = DEFAULT_TOLERANCE) -> Dict:
+    """
+    The properties that matter for rendering, normalized across both node formats:
+    box (bounding box or position + dimensions), fills, style, characters, type and
+    the ordered child ids.
+    """
+    if "absoluteBoundingBox" in node:
+        box = node["absoluteBoundingBox"] or {}
+        box = (box.get("x"), box.get("y"), box.get("width"), box.get("height"))
+    elif "position" in node:
+        box = (node["position"].get("x"), node["position"].get("y"),
+               node.get("dimensions", {}).get("width"), node.get("dimensions", {}).get("height"))
+    else:
+        box = None
+    return {
+        "type": node.get("type"),
+        "box": tuple(_round(v, tolerance) for v in box) if box else None,
+        "fills": node.get("fills", node.get("styles")),
+        "style": node.get("style", node.get("typography")),
+        "characters": node.get("characters", node.get("text")),
+        "layout": node.get("layout"),
+        "children": [child.get("id") for child in node.get("children") or []],
+    }
+
+
+def index_nodes(design) -> Dict[str, Dict]:
+    """
+    Flatten a design (a root node or a list of top-level nodes) into
+    id -> {"node", "parent", "depth"} without recursion.
+    """
+    roots = design if isinstance(design, list) else [design]
+    index = {}
+    stack = [(node, None, 0) for node in reversed(roots)]
+    while stack:
+        node, parent, depth = stack.pop()
+        index[node["id"]] = {"node": node, "parent": parent, "depth": depth}
+        for child in reversed(node.get("children") or []):
+            stack.append((child, node["id"], depth + 1))
+    return index
+
+
+def diff_designs(old_design, new_design, tolerance: float = DEFAULT_TOLERANCE) -> Dict:
+    """
+    Compare two design snapshots node by node.
+    Returns {"added": [ids], "removed": [ids], "changed": {id: [changed property names]}}.
+    """
+    return _diff_indexes(index_nodes(old_design), index_nodes(new_design), tolerance)
+
+
+def _diff_indexes(old_index: Dict[str, Dict], new_index: Dict[str, Dict], tolerance: float) -> Dict:
+    changed = {}
+    for node_id, entry in new_index.items():
+        old_entry = old_index.get(node_id)
+        if old_entry is None:
+            continue
+        old_props = node_properties(old_entry["node"], tolerance)
+        new_props = node_properties(entry["node"], tolerance)
+        names = [name for name in new_props if old_props[name] != new_props[name]]
+        if "children" in names and set(old_props["children"]) != set(new_props["children"]):
+            # Added/removed children are reported on their own; only a reorder counts here.
+            names.remove("children")
+        if names:
+            changed[node_id] = names
+    return {
+        "added": [node_id for node_id in new_index if node_id not in old_index],
+        "removed": [node_id for node_id in old_index if node_id not in new_index],
+        "changed": changed,
+    }
+
+
+def _component_for(node_id: str, index: Dict[str, Dict], lookup):
+    """
+    Walk up from `node_id` to the nearest node that maps to a component.
+    Returns (component name, depth of that node) or (None, None).
+    """
+    while node_id is not None:
+        entry = index[node_id]
+        component = lookup(entry["node"])
+        if component:
+            return component, entry["depth"]
+        node_id = entry["parent"]
+    return None, None
+
+
+def changed_components(old_design, new_design, component_names: Optional[Iterable[str]] = None,
+                       component_map: Optional[Dict[str, str]] = None,
+                       page_component: Optional[str] = None,
+                       tolerance: float = DEFAULT_TOLERANCE) -> Dict:
+    """
+    Map the design diff to Angular component names.
+
+    A node maps to a component if `component_map` has an entry for its id or name,
+    or if its layer name matches one of `component_names` ("Account Summary" ->
+    "AccountSummaryComponent"). Each changed node is attributed to its nearest mapped
+    ancestor (removed nodes are looked up in the old design).
+
+    Returns:
+      - components: changed component names, deepest (foundational) components first
+      - unmapped: changed node ids that resolve to no component, or only to the page itself
+      - ambiguous: True when the model should still be asked (some change is unmapped)
+      - diff: the raw diff_designs result
+    """
+    component_map = component_map or {}
+    by_name = {_normalize_name(name): name for name in component_names or []}
+
+    def lookup(node):
+        return (component_map.get(node.get("id")) or component_map.get(node.get("name"))
+                or by_name.get(_normalize_name(node.get("name") or "")))
+
+    old_index = index_nodes(old_design)
+    new_index = index_nodes(new_design)
+    diff = _diff_indexes(old_index, new_index, tolerance)
+
+    touched = [(node_id, new_index) for node_id in list(diff["changed"]) + diff["added"]]
+    touched += [(node_id, old_index) for node_id in diff["removed"]]
+
+    depth = {}
+    unmapped = []
+    for node_id, index in touched:
+        component, component_depth = _component_for(node_id, index, lookup)
+        if component is None or (page_component and _normalize_name(component) == _normalize_name(page_component)):
+            unmapped.append(node_id)
+            continue
+        depth[component] = max(depth.get(component, 0), component_depth)
+
+    return {
+        "components": sorted(depth, key=lambda name: -depth[name]),
+        "unmapped": unmapped,
+        "ambiguous": bool(unmapped),
+        "diff": diff,
+    }
+
+
+def load_design(path: str):
+    """
+    Load a design snapshot (filtered Figma JSON or AltNode JSON) from disk. A raw Figma
+    file (with a "document") is reduced to the properties compared here.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        design = json.load(f)
+    if isinstance(design, dict) and isinstance(design.get("document"), dict):
+        from figma import project
+
+        return project(design["document"], "diff")
+    return design
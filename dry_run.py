@@ -0,0 +1,429 @@
+import argparse
+import heapq
+import json
+import math
+import os
+import re
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import llm
+from batch_runner import DEFAULT_WORKERS, PIPELINES, load_job_inputs, load_manifest
+from component_diff import EDIT_SCHEMAS
+from id_chunking import (CHUNKS_PER_CALL, CONTINUE_MESSAGE, chunk_messages, distinct_batches, plan_file,
+                         project_files)
+from model_router import get_router
+from rate_limiter import DEFAULT_COMPLETION_TOKENS, estimate_tokens, get_scheduler
+from structured_output import parse_structured_output
+
+# === Dry-run estimates ===
+# Runs the page pipelines and plans the id_chunking upgrade without contacting a model.
+# Page prompts are built by the real pipeline code: llm.invoke_structured hands them to
+# a recorder that counts their tokens and answers with a response the size of the
+# existing code, so every later step (and its prompt) runs as it would. Upgrade
+# batches are planned exactly like update_code / update_project and their chat messages
+# built with id_chunking.chunk_messages. Calls, continuation rounds, tokens, cost and
+# wall time under the configured concurrency and rate limits are reported per route.
+
+# Completion tokens per response before call_llm has to ask for a continuation.
+MAX_COMPLETION_TOKENS = 4096
+
+# Chat formatting tokens per message and for priming the reply (OpenAI chat format).
+MESSAGE_TOKENS = 3
+REPLY_TOKENS = 3
+
+# Latency model per call: fixed overhead + prompt processing + generation.
+CALL_OVERHEAD_SECONDS = 0.5
+PROMPT_TOKENS_PER_SECOND = 10000
+OUTPUT_TOKENS_PER_SECOND = {"fast": 100, "large": 50}
+
+# USD per million (prompt, completion) tokens by model name; unknown models are not priced.
+PRICES_PER_MILLION = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Edit schema (diff response mode) -> full-mode schema.
+_FULL_SCHEMAS = {edits: full for full, edits in EDIT_SCHEMAS.items()}
+
+_FILE_KEYS = ("html", "css", "spec_ts", "ts")
+_CLASS_OPEN = re.compile(r"export\s+class\s+\w+[^{]*\{")
+
+
+# === Token counting ===
+@lru_cache(maxsize=None)
+def _encoding(model_name: str):
+    """tiktoken encoding for `model_name`, or None when tiktoken (or its BPE file) is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # The BPE file is downloaded on first use; without it fall back to the estimate.
+        return None
+
+
+def tokenizer_name(model_name: str) -> str:
+    encoding = _encoding(model_name)
+    return f"tiktoken:{encoding.name}" if encoding else "estimate"
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """Tokens of `text` for `model_name` (tiktoken if installed, else rate_limiter.estimate_tokens)."""
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict], model_name: str) -> int:
+    """Prompt tokens of a chat conversation."""
+    return sum(count_tokens(message["content"], model_name) + MESSAGE_TOKENS for message in messages) + REPLY_TOKENS
+
+
+# === Recorder ===
+class DryRunRecorder:
+    """
+    Stands in for the model while installed with recording(): every prompt passed to
+    llm.invoke_model / invoke_structured is counted and recorded as a call of the current
+    job, and answered with a response built from the job's existing code.
+
+    The answer updates the `components_per_page` largest components of the page (their
+    existing files, so completion tokens match a full rewrite). With
+    `assume_interface_change` each updated component gains an @Input, so the page step
+    that component_interface.py would otherwise skip is estimated too (an upper bound).
+    Diff-mode answers return every file in full, also an upper bound.
+    """
+
+    def __init__(self, components_per_page: int = 1, assume_interface_change: bool = True):
+        self.components_per_page = components_per_page
+        self.assume_interface_change = assume_interface_change
+        self.calls: List[Dict] = []
+        self._job: Optional[Dict] = None
+
+    @contextmanager
+    def job(self, job_id: str, inputs: Dict):
+        """Attribute the calls made inside the block to `job_id`, answering from its `inputs`."""
+        components = inputs.get("page_angular_components_code") or inputs.get("components_json") or {}
+        components = components if isinstance(components, dict) else {}
+        by_size = sorted(components, key=lambda name: -sum(len(str(code)) for code in (components[name] or {}).values()))
+        targets = by_size[:self.components_per_page] or [
+            str(name) for name in (inputs.get("page_angular_components") or [])[:self.components_per_page]
+        ] or ["Component"]
+        self._job = {"id": job_id, "components": components, "targets": targets, "next": 0,
+                     "page_name": inputs.get("page_name", job_id), "page": inputs.get("page_angular_code", "")}
+        try:
+            yield self
+        finally:
+            self._job = None
+
+    def record(self, task: Optional[str], tier: str, model_name: str, prompt_tokens: int, completion_tokens: int,
+               job: Optional[str] = None, continuation: bool = False):
+        self.calls.append({"job": job or (self._job or {}).get("id"), "task": task or "default", "tier": tier,
+                           "model": model_name, "prompt_tokens": prompt_tokens,
+                           "completion_tokens": completion_tokens, "continuation": continuation})
+
+    def _model_name(self, tier: str, model) -> str:
+        if model is not None:
+            return getattr(model, "model_name", None) or llm.DEFAULT_MODEL
+        return get_router().model_name(tier)
+
+    def text(self, prompt: str, task: Optional[str], tier: str, model=None) -> str:
+        """Free-text call: the completion is budgeted like the scheduler does."""
+        model_name = self._model_name(tier, model)
+        self.record(task, tier, model_name, count_tokens(prompt, model_name), DEFAULT_COMPLETION_TOKENS)
+        return ""
+
+    def structured(self, prompt: str, schema_name: str, task: Optional[str], tier: str, model=None):
+        model_name = self._model_name(tier, model)
+        response = json.dumps(self._response(schema_name))
+        self.record(task, tier, model_name, count_tokens(prompt, model_name), count_tokens(response, model_name))
+        return parse_structured_output(response, schema_name)
+
+    # --- Synthesized responses ---
+    def _component(self, name: str) -> Dict:
+        files = (self._job or {}).get("components", {}).get(name) or {}
+        component = {"name": name, **{key: str(files.get(key, "")) for key in _FILE_KEYS}}
+        if self.assume_interface_change:
+            component["ts"] = _CLASS_OPEN.sub(lambda m: m.group(0) + "\n  @Input() dryRunChange?: string;",
+                                              component["ts"], count=1)
+        return component
+
+    def _page(self) -> Dict:
+        page = (self._job or {}).get("page", "")
+        if isinstance(page, dict):
+            return {"name": self._job["page_name"], **{key: str(page.get(key, "")) for key in _FILE_KEYS}}
+        return {"name": (self._job or {}).get("page_name", ""), "html": "", "css": "", "spec_ts": "", "ts": str(page)}
+
+    def _response(self, schema_name: str) -> Dict:
+        job = self._job or {"targets": ["Component"], "next": 0}
+        base = _FULL_SCHEMAS.get(schema_name, schema_name)
+        if base == "ComponentUpdateList":
+            return {"components": list(job["targets"])}
+        if base == "UpdatedComponent":
+            # Successive calls of a job (iterative flow) update the targets in order.
+            name = job["targets"][job["next"] % len(job["targets"])]
+            job["next"] += 1
+            data = self._component(name)
+        elif base == "ComponentUpdateResult":
+            data = {"updated_components": [self._component(name) for name in job["targets"]]}
+        elif base == "UpdatedPage":
+            data = self._page()
+        elif base == "VisualQAResult":
+            return {"assessment": "ACCURATE", "differences": []}
+        else:
+            raise ValueError(f"No dry-run response for schema {schema_name}")
+        return _as_edits(data) if schema_name in _FULL_SCHEMAS else data
+
+
+def _as_edits(data: Dict) -> Dict:
+    """The edit-schema form of a full-mode response: every file sent in full."""
+    if "updated_components" in data:
+        return {"updated_components": [_as_edits(component) for component in data["updated_components"]]}
+    return {"name": data["name"], **{key: {"mode": "full", "content": data[key]} for key in _FILE_KEYS}}
+
+
+@contextmanager
+def recording(recorder: DryRunRecorder):
+    """Route every model call in the process to `recorder` for the duration of the block."""
+    llm.set_dry_run(recorder)
+    try:
+        yield recorder
+    finally:
+        llm.set_dry_run(None)
+
+
+# === Wall time ===
+def call_seconds(call: Dict) -> float:
+    output_rate = OUTPUT_TOKENS_PER_SECOND.get(call["tier"], OUTPUT_TOKENS_PER_SECOND["large"])
+    return (CALL_OVERHEAD_SECONDS + call["prompt_tokens"] / PROMPT_TOKENS_PER_SECOND
+            + call["completion_tokens"] / output_rate)
+
+
+def makespan(durations: List[float], slots: int) -> float:
+    """Wall time of independent jobs on `slots` parallel workers (longest job first)."""
+    finish = [0.0] * max(1, min(slots, len(durations)))
+    for duration in sorted(durations, reverse=True):
+        heapq.heapreplace(finish, finish[0] + duration)
+    return max(finish) if durations else 0.0
+
+
+def rate_limit_seconds(calls: List[Dict]) -> float:
+    """Minimum wall time the shared scheduler's token and request budgets allow for `calls`."""
+    scheduler = get_scheduler()
+    total_tokens = sum(call["prompt_tokens"] + call["completion_tokens"] for call in calls)
+    seconds = 0.0
+    for bucket, amount in ((scheduler.tokens, total_tokens), (scheduler.requests, len(calls))):
+        if bucket:
+            seconds = max(seconds, (amount - bucket.capacity) / bucket.rate)
+    return max(seconds, 0.0)
+
+
+def call_cost(call: Dict, prices: Dict[str, Tuple[float, float]]) -> Optional[float]:
+    price = prices.get(call["model"])
+    if price is None:
+        return None
+    return (call["prompt_tokens"] * price[0] + call["completion_tokens"] * price[1]) / 1_000_000
+
+
+def summarize_calls(calls: List[Dict], workers: int, prices: Optional[Dict] = None) -> Dict:
+    """
+    Totals and per-route ("task/tier") figures for recorded calls. The calls of one job
+    run one after another; jobs run on min(`workers`, scheduler max_concurrency) slots,
+    and never faster than the scheduler's TPM/RPM budgets allow.
+    """
+    prices = PRICES_PER_MILLION if prices is None else prices
+    routes = {}
+    jobs = {}
+    for call in calls:
+        route = routes.setdefault(f"{call['task']}/{call['tier']}", {
+            "model": call["model"], "calls": 0, "continuations": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "cost_usd": 0.0,
+        })
+        route["calls"] += 1
+        route["continuations"] += call["continuation"]
+        route["prompt_tokens"] += call["prompt_tokens"]
+        route["completion_tokens"] += call["completion_tokens"]
+        cost = call_cost(call, prices)
+        route["cost_usd"] = None if cost is None or route["cost_usd"] is None else route["cost_usd"] + cost
+        jobs[call["job"]] = jobs.get(call["job"], 0.0) + call_seconds(call)
+
+    max_concurrency = get_scheduler().max_concurrency
+    slots = min(workers, max_concurrency) if max_concurrency else workers
+    costs = [route["cost_usd"] for route in routes.values()]
+    return {
+        "calls": len(calls),
+        "continuations": sum(call["continuation"] for call in calls),
+        "prompt_tokens": sum(call["prompt_tokens"] for call in calls),
+        "completion_tokens": sum(call["completion_tokens"] for call in calls),
+        "cost_usd": None if None in costs else sum(costs),
+        "routes": dict(sorted(routes.items())),
+        "concurrency": slots,
+        "sequential_seconds": sum(jobs.values()),
+        "rate_limit_seconds": rate_limit_seconds(calls),
+        "wall_seconds": max(makespan(list(jobs.values()), slots), rate_limit_seconds(calls)),
+        "tokenizer": tokenizer_name(calls[0]["model"]) if calls else tokenizer_name(llm.DEFAULT_MODEL),
+    }
+
+
+# === Page pipelines ===
+def estimate_pages(jobs: List[Dict], response_mode: str = "full", workers: int = DEFAULT_WORKERS,
+                   components_per_page: int = 1, assume_interface_change: bool = True,
+                   prices: Optional[Dict] = None) -> Dict:
+    """
+    Dry-run manifest jobs (see batch_runner.load_manifest) through their pipelines and
+    estimate the run with `workers` pages in parallel. Jobs whose inputs cannot be
+    loaded are listed under "errors".
+    """
+    start = time.perf_counter()
+    recorder = DryRunRecorder(components_per_page=components_per_page,
+                              assume_interface_change=assume_interface_change)
+    errors = {}
+    with recording(recorder):
+        for job in jobs:
+            try:
+                inputs = load_job_inputs(job)
+                with recorder.job(job["id"], inputs):
+                    PIPELINES[job.get("pipeline", "testing")](inputs, response_mode=response_mode)
+            except Exception as e:
+                errors[job["id"]] = f"{type(e).__name__}: {e}"
+    report = summarize_calls(recorder.calls, workers, prices)
+    report.update({"pages": len(jobs), "errors": errors, "elapsed_seconds": time.perf_counter() - start})
+    return report
+
+
+# === Chunked upgrade ===
+def chunk_batch_calls(batch: List[Tuple[str, str]], job: str,
+                      max_completion_tokens: int = MAX_COMPLETION_TOKENS) -> List[Dict]:
+    """
+    The calls call_llm makes for one batch, assuming every chunk comes back rewritten:
+    the first request plus one continuation per `max_completion_tokens` of output, each
+    resending the conversation so far.
+    """
+    chunks = [{"id": i, "code": code} for i, (_, code) in enumerate(batch)]
+    messages = chunk_messages(chunks)
+    router = get_router()
+    tier = router.tier_for("chunk_upgrade", estimate_tokens(messages))
+    model_name = router.model_name(tier)
+
+    answer = "".join(f"Chunk {chunk['id']}:\n{chunk['code']}\n\n" for chunk in chunks) + "---End of Output---"
+    completion = count_tokens(answer, model_name)
+    rounds = max(1, math.ceil(completion / max_completion_tokens))
+    prompt = count_message_tokens(messages, model_name)
+    # Each continuation adds the truncated answer and CONTINUE_MESSAGE to the conversation.
+    per_round = max_completion_tokens + count_tokens(CONTINUE_MESSAGE, model_name) + 2 * MESSAGE_TOKENS
+    calls = []
+    for round_index in range(rounds):
+        last = round_index == rounds - 1
+        calls.append({
+            "job": job, "task": "chunk_upgrade", "tier": tier, "model": model_name,
+            "prompt_tokens": prompt + round_index * per_round,
+            "completion_tokens": completion - round_index * max_completion_tokens if last else max_completion_tokens,
+            "continuation": round_index > 0,
+        })
+    return calls
+
+
+def estimate_files(paths: List[str], lines_per_chunk: int = 20, use_codemods: bool = True,
+                   chunks_per_call: int = CHUNKS_PER_CALL, workers: int = 1,
+                   max_completion_tokens: int = MAX_COMPLETION_TOKENS, prices: Optional[Dict] = None) -> Dict:
+    """
+    Plan the upgrade of `paths` as update_code (one path) or update_project would
+    (codemods, project-wide deduplication, `chunks_per_call` chunks per call_llm) and
+    estimate its calls. update_project runs batches one at a time unless it has a
+    journal and `workers`.
+    """
+    start = time.perf_counter()
+    plans = []
+    for path in paths:
+        with open(path, 'r') as file:
+            plans.append(plan_file(file.read(), lines_per_chunk=lines_per_chunk, use_codemods=use_codemods))
+    pending = [chunk for plan in plans for chunk in plan["pending"]]
+    batches = distinct_batches(pending, chunks_per_call)
+    calls = [call for index, batch in enumerate(batches)
+             for call in chunk_batch_calls(batch, f"batch-{index}", max_completion_tokens)]
+    report = summarize_calls(calls, workers, prices)
+    chunks = sum(len(plan["chunks"]) for plan in plans)
+    report.update({
+        "files": len(plans),
+        "chunks": chunks,
+        "local_chunks": chunks - len(pending),
+        "model_chunks": len(pending),
+        "unique_model_chunks": sum(len(batch) for batch in batches),
+        "elapsed_seconds": time.perf_counter() - start,
+    })
+    return report
+
+
+def estimate_project(src_dir: str, extensions: Tuple[str, ...] = ('.ts',), **kwargs) -> Dict:
+    """estimate_files for every file update_project would upgrade under `src_dir`."""
+    return estimate_files([os.path.join(src_dir, path) for path in project_files(src_dir, extensions)], **kwargs)
+
+
+# === Report ===
+def format_estimate(report: Dict) -> str:
+    """Render an estimate as a per-route table followed by the totals."""
+    lines = [f"{'route':<28} {'model':<14} {'calls':>6} {'cont.':>6} {'prompt tok':>11} {'compl. tok':>11} {'USD':>9}"]
+    for key, route in report["routes"].items():
+        cost = f"{route['cost_usd']:.2f}" if route["cost_usd"] is not None else "n/a"
+        lines.append(f"{key:<28} {route['model']:<14} {route['calls']:>6} {route['continuations']:>6} "
+                     f"{route['prompt_tokens']:>11} {route['completion_tokens']:>11} {cost:>9}")
+    cost = f"${report['cost_usd']:.2f}" if report["cost_usd"] is not None else "n/a (unpriced model)"
+    lines.append(f"{report['calls']} call(s) ({report['continuations']} continuation(s)), "
+                 f"{report['prompt_tokens']} prompt + {report['completion_tokens']} completion tokens "
+                 f"[{report['tokenizer']}], cost {cost}")
+    bound = "TPM/RPM limits" if report["rate_limit_seconds"] >= report["wall_seconds"] > 0 else f"concurrency {report['concurrency']}"
+    lines.append(f"~{report['wall_seconds'] / 60:.1f} min wall time under {bound} "
+                 f"({report['sequential_seconds'] / 60:.1f} min sequential); estimated in {report['elapsed_seconds']:.2f}s")
+    if "chunks" in report:
+        lines.append(f"{report['files']} file(s), {report['chunks']} chunk(s): {report['local_chunks']} resolved locally, "
+                     f"{report['unique_model_chunks']} distinct chunk(s) for the model")
+    for job_id, error in report.get("errors", {}).items():
+        lines.append(f"  {job_id}: {error}")
+    return "\n".join(lines)
+
+
+# === Main Execution ===
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate model calls, tokens, cost and wall time without calling a model.")
+    parser.add_argument("--manifest", help="Page manifest to dry-run through the page pipelines (see batch_runner.py).")
+    parser.add_argument("--project", help="Angular source tree to plan with id_chunking.update_project.")
+    parser.add_argument("--file", nargs="+", help="Files to plan with id_chunking.update_code.")
+    parser.add_argument("--workers", type=int, help=f"Parallel pages (default {DEFAULT_WORKERS}) or chunk workers (default 1).")
+    parser.add_argument("--response-mode", choices=["full", "diff"], default="full")
+    parser.add_argument("--components-per-page", type=int, default=1, help="Components each page update rewrites.")
+    parser.add_argument("--no-interface-change", action="store_true",
+                        help="Assume component interfaces stay the same, so page steps are skipped.")
+    parser.add_argument("--lines-per-chunk", type=int, default=20)
+    parser.add_argument("--chunks-per-call", type=int, default=CHUNKS_PER_CALL)
+    parser.add_argument("--json", help="Also write the estimates to this file.")
+    args = parser.parse_args()
+    if not (args.manifest or args.project or args.file):
+        parser.error("give --manifest, --project and/or --file")
+
+    estimates = {}
+    if args.manifest:
+        estimates["pages"] = estimate_pages(load_manifest(args.manifest), response_mode=args.response_mode,
+                                            workers=args.workers or DEFAULT_WORKERS,
+                                            components_per_page=args.components_per_page,
+                                            assume_interface_change=not args.no_interface_change)
+    chunk_options = {"lines_per_chunk": args.lines_per_chunk, "chunks_per_call": args.chunks_per_call,
+                     "workers": args.workers or 1}
+    if args.project:
+        estimates["project"] = estimate_project(args.project, **chunk_options)
+    if args.file:
+        estimates["files"] = estimate_files(args.file, **chunk_options)
+
+    for name, report in estimates.items():
+        print(f"== {name} ==")
+        print(format_estimate(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(estimates, f, indent=2)
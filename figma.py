@@ -1,25 +1,42 @@
-import requests
+import hashlib
 import json
+import multiprocessing
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tracing import span, traced
 
 # === Configuration ===
 # Replace these values with your actual Figma file key and your personal access token.
 FILE_KEY = 'YOUR_FIGMA_FILE_KEY'
 ACCESS_TOKEN = 'YOUR_FIGMA_ACCESS_TOKEN'
 
+# Base URL of the Figma REST API (overridable, e.g. to point at a local stub server).
+FIGMA_API_URL = os.environ.get("FIGMA_API_URL", "https://api.figma.com")
+
+# Image export: rendered images are cached under IMAGE_CACHE_DIR by file key, version and node id.
+IMAGE_CACHE_DIR = "figma_cache"
+IMAGE_IDS_PER_REQUEST = 50
+IMAGE_DOWNLOAD_WORKERS = 8
+
 # === Functions ===
-def fetch_figma_file(file_key, access_token):
+def fetch_figma_file(file_key, access_token, api_url=None):
     """
     Fetches the Figma file JSON data using the provided file key and access token.
     """
-    url = f"https://api.figma.com/v1/files/{file_key}"
+    import requests  # Imported on use so the extraction helpers work without it.
+
+    url = f"{api_url or FIGMA_API_URL}/v1/files/{file_key}"
     headers = {"X-Figma-Token": access_token}
-    response = requests.get(url, headers=headers)
+    with span("figma.fetch", file_key=file_key) as s:
+        response = requests.get(url, headers=headers)
+        s.add("bytes", len(response.content))
 
-    if response.status_code != 200:
-        raise Exception(f"Failed to fetch file: {response.status_code} {response.text}")
-    
-    return response.json()
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch file: {response.status_code} {response.text}")
+
+        return response.json()
 
 def extract_relevant_metadata(node):
     """
@@ -33,39 +50,411 @@ def extract_relevant_metadata(node):
       - text content (if it's a TEXT node)
       - children (recursively processed)
     
-    You can extend or modify this extraction based on your needs.
+    This is the "full" projection (see PROJECTIONS); use project() with a narrower
+    projection when a consumer needs less.
     """
-    filtered = {
-        "id": node.get("id"),
-        "name": node.get("name"),
-        "type": node.get("type")
-    }
-    
-    # Extract layout properties if available
-    if "absoluteBoundingBox" in node:
-        filtered["absoluteBoundingBox"] = node["absoluteBoundingBox"]
-    
-    # Extract fill information if available
-    if "fills" in node:
-        filtered["fills"] = node["fills"]
-    
-    # Extract style info if available (useful for TEXT nodes or shapes)
-    if "style" in node:
-        filtered["style"] = node["style"]
-    
-    # For text nodes, extract the characters property
-    if node.get("type") == "TEXT" and "characters" in node:
-        filtered["characters"] = node["characters"]
-    
-    # Recursively process children nodes if they exist
-    if "children" in node:
-        filtered_children = []
-        for child in node["children"]:
-            filtered_children.append(extract_relevant_metadata(child))
-        filtered["children"] = filtered_children
-    
-    return filtered
+    return _FULL_EXTRACTOR(node)
+
+# === Projections ===
+# A projection declares what extraction keeps, and compile_projection() turns it into a
+# specialized extractor function once, so no per-node work is spent deciding what to copy.
+#
+#   "fields":        keys copied from every node. True copies the whole value; a list of
+#                    sub-keys copies only those keys of a dict value (or of each dict in a
+#                    list value, e.g. each paint in "fills").
+#   "by_type":       extra fields for some node types, e.g. {"TEXT": {"characters": True}}.
+#   "max_depth":     children below this depth are dropped (the root is depth 0); None = all.
+#   "include_types": if set, only children of these types are kept (with their subtrees).
+#   "exclude_types": children of these types are dropped (with their subtrees).
+#   "skip_hidden":   drop children with "visible": false.
+#   "skip_empty":    leave out fields whose value is None, "", [] or {} (0 and false are kept).
+#
+# id, name and type are always kept. The root node is never filtered out.
+#
+# Sub-keys are copied with straight-line generated code (no per-field loop or filter
+# call), and a dict that has no unwanted keys is shared rather than copied. Measured on a
+# 2.7k-node document (benchmarks.py --only projection): "full" runs as fast as the old
+# hand-written extract_relevant_metadata; "lexicon" and "diff" take 2-2.5x as long,
+# spent building the new dicts for picked sub-keys, and the compiled "diff" is ~1.6x
+# faster than the hand-written reference for the same shape.
+PROJECTIONS = {
+    # Everything extract_relevant_metadata has always kept.
+    "full": {
+        "fields": {"absoluteBoundingBox": True, "fills": True, "style": True},
+        "by_type": {"TEXT": {"characters": True}},
+    },
+    # What design_diff compares (see design_diff.load_design).
+    "diff": {
+        "fields": {
+            "absoluteBoundingBox": ["x", "y", "width", "height"],
+            "fills": ["type", "visible", "opacity", "color", "gradientStops", "imageRef"],
+            "style": ["fontFamily", "fontWeight", "fontSize", "lineHeightPx", "letterSpacing",
+                      "textAlignHorizontal"],
+        },
+        "by_type": {"TEXT": {"characters": True}},
+    },
+    # What lexicon_index.fingerprint reads (see lexicon_index.load_design).
+    "lexicon": {
+        "fields": {
+            "absoluteBoundingBox": ["width", "height"],
+            "strokes": ["type"],
+            "effects": ["type"],
+            "cornerRadius": True,
+            "layoutMode": True,
+        },
+        "by_type": {"TEXT": {"characters": True, "style": ["fontSize", "fontWeight"]}},
+        "skip_hidden": True,
+        "skip_empty": True,
+    },
+}
+
+def _pick_lines(keys, source, target, indent):
+    """Source lines copying `keys` of the dict `source` into a new dict `target`, one test per key."""
+    lines = [f"{indent}{target} = {{}}"]
+    for key in keys:
+        lines.append(f"{indent}if {key!r} in {source}: {target}[{key!r}] = {source}[{key!r}]")
+    return lines
+
+def _field_lines(fields, indent, skip_empty, helpers, constants):
+    """
+    Source lines copying `fields` from `node` to `out`. Sub-key copies are emitted as
+    straight-line code; for list values (fills, strokes, effects) a picker function is
+    added to `helpers` and called per item. Frozen key sets go into `constants`.
+    """
+    lines = []
+    for key, keep in fields.items():
+        if key in ("id", "name", "type", "children"):
+            continue
+        if skip_empty:
+            lines.append(f"{indent}value = node.get({key!r})")
+            lines.append(f"{indent}if value or value == 0:")
+        else:
+            lines.append(f"{indent}if {key!r} in node:")
+            lines.append(f"{indent}    value = node[{key!r}]")
+        if keep is True:
+            lines.append(f"{indent}    out[{key!r}] = value")
+            continue
+        # Sub-keys of a dict value, or of each dict in a list value.
+        picker = f"_pick{len(helpers)}"
+        helpers.append("\n".join([f"def {picker}(item):",
+                                   "    if item.__class__ is not dict:",
+                                   "        return item",
+                                   *_pick_lines(keep, "item", "picked", "    "),
+                                   "    return picked"]))
+        # A dict with no unwanted keys (a bounding box, usually) is shared, as "full" does.
+        wanted = f"_KEYS{len(constants)}"
+        constants[wanted] = frozenset(keep)
+        lines.append(f"{indent}    if value.__class__ is dict:")
+        lines.append(f"{indent}        if value.keys() <= {wanted}:")
+        lines.append(f"{indent}            out[{key!r}] = value")
+        lines.append(f"{indent}        else:")
+        lines += _pick_lines(keep, "value", "picked", indent + "            ")
+        lines.append(f"{indent}            out[{key!r}] = picked")
+        lines.append(f"{indent}    elif value.__class__ is list:")
+        lines.append(f"{indent}        out[{key!r}] = [{picker}(item) for item in value]")
+        lines.append(f"{indent}    else:")
+        lines.append(f"{indent}        out[{key!r}] = value")
+    return lines
+
+def compile_projection(spec):
+    """
+    Compile a projection spec (see PROJECTIONS) into an extractor function
+    `extract(node) -> filtered node`. The generated source is kept on the function as
+    `.source` for inspection, and the child filter as `.keep(child)`.
+    """
+    unknown = set(spec) - {"fields", "by_type", "max_depth", "include_types", "exclude_types",
+                           "skip_hidden", "skip_empty"}
+    if unknown:
+        raise Exception(f"Unknown projection options: {sorted(unknown)}")
+    max_depth = spec.get("max_depth")
+    skip_empty = bool(spec.get("skip_empty"))
+    constants = {}
+    helpers = []
+
+    lines = [
+        "def extract(node, depth=0):",
+        "    node_type = node.get('type')",
+        "    out = {'id': node.get('id'), 'name': node.get('name'), 'type': node_type}",
+    ]
+    lines += _field_lines(spec.get("fields") or {}, "    ", skip_empty, helpers, constants)
+    for index, (node_type, fields) in enumerate((spec.get("by_type") or {}).items()):
+        lines.append(f"    {'if' if index == 0 else 'elif'} node_type == {node_type!r}:")
+        lines += _field_lines(fields, "        ", skip_empty, helpers, constants) or ["        pass"]
+
+    conditions = []
+    if spec.get("include_types"):
+        constants["_INCLUDE"] = frozenset(spec["include_types"])
+        conditions.append("child.get('type') in _INCLUDE")
+    if spec.get("exclude_types"):
+        constants["_EXCLUDE"] = frozenset(spec["exclude_types"])
+        conditions.append("child.get('type') not in _EXCLUDE")
+    if spec.get("skip_hidden"):
+        conditions.append("child.get('visible', True) is not False")
+    children_test = "'children' in node" + (f" and depth < {int(max_depth)}" if max_depth is not None else "")
+    # Depth is only tracked when something depends on it.
+    recurse = "extract(child, depth + 1)" if max_depth is not None else "extract(child)"
+    keep_test = " and ".join(conditions) or "True"
+    lines.append(f"    if {children_test}:")
+    if conditions:
+        lines.append(f"        out['children'] = [{recurse} for child in node['children'] if {keep_test}]")
+    else:
+        lines.append(f"        out['children'] = [{recurse} for child in node['children']]")
+    lines.append("    return out")
+    # The child filter on its own, for callers that split a document (see extract_document_parallel).
+    lines += ["", "def keep(child):", f"    return {keep_test}"]
+
+    source = "\n\n".join(helpers + ["\n".join(lines)]) + "\n"
+    namespace = dict(constants)
+    exec(compile(source, "<projection>", "exec"), namespace)
+    extract = namespace["extract"]
+    extract.keep = namespace["keep"]
+    extract.max_depth = max_depth
+    extract.source = source
+    return extract
+
+_COMPILED_PROJECTIONS = {}
+
+def projector(projection="full"):
+    """The compiled extractor for a projection name or spec, compiled on first use."""
+    if isinstance(projection, str):
+        if projection not in PROJECTIONS:
+            raise Exception(f"Unknown projection: {projection}")
+        cache_key = projection
+        spec = PROJECTIONS[projection]
+    else:
+        cache_key = json.dumps(projection, sort_keys=True, default=sorted)
+        spec = projection
+    extract = _COMPILED_PROJECTIONS.get(cache_key)
+    if extract is None:
+        extract = _COMPILED_PROJECTIONS[cache_key] = compile_projection(spec)
+    return extract
+
+def project(node, projection="full", depth=0):
+    """Extract `node` (`depth` levels below the document root) with a projection name or spec."""
+    return projector(projection)(node, depth)
+
+_FULL_EXTRACTOR = compile_projection(PROJECTIONS["full"])
+
+# === Parallel extraction by page ===
+# Document shared with forked workers: they inherit it copy-on-write instead of
+# receiving each page pickled (which would cost more than extracting it).
+_FORKED_DOCUMENT = None
+
+# Shard mode only uses a process pool for documents with at least this many nodes.
+# Measured (benchmarks.py --only parallel): writing shards costs ~16us per node serially,
+# and starting a forked pool with 2-4 workers ~20-30ms, so 2 workers break even around
+# 2.5k nodes; the margin covers pages of uneven size. Merged mode is always serial:
+# pickling every extracted page back to the parent costs more than extracting it
+# (175k nodes: 0.25s serial, 5.3s with 4 workers).
+PARALLEL_MIN_NODES = 5000
+
+def _has_nodes(node, count):
+    """Whether the tree under `node` has at least `count` nodes (stops counting there)."""
+    stack = [node]
+    seen = 0
+    while stack:
+        seen += 1
+        if seen >= count:
+            return True
+        stack.extend(stack.pop().get("children") or ())
+    return False
+
+def _forked_page(index):
+    return _FORKED_DOCUMENT["children"][index]
 
+def _extract_page_to_shard(task):
+    index_or_page, projection, path = task
+    page = _forked_page(index_or_page) if isinstance(index_or_page, int) else index_or_page
+    with open(path, "w", encoding="utf-8") as f:
+        # dumps uses the C encoder; dump streams through the pure-Python one.
+        f.write(json.dumps(project(page, projection, depth=1)))
+    return path
+
+def _shard_name(index, page):
+    safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", page.get("name") or "page").strip("_")
+    return f"{index:03d}_{safe_name or 'page'}.json"
+
+@traced("figma.extract_parallel")
+def extract_document_parallel(document, workers=None, shard_dir=None, projection="full",
+                              min_nodes=PARALLEL_MIN_NODES):
+    """
+    Extract relevant metadata from a whole document with `projection` (a name from
+    PROJECTIONS or a spec).
+
+    Without `shard_dir` this is project(document, projection), in this process: sending
+    extracted pages back from workers costs more than extracting them. With `shard_dir`
+    each top-level page (CANVAS) is written to <shard_dir>/<nnn>_<page name>.json and an
+    index.json lists the shards. Documents with at least `min_nodes` nodes are split one
+    page per task over a process pool of `workers` (default: CPU count) that writes the
+    shards directly, so nothing is sent back to the parent.
+    Returns the merged document, or the path of index.json.
+    """
+    if not shard_dir:
+        return project(document, projection)
+    extract = projector(projection)
+    all_pages = document.get("children") or []
+    if extract.max_depth is not None and extract.max_depth < 1:
+        page_indices = []
+    else:
+        page_indices = [index for index, page in enumerate(all_pages) if extract.keep(page)]
+    pages = [all_pages[index] for index in page_indices]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and not _has_nodes(document, min_nodes):
+        workers = 1
+    header = extract({key: value for key, value in document.items() if key != "children"})
+
+    os.makedirs(shard_dir, exist_ok=True)
+    shard_paths = [os.path.join(shard_dir, _shard_name(index, page)) for index, page in enumerate(pages)]
+    if workers == 1 or len(pages) <= 1:
+        for page, path in zip(pages, shard_paths):
+            _extract_page_to_shard((page, projection, path))
+    else:
+        global _FORKED_DOCUMENT
+        use_fork = "fork" in multiprocessing.get_all_start_methods()
+        tasks = [(task, projection) for task in (page_indices if use_fork else pages)]
+        context = multiprocessing.get_context("fork") if use_fork else None
+        _FORKED_DOCUMENT = document
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pages)), mp_context=context) as pool:
+                list(pool.map(_extract_page_to_shard, [task + (path,) for task, path in zip(tasks, shard_paths)]))
+        finally:
+            _FORKED_DOCUMENT = None
+
+    index_path = os.path.join(shard_dir, "index.json")
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({**header, "pages": [
+            {"id": page.get("id"), "name": page.get("name"), "shard": os.path.basename(path)}
+            for page, path in zip(pages, shard_paths)
+        ]}, f, indent=4)
+    return index_path
+
+def load_shards(index_path):
+    """Merge shards written by extract_document_parallel back into one filtered document."""
+    with open(index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    shard_dir = os.path.dirname(index_path)
+    children = []
+    for page in index["pages"]:
+        with open(os.path.join(shard_dir, page["shard"]), "r", encoding="utf-8") as f:
+            children.append(json.load(f))
+    return {**{key: value for key, value in index.items() if key != "pages"}, "children": children}
+
+# === Image export ===
+def _session(workers):
+    """A requests session whose connection pool can serve `workers` threads at once."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def fetch_file_version(file_key, access_token, session=None, api_url=None):
+    """
+    Returns the current version id of a Figma file (fetched with depth=1, so only the
+    document header is transferred).
+    """
+    session = session or _session(1)
+    response = session.get(f"{api_url or FIGMA_API_URL}/v1/files/{file_key}", params={"depth": 1},
+                           headers={"X-Figma-Token": access_token})
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch file version: {response.status_code} {response.text}")
+    return response.json()["version"]
+
+def node_content_versions(document, node_ids):
+    """
+    Content hash of each requested node's subtree. Passed as `versions` to
+    export_images, a frame is only re-rendered when the frame itself changed,
+    not whenever anything else in the file did.
+    """
+    wanted = set(node_ids)
+    versions = {}
+    stack = [document]
+    while stack and wanted:
+        node = stack.pop()
+        if node.get("id") in wanted:
+            wanted.discard(node["id"])
+            versions[node["id"]] = hashlib.sha1(json.dumps(node, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        stack.extend(node.get("children") or [])
+    return versions
+
+def image_cache_path(cache_dir, file_key, node_id, version, image_format="png", scale=1):
+    """Cache location of one rendered node image."""
+    safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", node_id)
+    safe_version = re.sub(r"[^A-Za-z0-9_-]", "_", str(version))
+    return os.path.join(cache_dir, file_key, safe_version, f"{safe_id}@{scale}x.{image_format}")
+
+def export_images(file_key, access_token, node_ids, image_format="png", scale=1, version=None, versions=None,
+                  cache_dir=IMAGE_CACHE_DIR, workers=IMAGE_DOWNLOAD_WORKERS, api_url=None):
+    """
+    Render and download images for many nodes at once.
+
+    Node ids are sent to the Figma images endpoint in batches of IMAGE_IDS_PER_REQUEST,
+    and the rendered images are downloaded concurrently over one pooled session.
+    Every image is cached by node id and version: `versions` ({node id: version}, e.g.
+    from node_content_versions) or else `version` (fetched with fetch_file_version if
+    not given). Cached images are never requested again.
+
+    Returns {node id: local file path}; nodes Figma could not render are left out.
+    """
+    api_url = api_url or FIGMA_API_URL
+    auth = {"X-Figma-Token": access_token}
+    session = _session(workers)
+    versions = versions or {}
+    if version is None and any(node_id not in versions for node_id in node_ids):
+        version = fetch_file_version(file_key, access_token, session=session, api_url=api_url)
+
+    paths = {}
+    missing = []
+    for node_id in node_ids:
+        path = image_cache_path(cache_dir, file_key, node_id, versions.get(node_id, version), image_format, scale)
+        if os.path.exists(path):
+            paths[node_id] = path
+        else:
+            missing.append(node_id)
+
+    with span("figma.export_images", requested=len(node_ids), cached=len(paths)) as s:
+        # 1. Ask Figma to render the missing nodes, a batch of ids per request.
+        urls = {}
+        for start in range(0, len(missing), IMAGE_IDS_PER_REQUEST):
+            batch = missing[start:start + IMAGE_IDS_PER_REQUEST]
+            response = session.get(f"{api_url}/v1/images/{file_key}", headers=auth,
+                                   params={"ids": ",".join(batch), "format": image_format, "scale": scale})
+            if response.status_code != 200:
+                raise Exception(f"Failed to render images: {response.status_code} {response.text}")
+            data = response.json()
+            if data.get("err"):
+                raise Exception(f"Failed to render images: {data['err']}")
+            # Nodes that could not be rendered come back as null.
+            urls.update({node_id: url for node_id, url in (data.get("images") or {}).items() if url})
+
+        # 2. Download the rendered images concurrently (no Figma token: these are storage URLs).
+        def download(node_id):
+            response = session.get(urls[node_id])
+            if response.status_code != 200:
+                raise Exception(f"Failed to download image for {node_id}: {response.status_code}")
+            path = image_cache_path(cache_dir, file_key, node_id, versions.get(node_id, version), image_format, scale)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(response.content)
+            os.replace(tmp_path, path)
+            return node_id, path, len(response.content)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for node_id, path, size in pool.map(download, list(urls)):
+                paths[node_id] = path
+                s.add("bytes", size)
+    return paths
+
+def top_level_frame_ids(document):
+    """Ids of the frames directly on each page (CANVAS) of a document."""
+    return [frame["id"] for page in document.get("children") or [] if page.get("type") == "CANVAS"
+            for frame in page.get("children") or []]
+
+@traced("figma.save_json")
 def save_json_to_file(data, filename):
     """
     Saves JSON data to a file in the current directory.
@@ -89,11 +478,24 @@ if __name__ == '__main__':
         if not document:
             raise Exception("The Figma file does not contain a 'document' node.")
         
-        filtered_data = extract_relevant_metadata(document)
+        with span("figma.extract"):
+            filtered_data = extract_document_parallel(document, workers=1)
         
         # 4. Save the filtered JSON file
         filtered_filename = os.path.join(os.getcwd(), "filtered_figma.json")
         save_json_to_file(filtered_data, filtered_filename)
+
+        # 5. Export a PNG of every top-level frame (reused from the cache when unchanged)
+        frame_ids = top_level_frame_ids(document)
+        images = export_images(FILE_KEY, ACCESS_TOKEN, frame_ids,
+                               versions=node_content_versions(document, frame_ids))
+        print(f"Exported {len(images)} frame image(s) to {IMAGE_CACHE_DIR}")
+
+        # 6. Convert the frames to AltNodes, so main.py can render them without the plugin
+        from figma_altnodes import document_to_altnodes
+
+        altnodes_filename = os.path.join(os.getcwd(), "altnodes.json")
+        save_json_to_file(document_to_altnodes(document), altnodes_filename)
         
     except Exception as e:
         print(f"Error: {e}")
@@ -1,9 +1,41 @@
-from openai import OpenAI 
-from typing import List, Dict
-from dotenv import load_dotenv
+import hashlib
+import os
+import re
+import textwrap
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Tuple
 
-load_dotenv()
-model = OpenAI()
+from codemods import apply_codemods, remaining_patch_operators, unsupported_patterns
+from model_router import get_router
+from rate_limiter import estimate_tokens, get_scheduler, prompt_key
+from tracing import traced
+from upgrade_journal import UpgradeJournal
+
+# Used to estimate the time saved by local rewrites when no chunk was sent to the model.
+ESTIMATED_MODEL_SECONDS_PER_CHUNK = 2.0
+
+# Maximum number of chunks sent in a single call_llm request.
+CHUNKS_PER_CALL = 40
+
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    Create the OpenAI client on first use.
+    openai and python-dotenv are imported here so importing this module stays cheap.
+    """
+    from openai import OpenAI
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return OpenAI()
+
+def __getattr__(name):
+    # Backwards compatibility for code that used the module-level `model` client.
+    if name == "model":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def chunk_code(code: str, lines_per_chunk: int = 20) -> List[Dict]:
     """
@@ -19,24 +51,16 @@ def chunk_code(code: str, lines_per_chunk: int = 20) -> List[Dict]:
         chunks.append({"id": chunk_id, "code": chunk_text})
     return chunks
 
-def call_llm(chunks: List[Dict]) -> str:
+# Follow-up user message sent when a response ends without the termination marker.
+CONTINUE_MESSAGE = (
+    "It appears your previous response was truncated. "
+    "Please continue outputting the rest of the upgraded code chunks in the same format, "
+    "without repeating the previous content."
+)
+
+def chunk_messages(chunks: List[Dict]) -> List[Dict]:
     """
-    Call the LLM with a prompt containing all code chunks.
-    The prompt instructs the LLM to upgrade the Angular code from version 7 to 15,
-    and to output only the upgraded chunk for each chunk ID.
-    
-    The expected response format is:
-    
-      Chunk 0:
-      <upgraded code>
-      
-      Chunk 1:
-      <upgraded code>
-      
-    The system instructs the LLM to include a final line that reads '---End of Output---'
-    when it has finished outputting all the necessary chunks. If that termination marker
-    is not present in the response, the function appends the output as an assistant message,
-    sends a follow-up user message requesting the remaining content, and repeats until complete.
+    The system and initial user messages call_llm sends for `chunks`.
     """
     # Build the initial prompt containing all chunks.
     chunks_text = ""
@@ -44,7 +68,7 @@ def call_llm(chunks: List[Dict]) -> str:
         chunks_text += f"Chunk {chunk['id']}:\n{chunk['code']}\n\n"
 
     # Create the conversation history with system and initial user message.
-    messages = [
+    return [
         {
             "role": "system",
             "content": (
@@ -64,16 +88,54 @@ def call_llm(chunks: List[Dict]) -> str:
             "content": f"Here are the code chunks:\n\n{chunks_text}"
         }
     ]
+
+@traced("chunks.call_llm", result_bytes=True)
+def call_llm(chunks: List[Dict]) -> str:
+    """
+    Call the LLM with a prompt containing all code chunks.
+    The prompt instructs the LLM to upgrade the Angular code from version 7 to 15,
+    and to output only the upgraded chunk for each chunk ID.
+    
+    The expected response format is:
+    
+      Chunk 0:
+      <upgraded code>
+      
+      Chunk 1:
+      <upgraded code>
+      
+    The system instructs the LLM to include a final line that reads '---End of Output---'
+    when it has finished outputting all the necessary chunks. If that termination marker
+    is not present in the response, the function appends the output as an assistant message,
+    sends a follow-up user message requesting the remaining content, and repeats until complete.
+    """
+    messages = chunk_messages(chunks)
     
     full_response = ""
     complete = False
 
+    # Short batches go to the fast tier (see model_router.py); continuations stay on the same model.
+    router = get_router()
+    tier = router.tier_for("chunk_upgrade", estimate_tokens(messages))
+    model_name = router.model_name(tier)
+
     while not complete:
-        # Call the LLM with the entire conversation history.
-        response = model.chat.completions.create(
-            model="gpt-4o",  # Replace with the correct model name.
-            messages=messages,
-        )
+        # Call the LLM with the entire conversation history, within the shared rate limits.
+        prompt_tokens = estimate_tokens(messages)
+        start = time.perf_counter()
+        try:
+            response = get_scheduler().run(
+                lambda: get_client().chat.completions.create(
+                    model=model_name,
+                    messages=messages,
+                ),
+                prompt_tokens,
+                key=prompt_key(model_name, messages),
+            )
+        except Exception:
+            router.record_call("chunk_upgrade", tier, time.perf_counter() - start, prompt_tokens, error=True)
+            raise
+        router.record_call("chunk_upgrade", tier, time.perf_counter() - start, prompt_tokens)
         answer = response.choices[0].message.content.strip()
         
         # Append the answer to the overall response.
@@ -92,40 +154,304 @@ def call_llm(chunks: List[Dict]) -> str:
             # Add a follow-up user message asking for the rest of the content.
             messages.append({
                 "role": "user",
-                "content": (
-                    "It appears your previous response was truncated. "
-                    "Please continue outputting the rest of the upgraded code chunks in the same format, "
-                    "without repeating the previous content."
-                )
+                "content": CONTINUE_MESSAGE
             })
 
     # Remove the termination marker before returning.
     full_response = full_response.replace('---End of Output---', '').strip()
+    # Chunk ids the model made up mean the response cannot be mapped back onto the file.
+    router.record_parse("chunk_upgrade", tier, ok=set(parse_llm_chunks(full_response)) <= {c["id"] for c in chunks})
     return full_response
 
-def update_code(file_path: str, output_path: str = None, lines_per_chunk: int = 20) -> str:
+def parse_llm_chunks(response: str) -> Dict[int, str]:
     """
-    Read the Angular code from a file, split it into numbered chunks,
-    send all the chunks at once to the LLM to get an upgraded version,
-    and then optionally write the upgraded code (with chunk ids) to an output file.
-    
-    The response will include upgraded code along with the corresponding chunk IDs.
+    Parse the "Chunk <id>:\n<upgraded code>" blocks returned by call_llm
+    into a dict mapping chunk id to upgraded code.
+    """
+    upgrades = {}
+    matches = list(re.finditer(r"^Chunk (\d+):[ \t]*\n?", response, re.MULTILINE))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+        upgrades[int(match.group(1))] = response[match.end():end].strip("\n")
+    return upgrades
+
+def assemble_chunks(chunks: List[Dict], upgrades: Dict[int, str], trailing_newline: bool = False) -> str:
+    """
+    Rebuild the full file from its chunks, using the upgraded code for the chunk ids in `upgrades`.
+    """
+    code = '\n'.join(upgrades.get(chunk["id"], chunk["code"]) for chunk in chunks)
+    return code + '\n' if trailing_newline else code
+
+def normalize_chunk(text: str) -> Tuple[str, str]:
+    """
+    Normalize a chunk for deduplication: unify line endings, drop trailing whitespace
+    and remove the common indentation. Returns (normalized text, removed indentation).
+    """
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').split('\n')]
+    indents = [len(line) - len(line.lstrip()) for line in lines if line]
+    width = min(indents) if indents else 0
+    indent = next((line[:width] for line in lines if line), "")
+    return '\n'.join(line[width:] for line in lines), indent
+
+def chunk_key(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+@traced("chunks.plan")
+def plan_file(code: str, lines_per_chunk: int = 20, use_codemods: bool = True) -> Dict:
+    """
+    Apply the local codemods to a file and split it into chunks.
+    Returns {"chunks", "pending", "codemods", "trailing_newline"} where `pending` are the
+    chunks that still need the model, each annotated with its normalized "key" and "indent".
+    """
+    codemod_stats = {}
+    if use_codemods:
+        code, codemod_stats = apply_codemods(code)
+    chunks = chunk_code(code, lines_per_chunk=lines_per_chunk)
+    if use_codemods:
+        patch_operators = remaining_patch_operators(code)
+        pending = [chunk for chunk in chunks if unsupported_patterns(chunk["code"], patch_operators)]
+    else:
+        pending = list(chunks)
+    for chunk in pending:
+        normalized, indent = normalize_chunk(chunk["code"])
+        chunk["key"], chunk["normalized"], chunk["indent"] = chunk_key(normalized), normalized, indent
+    return {"chunks": chunks, "pending": pending, "codemods": codemod_stats, "trailing_newline": code.endswith('\n')}
+
+def distinct_batches(pending: List[Dict], chunks_per_call: int = CHUNKS_PER_CALL) -> List[List[Tuple[str, str]]]:
+    """
+    The distinct pending chunks (by normalized-content key) as call_llm batches of
+    (key, normalized code), `chunks_per_call` per batch.
+    """
+    distinct = {}
+    for chunk in pending:
+        distinct.setdefault(chunk["key"], chunk["normalized"])
+    items = list(distinct.items())
+    return [items[offset:offset + chunks_per_call] for offset in range(0, len(items), chunks_per_call)]
+
+def upgrade_distinct_chunks(pending: List[Dict], chunks_per_call: int = CHUNKS_PER_CALL) -> Tuple[Dict[str, str], Dict]:
+    """
+    Send each distinct pending chunk (by normalized-content key) to the model exactly once,
+    `chunks_per_call` chunks per call_llm request.
+    Returns ({key: upgraded normalized code} for chunks the model changed, stats).
+    """
+    batches = distinct_batches(pending, chunks_per_call)
+    results = {}
+    start = time.perf_counter()
+    for batch in batches:
+        upgrades = parse_llm_chunks(call_llm([{"id": i, "code": code} for i, (_, code) in enumerate(batch)]))
+        for i, (key, _) in enumerate(batch):
+            if i in upgrades:
+                results[key] = upgrades[i]
+    unique = sum(len(batch) for batch in batches)
+    return results, {
+        "model_chunks": len(pending),
+        "unique_model_chunks": unique,
+        "model_seconds": time.perf_counter() - start if unique else 0.0,
+    }
+
+def work_journal(journal: UpgradeJournal, chunks_per_call: int = CHUNKS_PER_CALL, worker: str = None) -> int:
+    """
+    Claim pending chunks from `journal` and upgrade them until none are left to claim.
+    Safe to run from several threads or processes at once. A failed call_llm returns
+    its chunks to the queue (up to the journal's max_attempts).
+    Returns the number of chunks this worker completed.
+    """
+    completed = 0
+    while True:
+        batch = journal.claim(chunks_per_call, worker)
+        if not batch:
+            return completed
+        try:
+            upgrades = parse_llm_chunks(call_llm([{"id": i, "code": chunk["code"]} for i, chunk in enumerate(batch)]))
+        except Exception as e:
+            journal.fail([chunk["key"] for chunk in batch], f"{type(e).__name__}: {e}")
+            continue
+        journal.complete({chunk["key"]: upgrades.get(i) for i, chunk in enumerate(batch)})
+        completed += len(batch)
+
+def upgrade_journaled_chunks(pending: List[Dict], journal: UpgradeJournal, workers: int = 1,
+                             chunks_per_call: int = CHUNKS_PER_CALL) -> Tuple[Dict[str, str], set, Dict]:
+    """
+    Journaled counterpart of upgrade_distinct_chunks: register the distinct chunks, let
+    `workers` threads drain the journal, then read back the results. Chunks finished by an
+    earlier (interrupted) run are not sent again.
+    Returns (results, keys that are still not done, stats).
+    """
+    distinct = {}
+    for chunk in pending:
+        distinct.setdefault(chunk["key"], chunk["normalized"])
+    journal.add_chunks(distinct)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda _: work_journal(journal, chunks_per_call), range(workers)))
+    model_seconds = time.perf_counter() - start
+
+    states = journal.results(distinct)
+    results = {key: state["result"] for key, state in states.items()
+               if state["status"] == "done" and state["result"] is not None}
+    incomplete = {key for key in distinct if states.get(key, {}).get("status") != "done"}
+    return results, incomplete, {
+        "model_chunks": len(pending),
+        "unique_model_chunks": len(distinct),
+        "model_seconds": model_seconds,
+    }
+
+@traced("chunks.assemble", result_bytes=True)
+def assemble_file(plan: Dict, results: Dict[str, str]) -> str:
+    """Fan the upgraded distinct chunks back out to every occurrence in a planned file."""
+    upgrades = {}
+    for chunk in plan["pending"]:
+        if chunk["key"] in results:
+            upgrades[chunk["id"]] = textwrap.indent(results[chunk["key"]], chunk["indent"])
+    return assemble_chunks(plan["chunks"], upgrades, trailing_newline=plan["trailing_newline"])
+
+def upgrade_code(code: str, lines_per_chunk: int = 20, use_codemods: bool = True) -> Tuple[str, Dict]:
+    """
+    Upgrade Angular 7 code to Angular 15 and return (upgraded code, stats).
+
+    The deterministic rewrites in codemods.py run over the whole file first. Only the
+    chunks that still contain patterns the rewrites do not handle are sent to the LLM,
+    each distinct chunk once; with use_codemods=False every chunk is sent, as before.
+    """
+    plan = plan_file(code, lines_per_chunk=lines_per_chunk, use_codemods=use_codemods)
+    results, model_stats = upgrade_distinct_chunks(plan["pending"])
+    stats = {"files": 1, "chunks": len(plan["chunks"]), "codemods": plan["codemods"], **model_stats}
+    return assemble_file(plan, results), stats
+
+def summarize_stats(stats: Dict) -> Dict:
+    """
+    Add the report figures to run stats: fraction of chunks resolved locally, duplicates
+    served from a single model result, and the estimated wall time saved (measured model
+    time per distinct chunk, or ESTIMATED_MODEL_SECONDS_PER_CHUNK if nothing was sent).
+    """
+    chunks = stats["chunks"]
+    local_chunks = chunks - stats["model_chunks"]
+    duplicate_chunks = stats["model_chunks"] - stats["unique_model_chunks"]
+    unique = stats["unique_model_chunks"]
+    per_chunk = stats["model_seconds"] / unique if unique else ESTIMATED_MODEL_SECONDS_PER_CHUNK
+    return {
+        **stats,
+        "local_chunks": local_chunks,
+        "duplicate_chunks": duplicate_chunks,
+        "local_fraction": local_chunks / chunks if chunks else 0.0,
+        "estimated_seconds_saved": (local_chunks + duplicate_chunks) * per_chunk,
+    }
+
+def format_report(summary: Dict) -> str:
+    report = (
+        f"{summary['files']} file(s), {summary['chunks']} chunk(s): "
+        f"{summary['local_chunks']} resolved locally ({summary['local_fraction']:.0%}), "
+        f"{summary['unique_model_chunks']} distinct chunk(s) sent to the model "
+        f"({summary['duplicate_chunks']} duplicate(s) reused) in {summary['model_seconds']:.1f}s, "
+        f"~{summary['estimated_seconds_saved']:.1f}s saved"
+    )
+    if summary.get("incomplete_files"):
+        report += (f"\n{summary['incomplete_files']} file(s) still have unfinished chunks; "
+                   "rerun with the same journal to resume.")
+    return report
+
+@traced("chunks.update_code")
+def update_code(file_path: str, output_path: str = None, lines_per_chunk: int = 20,
+                use_codemods: bool = True) -> Tuple[str, Dict]:
+    """
+    Read the Angular code from a file, apply the local codemods, send the chunks that
+    still need it to the LLM, and return (the fully upgraded file, summarized stats).
+    Optionally write the upgraded code to an output file.
     """
     with open(file_path, 'r') as file:
         code = file.read()
     
-    # Split code into chunks with an associated id.
-    chunks = chunk_code(file_path, lines_per_chunk=lines_per_chunk)
-    
-    # Call the LLM once with all chunks as input.
-    upgraded_response = call_llm(chunks)
+    upgraded_code, stats = upgrade_code(code, lines_per_chunk=lines_per_chunk, use_codemods=use_codemods)
     
     if output_path:
         with open(output_path, 'w') as file:
-            file.write(upgraded_response)
+            file.write(upgraded_code)
     
-    return upgraded_response
+    return upgraded_code, summarize_stats(stats)
+
+def project_files(src_dir: str, extensions: Tuple[str, ...] = ('.ts',)) -> List[str]:
+    """Relative paths of the files to upgrade under `src_dir` (skipping node_modules)."""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        dirnames[:] = sorted(d for d in dirnames if d != 'node_modules')
+        for filename in sorted(filenames):
+            if filename.endswith(extensions):
+                paths.append(os.path.relpath(os.path.join(dirpath, filename), src_dir))
+    return paths
+
+@traced("chunks.update_project")
+def update_project(src_dir: str, output_dir: str, lines_per_chunk: int = 20, use_codemods: bool = True,
+                   extensions: Tuple[str, ...] = ('.ts',), chunks_per_call: int = CHUNKS_PER_CALL,
+                   journal_path: str = None, workers: int = 1) -> Dict:
+    """
+    Upgrade every file with one of `extensions` under `src_dir`, mirroring the tree into
+    `output_dir`. Chunks are deduplicated across the whole project, so boilerplate that
+    repeats across files (import blocks, spec skeletons, module declarations) is sent to
+    the model once and the result is reused for every occurrence.
+
+    With `journal_path`, per-file and per-chunk progress is recorded in a SQLite journal
+    (see upgrade_journal.py): rerunning after a crash or a failed call_llm skips files that
+    are already written and chunks that are already upgraded, and `workers` threads share
+    the chunk queue. Each run first releases the chunks claimed by a crashed run on this
+    machine and retries the chunks that failed in earlier runs. Files with unfinished
+    chunks are left for the next run.
+    Returns the summarized stats (see format_report).
+    """
+    journal = UpgradeJournal(journal_path) if journal_path else None
+    if journal:
+        journal.release_abandoned()
+        journal.retry_failed()
+    plans = {}
+    source_hashes = {}
+    resumed_files = 0
+    for rel_path in project_files(src_dir, extensions):
+        with open(os.path.join(src_dir, rel_path), 'r') as file:
+            code = file.read()
+        source_hash = hashlib.sha1(code.encode('utf-8')).hexdigest()
+        if journal and journal.file_done(rel_path, source_hash) and os.path.exists(os.path.join(output_dir, rel_path)):
+            resumed_files += 1
+            continue
+        plans[rel_path] = plan_file(code, lines_per_chunk=lines_per_chunk, use_codemods=use_codemods)
+        source_hashes[rel_path] = source_hash
+
+    pending = [chunk for plan in plans.values() for chunk in plan["pending"]]
+    if journal:
+        results, incomplete, model_stats = upgrade_journaled_chunks(pending, journal, workers=workers,
+                                                                    chunks_per_call=chunks_per_call)
+    else:
+        results, model_stats = upgrade_distinct_chunks(pending, chunks_per_call=chunks_per_call)
+        incomplete = set()
+
+    incomplete_files = 0
+    for rel_path, plan in plans.items():
+        if any(chunk["key"] in incomplete for chunk in plan["pending"]):
+            incomplete_files += 1
+            journal.mark_file(rel_path, source_hashes[rel_path], "pending")
+            continue
+        output_path = os.path.join(output_dir, rel_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w') as file:
+            file.write(assemble_file(plan, results))
+        if journal:
+            journal.mark_file(rel_path, source_hashes[rel_path], "done")
+
+    codemod_totals = {}
+    for plan in plans.values():
+        for name, count in plan["codemods"].items():
+            codemod_totals[name] = codemod_totals.get(name, 0) + count
+    summary = summarize_stats({
+        "files": len(plans),
+        "chunks": sum(len(plan["chunks"]) for plan in plans.values()),
+        "codemods": codemod_totals,
+        "resumed_files": resumed_files,
+        "incomplete_files": incomplete_files,
+        **model_stats,
+    })
+    return summary
 
 
-updated_code = update_code('angular_7.ts', 'angular_15.ts')
-print(updated_code)
\ No newline at end of file
+if __name__ == '__main__':
+    updated_code, summary = update_code('angular_7.ts', 'angular_15.ts')
+    print(format_report(summary))
+    print(updated_code)
@@ -0,0 +1,385 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
+
+from main import generate_node_html_css, generate_node_html_reuse, html_document, safe_css_identifier
+from tracing import span
+
+# === Live AltNode ingest ===
+# The Figma plugin (code.ts / ui.html) posts each top-level AltNode as soon as it has
+# been built. The server keeps the latest AltNodes per session, renders every
+# top-level node into its own HTML/CSS fragment with the main.py renderer and only
+# re-renders the nodes whose content changed. The assembled document is served at
+# /preview.html, and / shows it live: the page reloads on every update it is told
+# about over /events (server-sent events).
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Requests with a larger body are rejected (413).
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Idle /events connections get a keep-alive comment this often (seconds).
+EVENT_KEEPALIVE = 15
+
+# Cross-origin callers allowed to read and change previews. The Figma plugin UI runs in
+# an iframe with an opaque ("null") origin; the live page itself is same-origin. Other
+# web pages must not be able to post HTML/SVG into a localhost preview.
+ALLOWED_ORIGINS = ("null",)
+
+# Session names are echoed into the live page, so only these characters are accepted (400 otherwise).
+SESSION_NAME = re.compile(r"[\w-]+", re.ASCII)
+
+LIVE_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8" />
+  <title>AltNode Live Preview</title>
+  <style>html, body, iframe {{ margin: 0; border: 0; width: 100%; height: 100%; }}</style>
+</head>
+<body>
+  <iframe id="preview" src="/preview.html?session={session}"></iframe>
+  <script>
+    const events = new EventSource("/events?session={session}");
+    events.onmessage = () => {{
+      document.getElementById("preview").contentWindow.location.reload();
+    }};
+  </script>
+</body>
+</html>"""
+
+
+def parse_batch(payload) -> Tuple[List[Dict], bool, List[str]]:
+    """
+    Validate a POST /altnodes body: a list of AltNodes, or {"altNodes": [...],
+    "replace": bool, "remove": [ids]}. Returns (alt_nodes, replace, remove); raises
+    ValueError for anything else.
+    """
+    if isinstance(payload, list):
+        payload = {"altNodes": payload}
+    if not isinstance(payload, dict):
+        raise ValueError("expected a list of AltNodes or an object")
+    alt_nodes = payload.get("altNodes") or []
+    replace = payload.get("replace", False)
+    remove = payload.get("remove") or []
+    if not isinstance(alt_nodes, list) or not all(
+            isinstance(node, dict) and isinstance(node.get("id"), str) for node in alt_nodes):
+        raise ValueError("altNodes must be a list of AltNodes with string ids")
+    if not isinstance(replace, bool):
+        raise ValueError("replace must be a boolean")
+    if not isinstance(remove, list) or not all(isinstance(node_id, str) for node_id in remove):
+        raise ValueError("remove must be a list of node ids")
+    return alt_nodes, replace, remove
+
+
+def node_digest(node: Dict) -> str:
+    """Content hash of an AltNode subtree; a fragment is re-rendered only when it changes."""
+    return hashlib.sha1(json.dumps(node, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class PreviewSession:
+    """
+    The AltNodes received for one preview, in arrival order, each with its rendered
+    fragment. Thread-safe: the plugin posts while browsers read.
+    """
+
+    def __init__(self, reuse_templates: bool = True):
+        self.reuse_templates = reuse_templates
+        self.nodes: Dict[str, Dict] = {}
+        self.fragments: Dict[str, Dict] = {}
+        self.version = 0
+        self._document: Optional[str] = None
+        self._changed = threading.Condition()
+
+    def render_fragment(self, node: Dict) -> Dict:
+        """HTML and CSS rules of one top-level AltNode, with template classes namespaced by its id."""
+        css_rules = {}
+        if self.reuse_templates:
+            html = generate_node_html_reuse(node, css_rules, [0], f"{safe_css_identifier(node['id'])}_t")
+        else:
+            html = generate_node_html_css(node, css_rules)
+        return {"html": html, "css_rules": css_rules}
+
+    def apply(self, alt_nodes: List[Dict], replace: bool = False, remove: Optional[List[str]] = None) -> Dict:
+        """
+        Add or update top-level AltNodes (matched by id). With `replace`, nodes not in
+        this batch are dropped first; `remove` drops nodes by id.
+        The update is atomic: the new state is built on copies and swapped in only after
+        every fragment rendered, so a node that fails to render leaves the session as it was.
+        Returns {"version", "nodes", "rendered", "reused", "removed"}.
+        """
+        with span("ingest.apply", batch=len(alt_nodes)) as s, self._changed:
+            nodes, fragments = dict(self.nodes), dict(self.fragments)
+            dropped = set(remove or [])
+            if replace:
+                batch_ids = {node["id"] for node in alt_nodes}
+                dropped.update(node_id for node_id in nodes if node_id not in batch_ids)
+            removed = 0
+            for node_id in dropped:
+                if nodes.pop(node_id, None) is not None:
+                    del fragments[node_id]
+                    removed += 1
+
+            rendered = reused = 0
+            for node in alt_nodes:
+                digest = node_digest(node)
+                fragment = fragments.get(node["id"])
+                if fragment is not None and fragment["digest"] == digest:
+                    reused += 1
+                    continue
+                fragment = self.render_fragment(node)
+                fragment["digest"] = digest
+                fragments[node["id"]] = fragment
+                nodes[node["id"]] = node
+                rendered += 1
+            s.set(rendered=rendered, reused=reused, removed=removed)
+
+            if rendered or removed:
+                self.nodes, self.fragments = nodes, fragments
+                self.version += 1
+                self._document = None
+                self._changed.notify_all()
+            return {"version": self.version, "nodes": len(self.nodes), "rendered": rendered, "reused": reused,
+                    "removed": removed}
+
+    def clear(self) -> Dict:
+        return self.apply([], replace=True)
+
+    def document(self) -> str:
+        """The full HTML document of the current AltNodes (assembled once per version)."""
+        with self._changed:
+            if self._document is None:
+                css_rules = {}
+                body_content = ""
+                for fragment in self.fragments.values():
+                    css_rules.update(fragment["css_rules"])
+                    body_content += fragment["html"]
+                self._document = html_document(body_content, css_rules)
+            return self._document
+
+    def alt_nodes(self) -> List[Dict]:
+        with self._changed:
+            return list(self.nodes.values())
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """Block until the session is past `version` (or `timeout` seconds pass); returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class IngestServer(ThreadingHTTPServer):
+    """HTTP server holding one PreviewSession per session name."""
+    daemon_threads = True
+
+    def __init__(self, address, reuse_templates: bool = True, output_path: Optional[str] = None,
+                 allowed_origins: Tuple[str, ...] = ALLOWED_ORIGINS):
+        super().__init__(address, IngestHandler)
+        self.reuse_templates = reuse_templates
+        self.output_path = output_path
+        self.allowed_origins = set(allowed_origins)
+        self.sessions: Dict[str, PreviewSession] = {}
+        self._sessions_lock = threading.Lock()
+
+    def session(self, name: str) -> PreviewSession:
+        with self._sessions_lock:
+            if name not in self.sessions:
+                self.sessions[name] = PreviewSession(self.reuse_templates)
+            return self.sessions[name]
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """
+    POST   /altnodes       a JSON list of AltNodes, or {"altNodes": [...], "replace": bool, "remove": [ids]}
+    DELETE /altnodes       drop all AltNodes
+    GET    /altnodes       the current AltNodes as JSON
+    GET    /preview.html   the rendered document
+    GET    /events         server-sent events: the new version after every change
+    GET    /               live preview page
+    Every endpoint takes ?session=<name> (default "default"; letters, digits, "_" and "-",
+    otherwise 400). Requests from an origin
+    other than the server itself or one of the server's allowed_origins get 403.
+    """
+    server: IngestServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _session_name(self) -> str:
+        return parse_qs(urlparse(self.path).query).get("session", ["default"])[0]
+
+    def _session(self) -> PreviewSession:
+        return self.server.session(self._session_name())
+
+    def _reject_session(self) -> bool:
+        """Answer 400 (and return True) for a session name outside SESSION_NAME."""
+        if SESSION_NAME.fullmatch(self._session_name()):
+            return False
+        self._send(400, {"error": "Invalid session name: use letters, digits, '_' and '-'"})
+        return True
+
+    def _origin_allowed(self) -> bool:
+        origin = self.headers.get("Origin")
+        if origin is None or origin in self.server.allowed_origins:
+            return True
+        host = self.headers.get("Host")
+        return bool(host) and origin in (f"http://{host}", f"https://{host}")
+
+    def _cors_headers(self):
+        origin = self.headers.get("Origin")
+        if origin in self.server.allowed_origins:
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Vary", "Origin")
+
+    def _reject_origin(self) -> bool:
+        """Answer 403 (and return True) for requests from an origin that is not allowed."""
+        if self._origin_allowed():
+            return False
+        self._send(403, {"error": f"Origin not allowed: {self.headers.get('Origin')}"})
+        return True
+
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self._cors_headers()
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_OPTIONS(self):
+        # CORS preflight: the plugin UI runs in an iframe with a null origin.
+        if self._reject_origin():
+            return
+        self.send_response(204)
+        self._cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def do_GET(self):
+        if self._reject_origin() or self._reject_session():
+            return
+        path = urlparse(self.path).path
+        session = self._session()
+        if path == "/":
+            self._send(200, LIVE_PAGE.format(session=html.escape(quote(self._session_name()))), "text/html")
+        elif path == "/preview.html":
+            self._send(200, session.document(), "text/html")
+        elif path == "/altnodes":
+            self._send(200, session.alt_nodes())
+        elif path == "/events":
+            self._stream_events(session)
+        else:
+            self._send(404, {"error": f"Unknown path: {path}"})
+
+    def do_POST(self):
+        if self._reject_origin() or self._reject_session():
+            return
+        path = urlparse(self.path).path
+        if path != "/altnodes":
+            self._send(404, {"error": f"Unknown path: {path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": f"Body larger than {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            alt_nodes, replace, remove = parse_batch(json.loads(self.rfile.read(length) or b"[]"))
+        except ValueError as e:
+            self._send(400, {"error": f"Invalid AltNode batch: {e}"})
+            return
+
+        start = time.perf_counter()
+        session = self._session()
+        try:
+            result = session.apply(alt_nodes, replace=replace, remove=remove)
+            document = session.document()
+        except (KeyError, TypeError) as e:
+            self._send(400, {"error": f"Invalid AltNode: {e!r}"})
+            return
+        result["ms"] = (time.perf_counter() - start) * 1000
+        if self.server.output_path:
+            with open(self.server.output_path, "w", encoding="utf-8") as out:
+                out.write(document)
+        self._send(200, result)
+
+    def do_DELETE(self):
+        if self._reject_origin() or self._reject_session():
+            return
+        path = urlparse(self.path).path
+        if path != "/altnodes":
+            self._send(404, {"error": f"Unknown path: {path}"})
+            return
+        self._send(200, self._session().clear())
+
+    def _stream_events(self, session: PreviewSession):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self._cors_headers()
+        self.end_headers()
+        version = session.version
+        try:
+            while True:
+                current = session.wait_for_change(version, EVENT_KEEPALIVE)
+                if current == version:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    version = current
+                    self.wfile.write(f"data: {version}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, reuse_templates: bool = True,
+                output_path: Optional[str] = None, allowed_origins: Tuple[str, ...] = ALLOWED_ORIGINS) -> IngestServer:
+    """Create (but do not start) an ingest server; port 0 picks a free port."""
+    return IngestServer((host, port), reuse_templates=reuse_templates, output_path=output_path,
+                        allowed_origins=allowed_origins)
+
+
+def start_in_thread(server: IngestServer) -> threading.Thread:
+    """Serve in a daemon thread (for tests and scripts posting synthetic AltNodes); stop with server.shutdown()."""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+# === Main Execution ===
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a live HTML preview of AltNodes posted by the Figma plugin.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--load", help="AltNode JSON file to preload into the default session.")
+    parser.add_argument("--output", help="Also write the rendered document here after every update.")
+    parser.add_argument("--no-reuse", action="store_true", help="Render one CSS rule per node (no templates).")
+    parser.add_argument("--allow-origin", action="append", default=list(ALLOWED_ORIGINS),
+                        help="Additional origin allowed to post AltNodes (repeatable).")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, reuse_templates=not args.no_reuse,
+                         output_path=os.path.abspath(args.output) if args.output else None,
+                         allowed_origins=tuple(args.allow_origin))
+    if args.load:
+        with open(args.load, "r", encoding="utf-8") as f:
+            print(server.session("default").apply(json.load(f)))
+    print(f"AltNode ingest on http://{args.host}:{server.server_address[1]}/ (POST /altnodes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,36 +1,34 @@
-from typing import List
-from pydantic import BaseModel, Field
-from langchain.output_parsers import PydanticOutputParser
-
-# Updated Pydantic models
-class ComponentUpdateList(BaseModel):
-    """List of components needing updates"""
-    components: List[str] = Field(..., description="Names of components requiring updates in order")
-
-class UpdatedComponent(BaseModel):
-    """Represents the updated component."""
-    name: str = Field(..., description="The name of the updated component.")
-    html: str = Field(..., description="The updated HTML code.")
-    css: str = Field(..., description="The updated CSS code.")
-    spec_ts: str = Field(..., description="The updated spec.ts file.")
-    ts: str = Field(..., description="The updated TypeScript (.ts) code.")
-
-class UpdatedPage(BaseModel):
-    """Represents the updated page."""
-    name: str = Field(..., description="The name of the updated page.")
-    html: str = Field(..., description="The updated HTML code for the page.")
-    css: str = Field(..., description="The updated CSS code for the page.")
-    spec_ts: str = Field(..., description="The updated spec.ts file for the page.")
-    ts: str = Field(..., description="The updated TypeScript (.ts) code for the page.")
-
-# Create parsers
-list_parser = PydanticOutputParser(pydantic_object=ComponentUpdateList).get_format_instructions()
-component_parser = PydanticOutputParser(pydantic_object=UpdatedComponent).get_format_instructions()
-page_parser = PydanticOutputParser(pydantic_object=UpdatedPage).get_format_instructions()
+from component_diff import materialize_edits, response_format
+from component_interface import page_update_needed
+from design_diff import changed_components
+from llm import encode_image, invoke_structured, read_file
+from schemas import get_format_instructions, get_schema, lazy_module_attributes, schema_to_dict
+from tracing import current_span, traced
+
+# Schemas and format instructions are built on first use (see schemas.py).
+__getattr__ = lazy_module_attributes(__name__, {
+    "ComponentUpdateList": (get_schema, "ComponentUpdateList"),
+    "UpdatedComponent": (get_schema, "UpdatedComponent"),
+    "UpdatedPage": (get_schema, "UpdatedPage"),
+    "list_parser": (get_format_instructions, "ComponentUpdateList"),
+    "component_parser": (get_format_instructions, "UpdatedComponent"),
+    "page_parser": (get_format_instructions, "UpdatedPage"),
+})
 
 ##Method for analyzing and updating page for changes
-def analyze_and_update(html_path, css_path, image_path, lexicon_components, page_name, page_angular_code, components_json, user_inst):
+@traced("iterative_flow_update.analyze_and_update")
+def analyze_and_update(html_path, css_path, image_path, lexicon_components, page_name, page_angular_code, components_json, user_inst, response_mode="full", model=None, old_design=None, new_design=None, component_map=None, skip_unchanged_interface=True):
     
+    # response_mode="diff" asks for per-file unified diffs instead of full files (see component_diff.py).
+    # The page step can only use diffs when the existing page code is given as a dict of files.
+    page_mode = response_mode if isinstance(page_angular_code, dict) else "full"
+    component_schema, component_file_rule = response_format("UpdatedComponent", response_mode)
+    page_schema, page_file_rule = response_format("UpdatedPage", page_mode)
+
+    list_parser = get_format_instructions("ComponentUpdateList")
+    component_parser = get_format_instructions(component_schema)
+    page_parser = get_format_instructions(page_schema)
+
     html = read_file(html_path)
     css = read_file(css_path)
     base64_image = encode_image(image_path)
@@ -81,13 +79,23 @@ def analyze_and_update(html_path, css_path, image_path, lexicon_components, page
         <<OUTPUT>>
     """
     
-    # Call model and parse - to be replaced with existing code 
-    component_list_obj = list_parser.parse(model.invoke(analysis_prompt))
-    components_to_update = component_list_obj.components
+    # With old/new design snapshots (filtered Figma JSON or AltNodes) the changed components
+    # are found by a local structural diff; the model is only asked when the mapping is ambiguous.
+    design_changes = None
+    if old_design is not None and new_design is not None:
+        design_changes = changed_components(old_design, new_design, component_names=list(components_json),
+                                            component_map=component_map, page_component=page_name)
+
+    if design_changes is not None and not design_changes["ambiguous"]:
+        components_to_update = design_changes["components"]
+    else:
+        # Call model and parse
+        component_list_obj = invoke_structured(analysis_prompt, "ComponentUpdateList", model, task="component_list")
+        components_to_update = component_list_obj.components
     
     # Step 2: Update components with chained context
     updated_components = []
-    for component_name in enumerate(components_to_update):
+    for component_name in components_to_update:
         # Get current component state (including any previous updates)
         current_component = components_json.get(component_name, {})
         
@@ -123,7 +131,7 @@ def analyze_and_update(html_path, css_path, image_path, lexicon_components, page
 
         # COMPONENT GENERATION
         - Update the `.ts`, `.html`, `.css`, and `.spec.ts` files for the component to match the new structure.
-        - **If any file does not require changes**, provide the existing content as-is.
+        - {component_file_rule}
 
         1. **TypeScript File (.ts)**  
         - Define the component class, decorators, and metadata.  
@@ -171,8 +179,10 @@ def analyze_and_update(html_path, css_path, image_path, lexicon_components, page
         <<OUTPUT>>
         """
 
-        # Get and parse updated component - to be replaced with existing code 
-        updated_comp_obj = component_parser.parse(model.invoke(component_prompt))
+        # Get and parse updated component
+        updated_comp_obj = invoke_structured(component_prompt, component_schema, model, task="component_update")
+        if response_mode == "diff":
+            updated_comp_obj = materialize_edits(updated_comp_obj, current_component, "UpdatedComponent")
         updated_components.append(updated_comp_obj)
     
     # Create a summary: list of names and associated updated code
@@ -187,6 +197,17 @@ def analyze_and_update(html_path, css_path, image_path, lexicon_components, page
         for comp in updated_components
     }
 
+    # The page step is only needed when an updated component's interface changed (see component_interface.py).
+    if skip_unchanged_interface:
+        needed, reasons = page_update_needed([dict(code, name=name) for name, code in updated_component_codes.items()],
+                                             components_json)
+        current_span().set(page_update_needed=needed, reasons=reasons)
+        if not needed:
+            return {
+                "updated_components": [schema_to_dict(c) for c in updated_components],
+                "updated_page": None
+            }
+
     # Step 3: Update page with all new components
     page_prompt = f"""
         You are an expert Angular developer. Follow the instructions below to **update an existing Angular page** by integrating the updated component(s) provided. The target framework is Angular 18+.
@@ -215,7 +236,7 @@ def analyze_and_update(html_path, css_path, image_path, lexicon_components, page
 
         ## PAGE UPDATING
         - Update the `.ts`, `.html`, `.css`, and `.spec.ts` files for the page.
-        - **If any file does not require changes**, provide the existing content as-is.
+        - {page_file_rule}
 
         ### 1. TYPESCRIPT (.ts) FILE
         - Update the page's class and metadata to reference the updated component.
@@ -261,11 +282,11 @@ def analyze_and_update(html_path, css_path, image_path, lexicon_components, page
         <<OUTPUT>>
         """
 
-    #to be replaced with existing code
-    final_page = page_parser.parse(model.invoke(page_prompt))
-    
-    
-    # return {
-    #     "updated_components": [c.dict() for c in updated_components],
-    #     "updated_page": final_page.dict()
-    # }
\ No newline at end of file
+    final_page = invoke_structured(page_prompt, page_schema, model, task="page_update")
+    if page_mode == "diff":
+        final_page = materialize_edits(final_page, page_angular_code, "UpdatedPage")
+
+    return {
+        "updated_components": [schema_to_dict(c) for c in updated_components],
+        "updated_page": schema_to_dict(final_page)
+    }
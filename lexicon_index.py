@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple, Union
+
+from tracing import traced
+
+# === Lexicon fingerprint index ===
+# Fingerprints every Lexicon component by structure, dimensions and typography and
+# matches design regions against them locally, so a prompt only needs the few
+# candidate components per region instead of the whole catalog.
+#
+# A catalog is a JSON list (or {"components": [...]}, or {name: entry}) of entries with
+# a "name", a "node" (an example subtree in AltNode or filtered-Figma format) and any
+# other fields (selector, description, usage, ...) that should reach the prompt.
+
+# Node types counted separately in the fingerprint; anything else counts as "OTHER".
+FINGERPRINT_TYPES = ("FRAME", "GROUP", "INSTANCE", "TEXT", "RECTANGLE", "VECTOR", "ELLIPSE", "OTHER")
+
+# Candidates returned per region by default.
+DEFAULT_CANDIDATES = 3
+
+# Regions are the nodes this many levels below each top-level frame (1 = its children).
+DEFAULT_REGION_DEPTH = 1
+
+FEATURE_NAMES = (
+    [f"type_{name.lower()}" for name in FINGERPRINT_TYPES]
+    + ["nodes", "depth", "children", "flex", "log_width", "log_height", "aspect",
+       "font_size", "font_weight", "font_sizes", "text_chars", "border", "radius", "shadow"]
+)
+
+
+def _number(value) -> Optional[float]:
+    """14, "14px", "14.5" -> float; anything else -> None."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.match(r"\s*(-?\d+(?:\.\d+)?)", value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _size(node: Dict) -> Tuple[float, float]:
+    """(width, height) from either an AltNode or a filtered Figma node."""
+    box = node.get("dimensions") or node.get("absoluteBoundingBox") or {}
+    return _number(box.get("width")) or 0.0, _number(box.get("height")) or 0.0
+
+
+def _typography(node: Dict) -> Dict:
+    return node.get("typography") or node.get("style") or {}
+
+
+def _text(node: Dict) -> str:
+    return node.get("text") or node.get("characters") or ""
+
+
+# === Fingerprints ===
+def fingerprint(node: Dict) -> List[float]:
+    """
+    Feature vector of a subtree (see FEATURE_NAMES): node type mix, size of the tree,
+    root dimensions and aspect ratio, dominant typography, text length and decoration.
+    """
+    type_counts = dict.fromkeys(FINGERPRINT_TYPES, 0)
+    font_sizes: Dict[float, int] = {}
+    font_weights: List[float] = []
+    text_chars = 0
+    decoration = {"border": 0, "radius": 0, "shadow": 0}
+    count = 0
+    max_depth = 0
+    stack = [(node, 0)]
+    while stack:
+        current, depth = stack.pop()
+        count += 1
+        max_depth = max(max_depth, depth)
+        node_type = current.get("type")
+        type_counts[node_type if node_type in type_counts else "OTHER"] += 1
+        if node_type == "TEXT":
+            typography = _typography(current)
+            size = _number(typography.get("fontSize"))
+            if size:
+                font_sizes[size] = font_sizes.get(size, 0) + len(_text(current)) + 1
+            weight = _number(typography.get("fontWeight"))
+            if weight:
+                font_weights.append(weight)
+            text_chars += len(_text(current))
+        styles = current.get("styles") or {}
+        border = styles.get("border") or {}
+        decoration["border"] += bool(border or current.get("strokes"))
+        decoration["radius"] += bool(border.get("radius") or current.get("cornerRadius"))
+        decoration["shadow"] += bool(styles.get("shadow") or current.get("effects"))
+        for child in current.get("children") or []:
+            stack.append((child, depth + 1))
+
+    width, height = _size(node)
+    dominant_size = max(font_sizes, key=font_sizes.get) if font_sizes else 0.0
+    layout = node.get("layout") or {}
+    flex = layout.get("display") == "flex" or node.get("layoutMode") in ("HORIZONTAL", "VERTICAL")
+    return (
+        [type_counts[name] / count for name in FINGERPRINT_TYPES]
+        + [
+            math.log1p(count),
+            float(max_depth),
+            math.log1p(len(node.get("children") or [])),
+            1.0 if flex else 0.0,
+            math.log1p(width),
+            math.log1p(height),
+            math.log((width + 1) / (height + 1)),
+            dominant_size,
+            sum(font_weights) / len(font_weights) / 100 if font_weights else 0.0,
+            float(len(font_sizes)),
+            math.log1p(text_chars),
+            decoration["border"] / count,
+            decoration["radius"] / count,
+            decoration["shadow"] / count,
+        ]
+    )
+
+
+# === Catalog ===
+def load_lexicon(source: Union[str, List, Dict]) -> List[Dict]:
+    """
+    Load a Lexicon catalog from a path, a JSON string or already-parsed data.
+    Returns a list of entries with at least "name"; entries without "node" are kept
+    (they can still be listed) but never matched.
+    """
+    if isinstance(source, str):
+        if os.path.exists(source):
+            with open(source, "r", encoding="utf-8") as f:
+                source = json.load(f)
+        else:
+            source = json.loads(source)
+    if isinstance(source, dict):
+        if isinstance(source.get("components"), list):
+            source = source["components"]
+        else:
+            source = [dict(entry, name=entry.get("name", name)) for name, entry in source.items()]
+    return [entry for entry in source if isinstance(entry, dict) and entry.get("name")]
+
+
+class LexiconIndex:
+    """
+    Nearest-neighbour index over Lexicon component fingerprints.
+    Features are z-scored over the catalog so no single feature dominates; the catalog
+    is small (hundreds of components), so lookups are a brute-force scan of
+    precomputed vectors.
+    """
+
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        self.names = [entry["name"] for entry in entries if entry.get("node")]
+        raw = [fingerprint(entry["node"]) for entry in entries if entry.get("node")]
+        dims = len(FEATURE_NAMES)
+        self.mean = [sum(vector[i] for vector in raw) / len(raw) for i in range(dims)] if raw else [0.0] * dims
+        self.scale = []
+        for i in range(dims):
+            variance = sum((vector[i] - self.mean[i]) ** 2 for vector in raw) / len(raw) if raw else 0.0
+            self.scale.append(math.sqrt(variance) or 1.0)
+        self.vectors = [self._normalize(vector) for vector in raw]
+
+    @classmethod
+    def from_source(cls, source) -> "LexiconIndex":
+        return cls(load_lexicon(source))
+
+    def _normalize(self, vector: List[float]) -> List[float]:
+        return [(value - mean) / scale for value, mean, scale in zip(vector, self.mean, self.scale)]
+
+    def match(self, node: Dict, k: int = DEFAULT_CANDIDATES,
+              max_distance: Optional[float] = None) -> List[Tuple[str, float]]:
+        """The `k` closest Lexicon components to `node`, as [(name, distance)], closest first."""
+        query = self._normalize(fingerprint(node))
+        scored = []
+        for name, vector in zip(self.names, self.vectors):
+            distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(query, vector)))
+            if max_distance is None or distance <= max_distance:
+                scored.append((name, distance))
+        scored.sort(key=lambda item: item[1])
+        return scored[:k]
+
+    @traced("lexicon.match_design")
+    def match_design(self, alt_nodes: List[Dict], k: int = DEFAULT_CANDIDATES,
+                     region_depth: int = DEFAULT_REGION_DEPTH) -> List[Dict]:
+        """
+        Match every region of a design (nodes `region_depth` levels below each top-level
+        frame, or the frame itself if it has no children).
+        Returns [{"id", "name", "candidates": [(name, distance)]}].
+        """
+        regions = []
+        for root in alt_nodes:
+            level = [root]
+            for _ in range(region_depth):
+                below = [child for node in level for child in node.get("children") or []]
+                if not below:
+                    break
+                level = below
+            regions.extend(level)
+        return [{"id": region.get("id"), "name": region.get("name"), "candidates": self.match(region, k)}
+                for region in regions]
+
+    def prompt_catalog(self, matches: List[Dict]) -> str:
+        """
+        Compact JSON for the prompt's Lexicon Components input: the candidates per region
+        and the catalog entries (without their example nodes) of every candidate.
+        """
+        # Components without an example node cannot be ruled out, so they are always listed.
+        wanted = [entry["name"] for entry in self.entries if not entry.get("node")]
+        for region in matches:
+            for name, _ in region["candidates"]:
+                if name not in wanted:
+                    wanted.append(name)
+        by_name = {entry["name"]: entry for entry in self.entries}
+        return json.dumps({
+            "candidates_by_region": {
+                f"{region['name']} ({region['id']})": [name for name, _ in region["candidates"]]
+                for region in matches
+            },
+            "components": [{key: value for key, value in by_name[name].items() if key != "node"}
+                           for name in wanted],
+        }, indent=1)
+
+
+def narrow_lexicon(lexicon_components, alt_nodes: List[Dict], k: int = DEFAULT_CANDIDATES,
+                   region_depth: int = DEFAULT_REGION_DEPTH):
+    """
+    Replace a full Lexicon catalog with only the candidates matched for `alt_nodes`.
+    Catalogs that are not structured (e.g. free text) or have no example nodes are
+    returned unchanged.
+    """
+    try:
+        index = LexiconIndex.from_source(lexicon_components)
+    except (TypeError, ValueError, AttributeError):
+        return lexicon_components
+    if not index.names:
+        return lexicon_components
+    return index.prompt_catalog(index.match_design(alt_nodes, k=k, region_depth=region_depth))
+
+
+def load_design(path: str) -> List[Dict]:
+    """
+    Load the design to match (AltNode or filtered-Figma JSON) as a list of top-level
+    nodes. A raw Figma file (with a "document") is reduced to what fingerprint() reads,
+    and its top-level frames are the frames on each page.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        design = json.load(f)
+    if isinstance(design, dict) and isinstance(design.get("document"), dict):
+        from figma import project
+
+        document = project(design["document"], "lexicon")
+        return [frame for page in document.get("children") or [] for frame in page.get("children") or []]
+    return design if isinstance(design, list) else [design]
+
+
+# === Main Execution ===
+if __name__ == '__main__':
+    # python lexicon_index.py lexicon.json design.json [k]
+    index = LexiconIndex.from_source(sys.argv[1])
+    design = load_design(sys.argv[2])
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_CANDIDATES
+    for region in index.match_design(design, k=k):
+        candidates = ", ".join(f"{name} ({distance:.2f})" for name, distance in region["candidates"])
+        print(f"{region['name']} ({region['id']}): {candidates}")
@@ -0,0 +1,105 @@
+import base64
+import time
+from functools import lru_cache
+
+from model_router import get_router
+from rate_limiter import estimate_tokens, get_scheduler, prompt_key
+from structured_output import StructuredOutputError, parse_structured_output
+from tracing import traced
+
+# === Configuration ===
+# Model used when none is named; routed calls use the tiers in model_router.py.
+DEFAULT_MODEL = "gpt-4o"
+
+# === Pipeline inputs ===
+@traced("io.read_file", result_bytes=True)
+def read_file(path: str) -> str:
+    """
+    Reads a text file (exported HTML/CSS, Angular source) and returns its content.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+@traced("image.encode", result_bytes=True)
+def encode_image(path: str) -> str:
+    """
+    Reads an image (e.g. a PNG frame export) and returns it base64-encoded.
+    """
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+# === Dry runs ===
+# While a recorder is installed (see dry_run.py), prompts are handed to it instead of a model.
+_DRY_RUN = None
+
+def set_dry_run(recorder):
+    """Install a dry-run recorder for every model call in the process (None removes it)."""
+    global _DRY_RUN
+    _DRY_RUN = recorder
+
+# === Model access ===
+@lru_cache(maxsize=None)
+def get_chat_model(model_name: str = DEFAULT_MODEL):
+    """
+    Create the langchain chat model on first use.
+    langchain-openai and python-dotenv are imported here so importing the pipelines stays cheap.
+    """
+    from dotenv import load_dotenv
+    from langchain_openai import ChatOpenAI
+
+    load_dotenv()
+    return ChatOpenAI(model=model_name)
+
+def _invoke(prompt: str, model, task, tier: str) -> str:
+    """One scheduled call of `model`, recorded on the router under (task, tier)."""
+    model_name = getattr(model, "model_name", None) or id(model)
+    prompt_tokens = estimate_tokens(prompt)
+    start = time.perf_counter()
+    try:
+        response = get_scheduler().run(lambda: model.invoke(prompt), prompt_tokens,
+                                       key=prompt_key(model_name, prompt))
+    except Exception:
+        get_router().record_call(task, tier, time.perf_counter() - start, prompt_tokens, error=True)
+        raise
+    get_router().record_call(task, tier, time.perf_counter() - start, prompt_tokens)
+    return response if isinstance(response, str) else response.content
+
+def invoke_model(prompt: str, model=None, task=None) -> str:
+    """
+    Send `prompt` to `model` (anything with an `.invoke` method) and return the response text.
+    Without a model, the router picks the tier for `task` (see model_router.py).
+    The call goes through the shared rate-limiting scheduler (see rate_limiter.py).
+    """
+    router = get_router()
+    tier = "explicit" if model is not None else router.tier_for(task, estimate_tokens(prompt))
+    if _DRY_RUN is not None:
+        return _DRY_RUN.text(prompt, task, tier, model)
+    return _invoke(prompt, model if model is not None else router.model(tier), task, tier)
+
+def invoke_structured(prompt: str, schema_name: str, model=None, task=None):
+    """
+    invoke_model + parse_structured_output. Parse failures are recorded per route, and a
+    routed fast-tier response that does not parse is retried once on the large tier.
+    """
+    router = get_router()
+    tier = "explicit" if model is not None else router.tier_for(task, estimate_tokens(prompt))
+    if _DRY_RUN is not None:
+        return _DRY_RUN.structured(prompt, schema_name, task, tier, model)
+    response = _invoke(prompt, model if model is not None else router.model(tier), task, tier)
+    try:
+        result = parse_structured_output(response, schema_name)
+    except StructuredOutputError:
+        escalate = tier == "fast" and router.escalate
+        router.record_parse(task, tier, ok=False, escalated=escalate)
+        if not escalate:
+            raise
+        response = _invoke(prompt, router.model("large"), task, "large")
+        try:
+            result = parse_structured_output(response, schema_name)
+        except StructuredOutputError:
+            router.record_parse(task, "large", ok=False)
+            raise
+        router.record_parse(task, "large", ok=True)
+        return result
+    router.record_parse(task, tier, ok=True)
+    return result
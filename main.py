@@ -1,6 +1,11 @@
+import gzip
+import hashlib
 import json
 import re
-from typing import List, Dict
+import sys
+from typing import List, Dict, Optional
+
+from tracing import traced
 
 def safe_css_identifier(value: str) -> str:
     """
@@ -15,23 +20,12 @@ def px(value) -> str:
         return f"{value}px"
     return str(value)
 
-def generate_node_html_css(node: Dict, css_rules: Dict[str, Dict[str, str]]) -> str:
+def node_styles(node: Dict) -> Dict[str, str]:
     """
-    Recursively generate HTML for a single AltNode, collecting CSS rules in `css_rules`.
-    Returns the HTML snippet for the node (including children).
+    Build the CSS declarations (property -> value) for a single AltNode:
+    absolute position and size, flex layout, fills, border, shadow, opacity and typography.
     """
-    node_id = safe_css_identifier(node["id"])
     node_type = node["type"]
-    
-    # Decide what HTML tag to use.
-    # For TEXT nodes, use <span>. For VECTOR nodes, if svgData is available,
-    # we still wrap it in a container but output the inline SVG.
-    if node_type == "TEXT":
-        tag = "span"
-    else:
-        tag = "div"
-    
-    # Build CSS for this node.
     styles = {}
 
     # Position & size (absolute positioning to match Figma’s x, y)
@@ -115,7 +109,28 @@ def generate_node_html_css(node: Dict, css_rules: Dict[str, Dict[str, str]]) ->
         # Remove background and border so that only the SVG shows.
         styles.pop("background-color", None)
         styles.pop("border", None)
-        
+    
+    return styles
+
+def generate_node_html_css(node: Dict, css_rules: Dict[str, Dict[str, str]]) -> str:
+    """
+    Recursively generate HTML for a single AltNode, collecting CSS rules in `css_rules`.
+    Returns the HTML snippet for the node (including children).
+    """
+    node_id = safe_css_identifier(node["id"])
+    node_type = node["type"]
+    
+    # Decide what HTML tag to use.
+    # For TEXT nodes, use <span>. For VECTOR nodes, if svgData is available,
+    # we still wrap it in a container but output the inline SVG.
+    if node_type == "TEXT":
+        tag = "span"
+    else:
+        tag = "div"
+    
+    # Build CSS for this node.
+    styles = node_styles(node)
+    
     # Accumulate styles into the CSS rules dictionary.
     css_rules[node_id] = styles
     
@@ -141,23 +156,298 @@ def generate_node_html_css(node: Dict, css_rules: Dict[str, Dict[str, str]]) ->
     
     return f'<{tag} id="{node_id}">{content}</{tag}>'
 
-def build_html_document(alt_nodes: List[Dict]) -> str:
+# -------------------------------------------------------------
+# Repeated subtrees: list items, table rows and cards share one class set.
+# -------------------------------------------------------------
+
+# Siblings with the same structure are rendered as a template once there are this many.
+REPEAT_MIN_INSTANCES = 2
+
+# Properties that must match for two subtrees to share a template (besides child positions).
+STRUCTURE_PROPERTIES = ("type", "dimensions", "layout", "styles", "typography")
+
+def structure_key(node: Dict) -> str:
+    """
+    Stable hash of a subtree's structure and styling, ignoring ids, names, text content,
+    SVG markup and the subtree root's own position. Two list items that differ only in
+    their text (and where they sit in the list) get the same key.
+    """
+    def signature(current: Dict):
+        return (
+            [current.get(prop) for prop in STRUCTURE_PROPERTIES],
+            bool(current.get("svgData")),
+            [(child.get("position"), signature(child)) for child in current.get("children") or []],
+        )
+    return hashlib.sha1(json.dumps(signature(node), sort_keys=True, default=str).encode("utf-8")).hexdigest()[:10]
+
+def same_structure(a: Dict, b: Dict, compare_position: bool = False) -> bool:
+    """True if two subtrees would have the same structure_key (compared directly, without hashing)."""
+    for prop in STRUCTURE_PROPERTIES:
+        if a.get(prop) != b.get(prop):
+            return False
+    if bool(a.get("svgData")) != bool(b.get("svgData")):
+        return False
+    if compare_position and a.get("position") != b.get("position"):
+        return False
+    a_children = a.get("children") or []
+    b_children = b.get("children") or []
+    if len(a_children) != len(b_children):
+        return False
+    return all(same_structure(x, y, compare_position=True) for x, y in zip(a_children, b_children))
+
+def repeated_siblings(children: List[Dict]) -> List[List[Dict]]:
+    """
+    Groups of at least REPEAT_MIN_INSTANCES siblings with the same structure, in order of
+    first appearance. Siblings are bucketed by type, size and child count first, so full
+    comparisons only happen between likely matches.
+    """
+    buckets: Dict[tuple, List[List[Dict]]] = {}
+    for child in children:
+        dims = child.get("dimensions") or {}
+        bucket = buckets.setdefault(
+            (child.get("type"), dims.get("width"), dims.get("height"), len(child.get("children") or [])), [])
+        for group in bucket:
+            if same_structure(group[0], child):
+                group.append(child)
+                break
+        else:
+            bucket.append([child])
+    return [group for bucket in buckets.values() for group in bucket if len(group) >= REPEAT_MIN_INSTANCES]
+
+def _node_content(node: Dict, children_html: str) -> str:
+    """Inner HTML of a node: its escaped text or inline SVG followed by its children."""
+    node_type = node["type"]
+    if node_type == "TEXT" and "text" in node:
+        inner_text = (node["text"]
+                      .replace("&", "&amp;")
+                      .replace("<", "&lt;")
+                      .replace(">", "&gt;"))
+        return inner_text + children_html
+    if node_type == "VECTOR" and node.get("svgData"):
+        return node["svgData"] + children_html
+    return children_html
+
+def style_attribute(styles: Dict[str, str], minify: bool = False, precision: Optional[int] = None) -> str:
+    """An inline style="..." attribute; with minify, the values are compacted like minified CSS."""
+    if minify:
+        return 'style="' + ";".join(f"{prop}:{minify_value(val, precision)}" for prop, val in styles.items()) + '"'
+    return 'style="' + "; ".join(f"{prop}: {val}" for prop, val in styles.items()) + '"'
+
+def generate_template_html(node: Dict, css_rules: Dict[str, Dict[str, str]], class_name: str,
+                           counter: Optional[List[int]] = None, minify: bool = False,
+                           precision: Optional[int] = None) -> str:
+    """
+    Render one instance of a repeated subtree. The root gets `class_name` and each
+    descendant "<class_name>_<n>" (n = its pre-order index), so every instance uses the
+    same classes and their CSS is emitted once. Only the root's id and position and the
+    text/SVG content are per instance. The root class identifies the repeat group
+    (one *ngFor loop). With minify, the root's style attribute is minified (see
+    style_attribute).
+    """
+    root = counter is None
+    if root:
+        counter = [0]
+        node_class = class_name
+    else:
+        counter[0] += 1
+        node_class = f"{class_name}_{counter[0]}"
+    selector = "." + node_class
+    if selector not in css_rules:
+        styles = node_styles(node)
+        if root:
+            styles.pop("left", None)
+            styles.pop("top", None)
+        css_rules[selector] = styles
+
+    children_html = "".join(generate_template_html(child, css_rules, class_name, counter)
+                            for child in node.get("children") or [])
+    content = _node_content(node, children_html)
+    tag = "span" if node["type"] == "TEXT" else "div"
+    if not root:
+        return f'<{tag} class="{node_class}">{content}</{tag}>'
+    position = node["position"]
+    style = style_attribute({"left": px(position["x"]), "top": px(position["y"])}, minify, precision)
+    return f'<{tag} id="{safe_css_identifier(node["id"])}" class="{node_class}" {style}>{content}</{tag}>'
+
+def generate_node_html_reuse(node: Dict, css_rules: Dict[str, Dict[str, str]], templates: List[int],
+                             template_prefix: str = "t", minify: bool = False,
+                             precision: Optional[int] = None) -> str:
+    """
+    Like generate_node_html_css, but siblings that repeat the same structure are
+    rendered with generate_template_html. `templates` counts the templates so far;
+    template classes are named "<template_prefix><n>". `minify` and `precision` are
+    passed on to generate_template_html.
+    """
+    node_id = safe_css_identifier(node["id"])
+    css_rules[node_id] = node_styles(node)
+
+    children = node.get("children") or []
+    template_of = {}
+    if len(children) >= REPEAT_MIN_INSTANCES:
+        for group in repeated_siblings(children):
+            templates[0] += 1
+            for child in group:
+                template_of[id(child)] = f"{template_prefix}{templates[0]}"
+    children_html = "".join(
+        generate_template_html(child, css_rules, template_of[id(child)], minify=minify, precision=precision)
+        if id(child) in template_of
+        else generate_node_html_reuse(child, css_rules, templates, template_prefix, minify, precision)
+        for child in children
+    )
+    tag = "span" if node["type"] == "TEXT" else "div"
+    return f'<{tag} id="{node_id}">{_node_content(node, children_html)}</{tag}>'
+
+def _texts(node: Dict) -> List[str]:
+    texts = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.get("type") == "TEXT":
+            texts.append(current.get("text", ""))
+        stack.extend(reversed(current.get("children") or []))
+    return texts
+
+def repeated_groups(alt_nodes: List[Dict]) -> List[Dict]:
+    """
+    The repeated sibling groups of a design, ready to become *ngFor loops:
+    [{"parent": parent id, "key": structure_key, "ids": [instance ids],
+      "items": [[text of each TEXT node, in order] per instance]}].
+    """
+    groups = []
+    stack = list(alt_nodes)
+    while stack:
+        node = stack.pop()
+        children = node.get("children") or []
+        grouped = set()
+        for group in repeated_siblings(children) if len(children) >= REPEAT_MIN_INSTANCES else []:
+            grouped.update(id(child) for child in group)
+            groups.append({
+                "parent": node.get("id"),
+                "key": structure_key(group[0]),
+                "ids": [child.get("id") for child in group],
+                "items": [_texts(child) for child in group],
+            })
+        stack.extend(child for child in children if id(child) not in grouped)
+    return groups
+
+# -------------------------------------------------------------
+# Minified output: rounded numbers, compact CSS and HTML.
+# -------------------------------------------------------------
+
+# Decimal places kept for numeric CSS values in minified output.
+DEFAULT_PRECISION = 2
+
+_DECIMAL = re.compile(r"-?\d+\.\d+")
+_ZERO_PX = re.compile(r"(?<![\w.-])-?0px")
+_SVG = re.compile(r"<svg\b.*?</svg>", re.S)
+
+MINIFIED_RESET = "html,body{margin:0;padding:0;position:relative;width:100%;height:100%}body{background-color:#fff}"
+
+def round_numbers(text: str, precision: Optional[int] = DEFAULT_PRECISION) -> str:
+    """Round the decimal numbers in a CSS value (122.00000286102295% -> 122%, 0.50 -> 0.5)."""
+    if precision is None:
+        return text
+    def shorten(match):
+        value = f"{float(match.group()):.{precision}f}"
+        if "." in value:
+            value = value.rstrip("0").rstrip(".")
+        return "0" if value == "-0" else value
+    return _DECIMAL.sub(shorten, text)
+
+def minify_value(value: str, precision: Optional[int] = DEFAULT_PRECISION) -> str:
+    """A CSS value with rounded numbers, unitless zeros and no spaces around commas."""
+    value = _ZERO_PX.sub("0", round_numbers(str(value), precision))
+    return re.sub(r"\s*,\s*", ",", value.strip())
+
+def minify_css_rules(css_rules: Dict[str, Dict[str, str]], precision: Optional[int] = DEFAULT_PRECISION) -> str:
+    """
+    The CSS for `css_rules` without whitespace. Selectors with identical declarations
+    share one rule ("#a,#b{...}"), placed where the first of them was.
+    """
+    blocks: Dict[str, List[str]] = {}
+    for node_id, style_dict in css_rules.items():
+        declarations = ";".join(f"{prop}:{minify_value(val, precision)}" for prop, val in style_dict.items())
+        selector = node_id if node_id.startswith(".") else f"#{node_id}"
+        blocks.setdefault(declarations, []).append(selector)
+    return "".join(f"{','.join(selectors)}{{{declarations}}}" for declarations, selectors in blocks.items())
+
+def minify_body(body_content: str) -> str:
+    """
+    Compact the rendered body: whitespace between tags inside inline SVGs is dropped.
+    Text content is left as is; style attributes are minified where they are emitted
+    (see style_attribute).
+    """
+    return _SVG.sub(lambda match: re.sub(r">\s+<", "><", match.group()), body_content)
+
+# -------------------------------------------------------------
+# Precompressed artifacts.
+# -------------------------------------------------------------
+
+def write_html_artifacts(document: str, path: str, compress: tuple = ("gz", "br")) -> Dict[str, str]:
+    """
+    Write `document` to `path`, plus precompressed copies next to it (<path>.gz and,
+    when the optional brotli package is installed, <path>.br) for static servers.
+    Returns {"html" / "gz" / "br": path written}.
+    """
+    data = document.encode("utf-8")
+    written = {"html": path}
+    with open(path, "wb") as out:
+        out.write(data)
+    if "gz" in compress:
+        with open(path + ".gz", "wb") as out:
+            # mtime=0 keeps the artifact identical across runs of the same document.
+            out.write(gzip.compress(data, compresslevel=9, mtime=0))
+        written["gz"] = path + ".gz"
+    if "br" in compress:
+        try:
+            import brotli  # Optional: only needed for .br artifacts.
+        except ImportError:
+            brotli = None
+        if brotli is not None:
+            with open(path + ".br", "wb") as out:
+                out.write(brotli.compress(data, quality=11))
+            written["br"] = path + ".br"
+    return written
+
+@traced("render.html", result_bytes=True)
+def build_html_document(alt_nodes: List[Dict], reuse_templates: bool = True, minify: bool = False,
+                        precision: Optional[int] = DEFAULT_PRECISION) -> str:
     """
     Given a list of top-level AltNodes, generate a complete HTML document
     with embedded CSS in a <style> block.
+
+    With reuse_templates (the default), repeated sibling subtrees share one set of
+    CSS rules (see generate_template_html); set it to False for one rule per node.
+    With minify, the document is emitted without whitespace and numeric CSS values
+    are rounded to `precision` decimals (None keeps them as they are).
     """
     css_rules = {}
     
     body_content = ""
+    templates = [0]
     for node in alt_nodes:
-        body_content += generate_node_html_css(node, css_rules)
+        if reuse_templates:
+            body_content += generate_node_html_reuse(node, css_rules, templates, minify=minify, precision=precision)
+        else:
+            body_content += generate_node_html_css(node, css_rules)
     
+    return html_document(body_content, css_rules, minify=minify, precision=precision)
+
+def html_document(body_content: str, css_rules: Dict[str, Dict[str, str]], minify: bool = False,
+                  precision: Optional[int] = DEFAULT_PRECISION) -> str:
+    """Wrap rendered body HTML and its collected CSS rules into a complete HTML document."""
+    if minify:
+        return (f'<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><title>AltNode Output</title>'
+                f'<style>{MINIFIED_RESET}{minify_css_rules(css_rules, precision)}</style></head>'
+                f'<body>{minify_body(body_content)}</body></html>')
+
     css_text = ""
     for node_id, style_dict in css_rules.items():
         style_str = "".join(f"{prop}: {val};" for prop, val in style_dict.items())
-        css_text += f"#{node_id} {{{style_str}}}\n"
+        selector = node_id if node_id.startswith(".") else f"#{node_id}"
+        css_text += f"{selector} {{{style_str}}}\n"
     
-    html_document = f"""<!DOCTYPE html>
+    document = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
   <meta charset="UTF-8" />
@@ -181,22 +471,29 @@ def build_html_document(alt_nodes: List[Dict]) -> str:
 {body_content}
 </body>
 </html>"""
-    return html_document
+    return document
 
 # -------------------------------------------------------------
 # Script Flow: Prompt user for JSON file path, then generate HTML.
 # -------------------------------------------------------------
 
-input_path = input("Enter the path to your AltNode JSON file: ").strip()
-with open(input_path, "r", encoding="utf-8") as f:
-    alt_nodes = json.load(f)
+if __name__ == "__main__":
+    # python main.py [--minify]: --minify also writes output.html.gz (and .br)
+    input_path = input("Enter the path to your AltNode JSON file: ").strip()
+    with open(input_path, "r", encoding="utf-8") as f:
+        alt_nodes = json.load(f)
 
-html_output = build_html_document(alt_nodes)
+    if "--minify" in sys.argv:
+        html_output = build_html_document(alt_nodes, minify=True)
+        written = write_html_artifacts(html_output, "output.html")
+        print("Minified HTML + CSS generated in " + ", ".join(f"'{path}'" for path in written.values()))
+    else:
+        html_output = build_html_document(alt_nodes)
 
-with open("output.html", "w", encoding="utf-8") as out:
-    out.write(html_output)
+        with open("output.html", "w", encoding="utf-8") as out:
+            out.write(html_output)
 
-print("HTML + CSS generated in 'output.html'")
+        print("HTML + CSS generated in 'output.html'")
 
 
 
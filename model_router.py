@@ -0,0 +1,173 @@
+import atexit
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from tracing import current_span
+
+# === Tiered model routing ===
+# Light requests (the "which components need updating" list, short upgrade chunks)
+# go to a fast model and heavy generation (components, pages, long chunks, visual QA)
+# to the large one. Every call is recorded per route (task and tier) with its latency,
+# errors and structured-output parse failures, so FAST_MAX_TOKENS and TASK_TIERS can
+# be tuned from real runs. A fast-tier response that does not parse is retried once
+# on the large tier.
+
+# Model names per tier; override with MODEL_FAST / MODEL_LARGE in the environment.
+DEFAULT_MODELS = {"fast": "gpt-4o-mini", "large": "gpt-4o"}
+
+# Tier per task. "size" routes by prompt size: up to FAST_MAX_TOKENS goes to the fast tier.
+TASK_TIERS = {
+    "component_list": "fast",
+    "chunk_upgrade": "size",
+    "component_update": "large",
+    "page_update": "large",
+    "visual_qa": "large",
+}
+
+# Largest estimated prompt (tokens) a "size" task sends to the fast tier; MODEL_FAST_MAX_TOKENS overrides.
+FAST_MAX_TOKENS = 1500
+
+# Calls without a task use the large tier (the behaviour before routing).
+DEFAULT_TASK = "default"
+
+# Latencies kept per route for the percentiles.
+MAX_LATENCY_SAMPLES = 1000
+
+
+class ModelRouter:
+    """
+    Chooses the tier for each model call and keeps per-route statistics.
+
+    `models` maps a tier to a ready model object (anything with `.invoke`, e.g. a fake
+    endpoint); tiers without one get llm.get_chat_model(model name) on first use.
+    """
+
+    def __init__(self, models: Optional[Dict] = None, model_names: Optional[Dict[str, str]] = None,
+                 fast_max_tokens: int = FAST_MAX_TOKENS, task_tiers: Optional[Dict[str, str]] = None,
+                 escalate: bool = True):
+        self.models = dict(models or {})
+        self.model_names = dict(DEFAULT_MODELS, **(model_names or {}))
+        self.fast_max_tokens = fast_max_tokens
+        self.task_tiers = dict(TASK_TIERS, **(task_tiers or {}))
+        self.escalate = escalate
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    # --- Routing ---
+    def tier_for(self, task: Optional[str], prompt_tokens: int) -> str:
+        tier = self.task_tiers.get(task or DEFAULT_TASK, "large")
+        if tier == "size":
+            tier = "fast" if prompt_tokens <= self.fast_max_tokens else "large"
+        current_span().set(task=task or DEFAULT_TASK, tier=tier)
+        return tier
+
+    def model_name(self, tier: str) -> str:
+        model = self.models.get(tier)
+        return getattr(model, "model_name", None) or self.model_names[tier]
+
+    def model(self, tier: str):
+        """The model object for `tier` (a configured one, or the langchain chat model for its name)."""
+        if tier in self.models:
+            return self.models[tier]
+        from llm import get_chat_model  # llm imports this module; resolved at call time.
+
+        return get_chat_model(self.model_names[tier])
+
+    # --- Statistics ---
+    def _route(self, task: Optional[str], tier: str) -> Dict:
+        key = f"{task or DEFAULT_TASK}/{tier}"
+        route = self._stats.get(key)
+        if route is None:
+            route = self._stats[key] = {"calls": 0, "errors": 0, "parsed": 0, "parse_failures": 0,
+                                        "escalations": 0, "prompt_tokens": 0, "total_ms": 0.0, "latencies": []}
+        return route
+
+    def record_call(self, task: Optional[str], tier: str, seconds: float, prompt_tokens: int = 0, error: bool = False):
+        with self._lock:
+            route = self._route(task, tier)
+            route["calls"] += 1
+            route["errors"] += error
+            route["prompt_tokens"] += prompt_tokens
+            route["total_ms"] += seconds * 1000
+            route["latencies"].append(seconds * 1000)
+            del route["latencies"][:-MAX_LATENCY_SAMPLES]
+
+    def record_parse(self, task: Optional[str], tier: str, ok: bool, escalated: bool = False):
+        with self._lock:
+            route = self._route(task, tier)
+            route["parsed"] += 1
+            route["parse_failures"] += not ok
+            route["escalations"] += escalated
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per route ("task/tier"): calls, errors, parse failure rate, escalations and latency in ms."""
+        with self._lock:
+            report = {}
+            for key, route in sorted(self._stats.items()):
+                latencies = sorted(route["latencies"])
+                report[key] = {
+                    "calls": route["calls"],
+                    "errors": route["errors"],
+                    "parse_failures": route["parse_failures"],
+                    "parse_failure_rate": route["parse_failures"] / route["parsed"] if route["parsed"] else 0.0,
+                    "escalations": route["escalations"],
+                    "mean_prompt_tokens": route["prompt_tokens"] / route["calls"] if route["calls"] else 0.0,
+                    "mean_ms": route["total_ms"] / route["calls"] if route["calls"] else 0.0,
+                    "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+                }
+            return report
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def save_stats(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, indent=2)
+
+
+def format_stats(stats: Dict[str, Dict]) -> str:
+    """Render ModelRouter.stats() as a table."""
+    lines = [f"{'route':<28} {'calls':>6} {'mean ms':>9} {'p95 ms':>9} {'tokens':>8} {'parse fail':>10} {'escalated':>9}"]
+    for key, route in stats.items():
+        lines.append(f"{key:<28} {route['calls']:>6} {route['mean_ms']:>9.1f} {route['p95_ms']:>9.1f} "
+                     f"{route['mean_prompt_tokens']:>8.0f} {route['parse_failure_rate']:>10.1%} {route['escalations']:>9}")
+    return "\n".join(lines)
+
+
+# === Shared router ===
+_ROUTER: Optional[ModelRouter] = None
+_ROUTER_LOCK = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """The process-wide router, created from MODEL_FAST / MODEL_LARGE / MODEL_FAST_MAX_TOKENS on first use."""
+    global _ROUTER
+    with _ROUTER_LOCK:
+        if _ROUTER is None:
+            names = {tier: os.environ[f"MODEL_{tier.upper()}"] for tier in DEFAULT_MODELS
+                     if os.environ.get(f"MODEL_{tier.upper()}")}
+            max_tokens = os.environ.get("MODEL_FAST_MAX_TOKENS")
+            _ROUTER = ModelRouter(model_names=names,
+                                  fast_max_tokens=int(max_tokens) if max_tokens else FAST_MAX_TOKENS)
+        return _ROUTER
+
+
+def configure_router(**kwargs) -> ModelRouter:
+    """Replace the process-wide router, e.g. configure_router(models={"fast": fake, "large": fake2})."""
+    global _ROUTER
+    with _ROUTER_LOCK:
+        _ROUTER = ModelRouter(**kwargs)
+        return _ROUTER
+
+
+def _save_at_exit():
+    # MODEL_ROUTING_STATS=<path> keeps the per-route statistics of a run for tuning.
+    path = os.environ.get("MODEL_ROUTING_STATS")
+    if path and _ROUTER is not None and _ROUTER.stats():
+        _ROUTER.save_stats(path)
+
+
+atexit.register(_save_at_exit)
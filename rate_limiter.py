@@ -0,0 +1,283 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional, Tuple
+
+from tracing import current_span, span
+
+# === Configuration ===
+# Provider budgets for the shared scheduler; override with MODEL_TPM / MODEL_RPM /
+# MODEL_MAX_CONCURRENCY in the environment (or .env). 0 disables a limit.
+DEFAULT_TPM = 30000
+DEFAULT_RPM = 500
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Only this fraction of each budget is used, leaving room for estimation error.
+HEADROOM = 0.9
+
+# Completion tokens reserved per request on top of the prompt estimate
+# (providers count max output tokens against TPM when admitting a request).
+DEFAULT_COMPLETION_TOKENS = 1024
+
+# Waiting requests gain this many tokens of priority per second, so a long
+# request is not starved by a steady stream of short ones.
+AGING_TOKENS_PER_SECOND = 500
+
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 2.0
+
+
+# === Token estimates ===
+def estimate_tokens(payload) -> int:
+    """
+    Cheap token estimate (~4 characters per token) for a prompt string or a list of
+    chat messages. Good enough for budgeting; actual usage is reconciled after the call.
+    """
+    if isinstance(payload, str):
+        return len(payload) // 4 + 1
+    if isinstance(payload, dict):
+        return estimate_tokens(payload.get("content") or "") + 4
+    if isinstance(payload, (list, tuple)):
+        return sum(estimate_tokens(item) for item in payload) + 2
+    return estimate_tokens(str(payload))
+
+
+def response_tokens(response) -> Optional[int]:
+    """Total tokens reported by an OpenAI or langchain response, if any."""
+    usage = getattr(response, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    if total is None:
+        metadata = getattr(response, "usage_metadata", None) or {}
+        total = metadata.get("total_tokens")
+    return total
+
+
+def response_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt tokens, completion tokens) reported by an OpenAI or langchain response, if any."""
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, usage.completion_tokens
+    metadata = getattr(response, "usage_metadata", None) or {}
+    return metadata.get("input_tokens"), metadata.get("output_tokens")
+
+
+def prompt_key(model_name, payload) -> str:
+    """Identity of a request, used to coalesce identical in-flight prompts."""
+    text = payload if isinstance(payload, str) else json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for HTTP 429 / provider rate-limit exceptions (openai, langchain, or a fake endpoint)."""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    return "ratelimit" in type(error).__name__.lower() or "rate limit" in str(error).lower()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# === Rate limiting ===
+class TokenBucket:
+    """
+    Continuously refilling budget of `per_minute` units (tokens or requests).
+    Not thread-safe on its own; ModelScheduler guards it with its lock.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (a request larger than the bucket waits for a full one)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Charge (positive) or refund (negative) `delta` after the real usage is known."""
+        self.level = min(self.capacity, self.level - delta)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider answered 429."""
+        self.level = min(self.level, 0.0)
+
+
+class ModelScheduler:
+    """
+    Single gate for every model call in the process.
+
+    run() blocks until the request fits the tokens-per-minute and requests-per-minute
+    budgets and a concurrency slot is free. Waiting requests are admitted shortest
+    first (by estimated tokens, with aging). Identical prompts already in flight are
+    coalesced: the later callers wait for and share the first caller's response.
+    Rate-limit errors are retried with backoff and pause every other caller too.
+    """
+
+    def __init__(self, tpm: Optional[int] = DEFAULT_TPM, rpm: Optional[int] = DEFAULT_RPM,
+                 max_concurrency: Optional[int] = DEFAULT_MAX_CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 headroom: float = HEADROOM):
+        self.tokens = TokenBucket(tpm * headroom) if tpm else None
+        self.requests = TokenBucket(rpm * headroom) if rpm else None
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._inflight = {}
+        self._running = 0
+        self.stats = {"requests": 0, "coalesced": 0, "retries": 0, "waited_seconds": 0.0}
+
+    def _buckets(self):
+        return [(bucket, amount) for bucket, amount in ((self.tokens, None), (self.requests, 1)) if bucket]
+
+    def _acquire(self, cost: int):
+        """Block until this request is first in line and fits every budget, then charge it."""
+        ticket = (cost, time.monotonic(), next(self._sequence))
+        with self._cond:
+            self._waiting.append(ticket)
+            while True:
+                now = time.monotonic()
+                head = min(self._waiting, key=lambda t: (t[0] - (now - t[1]) * AGING_TOKENS_PER_SECOND, t[2]))
+                if head is not ticket:
+                    # Timed, because aging can make this ticket the head without a notify.
+                    self._cond.wait(0.5)
+                    continue
+                if self.max_concurrency and self._running >= self.max_concurrency:
+                    self._cond.wait()
+                    continue
+                delay = max([bucket.wait_time(cost if amount is None else amount, now)
+                             for bucket, amount in self._buckets()] or [0.0])
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                for bucket, amount in self._buckets():
+                    bucket.take(cost if amount is None else amount, now)
+                self._waiting.remove(ticket)
+                self._running += 1
+                self.stats["requests"] += 1
+                self.stats["waited_seconds"] += now - ticket[1]
+                current_span().add("queued_ms", (now - ticket[1]) * 1000)
+                self._cond.notify_all()
+                return
+
+    def _release(self, cost: int, actual: Optional[int] = None, rate_limited: bool = False):
+        with self._cond:
+            self._running -= 1
+            if self.tokens and actual is not None:
+                self.tokens.adjust(actual - cost)
+            if rate_limited:
+                for bucket, _ in self._buckets():
+                    bucket.drain()
+            self._cond.notify_all()
+
+    def _call(self, fn: Callable, cost: int, completion_budget: int):
+        for attempt in range(self.max_retries + 1):
+            self._acquire(cost)
+            try:
+                result = fn()
+            except Exception as e:
+                limited = is_rate_limit_error(e)
+                self._release(cost, rate_limited=limited)
+                if not limited or attempt == self.max_retries:
+                    raise
+                with self._cond:
+                    self.stats["retries"] += 1
+                current_span().add("retries")
+                time.sleep(_retry_after(e) or BACKOFF_SECONDS * 2 ** attempt)
+                continue
+            self._release(cost, actual=response_tokens(result))
+            prompt_tokens, completion_tokens = response_usage(result)
+            trace = current_span()
+            trace.add("prompt_tokens", prompt_tokens if prompt_tokens is not None else cost - completion_budget)
+            if completion_tokens is not None:
+                trace.add("completion_tokens", completion_tokens)
+            return result
+
+    def run(self, fn: Callable, prompt_tokens: int, completion_tokens: int = DEFAULT_COMPLETION_TOKENS,
+            key: Optional[str] = None):
+        """
+        Call `fn()` once the budgets allow it and return its result.
+        `key` (see prompt_key) enables coalescing of identical concurrent requests.
+        """
+        cost = prompt_tokens + completion_tokens
+        with span("model.call") as trace:
+            return self._run(fn, cost, completion_tokens, key, trace)
+
+    def _run(self, fn: Callable, cost: int, completion_budget: int, key: Optional[str], trace):
+        if key is None:
+            return self._call(fn, cost, completion_budget)
+        with self._cond:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            trace.set(coalesced=True)
+            return future.result()
+        try:
+            result = self._call(fn, cost, completion_budget)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+
+
+# === Shared scheduler ===
+_SCHEDULER: Optional[ModelScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def get_scheduler() -> ModelScheduler:
+    """The process-wide scheduler, created from MODEL_TPM / MODEL_RPM / MODEL_MAX_CONCURRENCY on first use."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = ModelScheduler(
+                tpm=_env_int("MODEL_TPM", DEFAULT_TPM),
+                rpm=_env_int("MODEL_RPM", DEFAULT_RPM),
+                max_concurrency=_env_int("MODEL_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+            )
+        return _SCHEDULER
+
+
+def configure_scheduler(**kwargs) -> ModelScheduler:
+    """Replace the process-wide scheduler, e.g. configure_scheduler(tpm=800000, rpm=10000)."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        _SCHEDULER = ModelScheduler(**kwargs)
+        return _SCHEDULER
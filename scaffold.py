@@ -0,0 +1,358 @@
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from main import node_styles
+from tracing import traced
+
+# === Deterministic component scaffolding ===
+# Emits an Angular component (.ts/.html/.css/.spec.ts) straight from an AltNode
+# subtree, for frames simple enough not to need the model: static text, buttons,
+# inputs and boxes, ideally laid out with auto layout. The output has the same
+# shape as an UpdatedComponent ({"name", "ts", "html", "css", "spec_ts"}), so it
+# can go wherever a model-generated component goes. Anything else is reported as
+# needing the model.
+
+# Node types the scaffold knows how to render.
+SIMPLE_TYPES = {"FRAME", "GROUP", "COMPONENT", "INSTANCE", "TEXT", "RECTANGLE", "VECTOR", "LINE", "ELLIPSE"}
+
+# Frames larger or deeper than this go to the model.
+MAX_SCAFFOLD_NODES = 40
+MAX_SCAFFOLD_DEPTH = 5
+
+# Interactive roles are recognized from layer names.
+BUTTON_PATTERN = re.compile(r"\b(button|btn|cta)\b", re.IGNORECASE)
+INPUT_PATTERN = re.compile(r"\b(input|text ?field|textbox|search ?box)\b", re.IGNORECASE)
+ROLE_WORDS = re.compile(r"\b(button|btn|cta|input|text ?field|textbox|search ?box)\b", re.IGNORECASE)
+
+# Position declarations that only make sense for absolutely positioned nodes.
+POSITION_PROPERTIES = ("position", "left", "top")
+
+
+# === Naming ===
+def _words(value: str) -> List[str]:
+    value = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", value or "")
+    return [word.lower() for word in re.findall(r"[A-Za-z0-9]+", value)]
+
+
+def component_names(name: str) -> Dict[str, str]:
+    """
+    "Account Summary" -> {"class": "AccountSummaryComponent", "selector": "app-account-summary",
+    "file": "account-summary.component"}.
+    """
+    words = _words(name)
+    if words and words[-1] == "component":
+        words = words[:-1]
+    words = words or ["generated"]
+    kebab = "-".join(words)
+    return {
+        "class": "".join(word.capitalize() for word in words) + "Component",
+        "selector": f"app-{kebab}",
+        "file": f"{kebab}.component",
+    }
+
+
+def _role(node: Dict) -> Optional[str]:
+    if node.get("type") == "TEXT":
+        return None
+    name = node.get("name") or ""
+    if BUTTON_PATTERN.search(name):
+        return "button"
+    if INPUT_PATTERN.search(name):
+        return "input"
+    return None
+
+
+def _text_of(node: Dict) -> str:
+    """All text under `node`, in document order."""
+    parts = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.get("type") == "TEXT" and current.get("text"):
+            parts.append(current["text"].strip())
+        stack.extend(reversed(current.get("children") or []))
+    return " ".join(part for part in parts if part)
+
+
+def _first_text_node(node: Dict) -> Optional[Dict]:
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.get("type") == "TEXT":
+            return current
+        stack.extend(reversed(current.get("children") or []))
+    return None
+
+
+def _escape_template_text(text: str) -> str:
+    """Escape text for an Angular template (HTML entities plus braces, which start interpolations)."""
+    return (text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            .replace("{", "&#123;").replace("}", "&#125;"))
+
+
+def _escape_attribute(text: str) -> str:
+    return _escape_template_text(text).replace('"', "&quot;")
+
+
+# === Simplicity check ===
+def scaffold_blockers(node: Dict) -> List[str]:
+    """
+    Reasons why `node` should go to the model instead of being scaffolded
+    (an empty list means it can be scaffolded).
+    """
+    reasons = []
+    count = 0
+    stack = [(node, 0)]
+    while stack:
+        current, depth = stack.pop()
+        count += 1
+        if current.get("type") not in SIMPLE_TYPES:
+            reasons.append(f"unsupported node type {current.get('type')} ({current.get('id')})")
+        if depth > MAX_SCAFFOLD_DEPTH:
+            reasons.append(f"nested deeper than {MAX_SCAFFOLD_DEPTH} levels")
+            break
+        for child in current.get("children") or []:
+            stack.append((child, depth + 1))
+    if count > MAX_SCAFFOLD_NODES:
+        reasons.append(f"{count} nodes (more than {MAX_SCAFFOLD_NODES})")
+    return reasons
+
+
+# === Generation ===
+class _Builder:
+    """Collects template lines, CSS rules, outputs and spec expectations while walking a subtree."""
+
+    def __init__(self, block: str):
+        self.block = block
+        self.css: List[Tuple[str, Dict[str, str]]] = []
+        self.outputs: List[Tuple[str, str, str]] = []  # (name, payload type, css class)
+        self.texts: List[str] = []
+        self._used: Dict[str, int] = {}
+
+    def unique(self, base: str) -> str:
+        count = self._used.get(base, 0) + 1
+        self._used[base] = count
+        return base if count == 1 else f"{base}-{count}"
+
+    def element_class(self, node: Dict) -> str:
+        words = _words(ROLE_WORDS.sub(" ", node.get("name") or "")) or _words(node.get("type", "node"))
+        return f"{self.block}__{self.unique('-'.join(words) or 'node')}"
+
+    def output_name(self, node: Dict, suffix: str) -> str:
+        words = _words(ROLE_WORDS.sub(" ", node.get("name") or "")) or ["action"]
+        base = words[0] + "".join(word.capitalize() for word in words[1:]) + suffix
+        return self.unique(base)
+
+    def styles(self, node: Dict, in_flow: bool) -> Dict[str, str]:
+        styles = node_styles(node)
+        if in_flow:
+            # Children of an auto-layout frame flow inside the flex container.
+            for prop in POSITION_PROPERTIES:
+                styles.pop(prop, None)
+        return styles
+
+    def render(self, node: Dict, indent: int, in_flow: bool) -> List[str]:
+        pad = "  " * indent
+        css_class = self.element_class(node) if indent else self.block
+        styles = self.styles(node, in_flow)
+        role = _role(node)
+        node_type = node.get("type")
+
+        if role == "button":
+            label = _text_of(node)
+            text_node = _first_text_node(node)
+            if text_node:
+                # The label's typography moves onto the button itself.
+                text_styles = node_styles(text_node)
+                for prop in ("color", "font-family", "font-weight", "font-size", "line-height",
+                             "letter-spacing", "text-align"):
+                    if prop in text_styles:
+                        styles.setdefault(prop, text_styles[prop])
+            styles.setdefault("cursor", "pointer")
+            output = self.output_name(node, "Click")
+            self.outputs.append((output, "void", css_class))
+            self.css.append((css_class, styles))
+            if label:
+                self.texts.append(label)
+            return [f'{pad}<button type="button" class="{css_class}" (click)="{output}.emit()">'
+                    f'{_escape_template_text(label)}</button>']
+
+        if role == "input":
+            placeholder = _text_of(node)
+            output = self.output_name(node, "Change")
+            self.outputs.append((output, "string", css_class))
+            self.css.append((css_class, styles))
+            label = _escape_attribute(placeholder or node.get("name") or "")
+            return [f'{pad}<input type="text" class="{css_class}" placeholder="{_escape_attribute(placeholder)}" '
+                    f'aria-label="{label}" (input)="{output}.emit($any($event.target).value)" />']
+
+        self.css.append((css_class, styles))
+        if node_type == "TEXT":
+            text = (node.get("text") or "").strip()
+            if text:
+                self.texts.append(text)
+            return [f'{pad}<span class="{css_class}">{_escape_template_text(text)}</span>']
+        if node_type == "VECTOR" and node.get("svgData"):
+            return [f'{pad}<div class="{css_class}" aria-hidden="true">{node["svgData"]}</div>']
+
+        children = node.get("children") or []
+        if not children:
+            return [f'{pad}<div class="{css_class}"></div>']
+        flex = (node.get("layout") or {}).get("display") == "flex"
+        lines = [f'{pad}<div class="{css_class}">']
+        for child in children:
+            lines += self.render(child, indent + 1, in_flow=flex)
+        lines.append(f"{pad}</div>")
+        return lines
+
+
+def _format_css(rules: List[Tuple[str, Dict[str, str]]]) -> str:
+    blocks = []
+    for css_class, styles in rules:
+        selector = css_class if css_class.startswith(":") else f".{css_class}"
+        body = "".join(f"  {prop}: {value};\n" for prop, value in styles.items())
+        blocks.append(f"{selector} {{\n{body}}}\n")
+    return "\n".join(blocks)
+
+
+def _format_ts(names: Dict[str, str], outputs: List[Tuple[str, str, str]]) -> str:
+    imports = "Component, EventEmitter, Output" if outputs else "Component"
+    members = "".join(f"  @Output() {name} = new EventEmitter<{payload}>();\n" for name, payload, _ in outputs)
+    return (
+        f"import {{ {imports} }} from '@angular/core';\n"
+        "\n"
+        "@Component({\n"
+        f"  selector: '{names['selector']}',\n"
+        f"  templateUrl: './{names['file']}.html',\n"
+        f"  styleUrls: ['./{names['file']}.css'],\n"
+        "})\n"
+        f"export class {names['class']} {{\n"
+        f"{members}"
+        "}\n"
+    )
+
+
+def _format_spec(names: Dict[str, str], outputs: List[Tuple[str, str, str]], texts: List[str]) -> str:
+    cls = names["class"]
+    tests = [
+        "  it('should create', () => {\n"
+        "    expect(component).toBeTruthy();\n"
+        "  });\n"
+    ]
+    for text in list(dict.fromkeys(texts))[:5]:
+        title = text[:40].replace("\\", "\\\\").replace("'", "\\'")
+        tests.append(
+            f"  it('should render {title}', () => {{\n"
+            f"    expect(fixture.nativeElement.textContent).toContain({json.dumps(text)});\n"
+            "  });\n"
+        )
+    for name, payload, css_class in outputs:
+        element = f"fixture.nativeElement.querySelector('.{css_class}')"
+        if payload == "void":
+            act = f"    {element}.click();\n"
+            expectation = f"    expect(component.{name}.emit).toHaveBeenCalled();\n"
+        else:
+            act = (f"    const input: HTMLInputElement = {element};\n"
+                   "    input.value = 'test';\n"
+                   "    input.dispatchEvent(new Event('input'));\n")
+            expectation = f"    expect(component.{name}.emit).toHaveBeenCalledWith('test');\n"
+        tests.append(
+            f"  it('should emit {name}', () => {{\n"
+            f"    spyOn(component.{name}, 'emit');\n"
+            f"{act}{expectation}"
+            "  });\n"
+        )
+    return (
+        "import { ComponentFixture, TestBed } from '@angular/core/testing';\n"
+        "\n"
+        f"import {{ {cls} }} from './{names['file']}';\n"
+        "\n"
+        f"describe('{cls}', () => {{\n"
+        f"  let component: {cls};\n"
+        f"  let fixture: ComponentFixture<{cls}>;\n"
+        "\n"
+        "  beforeEach(async () => {\n"
+        f"    await TestBed.configureTestingModule({{ declarations: [{cls}] }}).compileComponents();\n"
+        f"    fixture = TestBed.createComponent({cls});\n"
+        "    component = fixture.componentInstance;\n"
+        "    fixture.detectChanges();\n"
+        "  });\n"
+        "\n"
+        + "\n".join(tests)
+        + "});\n"
+    )
+
+
+@traced("scaffold.component")
+def scaffold_component(node: Dict, name: Optional[str] = None) -> Dict[str, str]:
+    """
+    Generate {"name", "ts", "html", "css", "spec_ts"} for the component rooted at `node`
+    (named after the layer unless `name` is given). Does not check scaffold_blockers.
+    """
+    names = component_names(name or node.get("name") or node.get("id", ""))
+    builder = _Builder(names["selector"][len("app-"):])
+    html_lines = builder.render(node, 0, in_flow=False)
+
+    # The component root sits in the flow of whatever page hosts it.
+    _, root_styles = builder.css[0]
+    for prop in POSITION_PROPERTIES:
+        root_styles.pop(prop, None)
+    root_styles["position"] = "relative"
+    builder.css.insert(0, (":host", {"display": "block"}))
+
+    return {
+        "name": names["class"],
+        "ts": _format_ts(names, builder.outputs),
+        "html": "\n".join(html_lines) + "\n",
+        "css": _format_css(builder.css),
+        "spec_ts": _format_spec(names, builder.outputs, builder.texts),
+    }
+
+
+def scaffold_design(alt_nodes: List[Dict], component_map: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Scaffold every top-level frame of an AltNode design that is simple enough.
+    `component_map` (node id or layer name -> component name) overrides the names.
+
+    Returns {"components": [UpdatedComponent-shaped dicts],
+             "needs_model": [{"id", "name", "reasons"}]} so only the latter are sent to the model.
+    """
+    component_map = component_map or {}
+    components = []
+    needs_model = []
+    for node in alt_nodes:
+        reasons = scaffold_blockers(node)
+        if reasons:
+            needs_model.append({"id": node.get("id"), "name": node.get("name"), "reasons": reasons})
+            continue
+        name = component_map.get(node.get("id")) or component_map.get(node.get("name"))
+        components.append(scaffold_component(node, name))
+    return {"components": components, "needs_model": needs_model}
+
+
+def write_component(component: Dict[str, str], output_dir: str) -> str:
+    """Write a scaffolded component to <output_dir>/<kebab-name>/ and return that directory."""
+    file_base = component_names(component["name"])["file"]
+    directory = os.path.join(output_dir, file_base[:-len(".component")])
+    os.makedirs(directory, exist_ok=True)
+    for key, suffix in (("ts", ".ts"), ("html", ".html"), ("css", ".css"), ("spec_ts", ".spec.ts")):
+        with open(os.path.join(directory, file_base + suffix), "w", encoding="utf-8") as f:
+            f.write(component[key])
+    return directory
+
+
+# === Main Execution ===
+if __name__ == '__main__':
+    # python scaffold.py altnodes.json [output_dir]
+    input_path = sys.argv[1]
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "scaffolded_components"
+    with open(input_path, "r", encoding="utf-8") as f:
+        design = json.load(f)
+    result = scaffold_design(design if isinstance(design, list) else [design])
+    for component in result["components"]:
+        print(f"Scaffolded {component['name']} -> {write_component(component, output_dir)}")
+    for entry in result["needs_model"]:
+        print(f"Needs model: {entry['name']} ({entry['id']}): {'; '.join(entry['reasons'])}")
@@ -0,0 +1,157 @@
+from functools import lru_cache
+
+# === Lazy schema construction ===
+# pydantic and langchain are slow to import, so the output schemas, their
+# PydanticOutputParser instances and format instructions are only built the
+# first time a pipeline actually asks for them.
+
+SCHEMA_NAMES = (
+    "ComponentUpdateList", "UpdatedComponent", "ComponentUpdateResult", "UpdatedPage",
+    "FileEdit", "UpdatedComponentEdits", "ComponentUpdateEditsResult", "UpdatedPageEdits",
+    "VisualDifference", "VisualQAResult",
+)
+
+
+@lru_cache(maxsize=None)
+def _build_schemas():
+    """
+    Define the pydantic models used by the prompt pipelines.
+    Returns a dict mapping schema name to model class.
+    """
+    from typing import List, Literal
+    from pydantic import BaseModel, Field
+
+    class ComponentUpdateList(BaseModel):
+        """List of components needing updates"""
+        components: List[str] = Field(..., description="Names of components requiring updates in order")
+
+    class UpdatedComponent(BaseModel):
+        """Represents the updated component."""
+        name: str = Field(..., description="The name of the updated component.")
+        html: str = Field(..., description="The updated HTML code.")
+        css: str = Field(..., description="The updated CSS code.")
+        spec_ts: str = Field(..., description="The updated spec.ts file.")
+        ts: str = Field(..., description="The updated TypeScript (.ts) code.")
+
+    class ComponentUpdateResult(BaseModel):
+        """
+        Represents the result of updating one or more Angular components.
+        It includes a list of updated components and an optional note on any required page-level integration changes.
+        """
+        updated_components: List[UpdatedComponent] = Field(..., description="A list of updated Angular components.")
+
+    class UpdatedPage(BaseModel):
+        """Represents the updated page."""
+        name: str = Field(..., description="The name of the updated page.")
+        html: str = Field(..., description="The updated HTML code for the page.")
+        css: str = Field(..., description="The updated CSS code for the page.")
+        spec_ts: str = Field(..., description="The updated spec.ts file for the page.")
+        ts: str = Field(..., description="The updated TypeScript (.ts) code for the page.")
+
+    # Diff response mode (see component_diff.py): each file is either unchanged,
+    # a unified diff against the existing file, or (as a fallback) the full content.
+    class FileEdit(BaseModel):
+        """Represents the change to a single file."""
+        mode: Literal["unchanged", "diff", "full"] = Field(..., description="'unchanged' if the existing file is kept as-is, 'diff' for a unified diff against the existing file, 'full' for the complete new file.")
+        content: str = Field("", description="Empty for 'unchanged', the unified diff for 'diff', the complete file for 'full'.")
+
+    class UpdatedComponentEdits(BaseModel):
+        """Represents the edits to an updated component."""
+        name: str = Field(..., description="The name of the updated component.")
+        html: FileEdit = Field(..., description="The edit to the HTML file.")
+        css: FileEdit = Field(..., description="The edit to the CSS file.")
+        spec_ts: FileEdit = Field(..., description="The edit to the spec.ts file.")
+        ts: FileEdit = Field(..., description="The edit to the TypeScript (.ts) file.")
+
+    class ComponentUpdateEditsResult(BaseModel):
+        """Represents the edits to one or more updated Angular components."""
+        updated_components: List[UpdatedComponentEdits] = Field(..., description="A list of edits to updated Angular components.")
+
+    class UpdatedPageEdits(BaseModel):
+        """Represents the edits to an updated page."""
+        name: str = Field(..., description="The name of the updated page.")
+        html: FileEdit = Field(..., description="The edit to the page HTML file.")
+        css: FileEdit = Field(..., description="The edit to the page CSS file.")
+        spec_ts: FileEdit = Field(..., description="The edit to the page spec.ts file.")
+        ts: FileEdit = Field(..., description="The edit to the page TypeScript (.ts) file.")
+
+    # Visual QA of an Angular screenshot against the Figma design (see visual_qa.py).
+    class VisualDifference(BaseModel):
+        """Represents one verified difference between the design and the implementation."""
+        category: str = Field(..., description="Component Type, Typography, Layout, Content or Visual State.")
+        element: str = Field(..., description="The element that differs, as visible in both images.")
+        description: str = Field(..., description="What differs between the Figma design and the Angular implementation.")
+        confidence: Literal["LOW", "MEDIUM", "HIGH"] = Field(..., description="How certain the difference is.")
+        user_instruction: str = Field(..., description="An instruction that would fix the difference.")
+
+    class VisualQAResult(BaseModel):
+        """Represents the visual QA assessment of one page."""
+        assessment: Literal["ACCURATE", "DIFFERENCES_FOUND"] = Field(..., description="'ACCURATE' if no clear differences were found.")
+        differences: List[VisualDifference] = Field(default_factory=list, description="The verified differences.")
+
+    schemas = {
+        "ComponentUpdateList": ComponentUpdateList,
+        "UpdatedComponent": UpdatedComponent,
+        "ComponentUpdateResult": ComponentUpdateResult,
+        "UpdatedPage": UpdatedPage,
+        "FileEdit": FileEdit,
+        "UpdatedComponentEdits": UpdatedComponentEdits,
+        "ComponentUpdateEditsResult": ComponentUpdateEditsResult,
+        "UpdatedPageEdits": UpdatedPageEdits,
+        "VisualDifference": VisualDifference,
+        "VisualQAResult": VisualQAResult,
+    }
+    # Make the classes resolvable as schemas.<Name> so instances can be pickled.
+    for name, cls in schemas.items():
+        cls.__module__ = __name__
+        cls.__qualname__ = name
+    return schemas
+
+
+def get_schema(name: str):
+    """Return the pydantic model class registered under `name`."""
+    schemas = _build_schemas()
+    if name not in schemas:
+        raise KeyError(f"Unknown schema: {name}")
+    return schemas[name]
+
+
+@lru_cache(maxsize=None)
+def get_parser(name: str):
+    """Return a (cached) PydanticOutputParser for the schema `name`."""
+    from langchain.output_parsers import PydanticOutputParser
+    return PydanticOutputParser(pydantic_object=get_schema(name))
+
+
+@lru_cache(maxsize=None)
+def get_format_instructions(name: str) -> str:
+    """Return the (cached) format instructions for the schema `name`."""
+    return get_parser(name).get_format_instructions()
+
+
+def schema_to_dict(obj) -> dict:
+    """Convert a schema instance to a plain dict (pydantic v2 or v1)."""
+    dump = getattr(obj, "model_dump", None) or obj.dict
+    return dump()
+
+
+def lazy_module_attributes(module_name: str, attributes: dict):
+    """
+    Build a module-level __getattr__ (PEP 562) that resolves the given names lazily.
+
+    `attributes` maps an attribute name to a (factory, schema name) pair, e.g.
+    {"output_parser_1": (get_parser, "UpdatedComponent")}. This keeps the old
+    module-level names importable without paying for them at import time.
+    """
+    def __getattr__(name):
+        if name in attributes:
+            factory, schema_name = attributes[name]
+            return factory(schema_name)
+        raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+    return __getattr__
+
+
+def __getattr__(name):
+    if name in SCHEMA_NAMES:
+        return get_schema(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,202 @@
+import json
+import re
+from typing import Any, Dict, Optional
+
+from schemas import get_schema
+from tracing import span
+
+# === Fast structured-output parsing ===
+# Model responses for UpdatedComponent / UpdatedPage / ComponentUpdateResult carry
+# whole .ts/.html/.css/.spec.ts files inside JSON strings. Instead of going through
+# PydanticOutputParser (and a new model call when it fails), we pull the JSON out
+# of the raw text with the C decoder, repair the usual breakage locally and then
+# validate against the pydantic schema.
+
+_DECODER = json.JSONDecoder(strict=False)
+
+# A backslash followed by a valid JSON escape is kept; any other backslash is doubled.
+_ESCAPE_PATTERN = re.compile(r'\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})?')
+
+# Characters the structural scanner cares about.
+_STRUCTURE_PATTERN = re.compile(r'[\\"{}\[\],]')
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class StructuredOutputError(Exception):
+    """Raised when a model response cannot be turned into the requested schema."""
+
+
+class TruncatedOutputError(StructuredOutputError):
+    """Raised when a model response ends inside a string or an open object/array."""
+
+
+def _response_text(response) -> str:
+    """Accept a plain string or a chat message object exposing `.content`."""
+    if isinstance(response, str):
+        return response
+    content = getattr(response, "content", None)
+    if isinstance(content, str):
+        return content
+    raise StructuredOutputError(f"Unsupported response type: {type(response).__name__}")
+
+
+def _candidate_starts(text: str):
+    """
+    Yield the offsets where the JSON object most likely starts: right after a
+    ```json fence if there is one, then the first '{' in the text.
+    """
+    seen = set()
+    fence = text.find("```")
+    if fence != -1:
+        start = text.find("{", fence)
+        if start != -1:
+            seen.add(start)
+            yield start
+    start = text.find("{")
+    if start != -1 and start not in seen:
+        yield start
+
+
+def _fix_escapes(text: str) -> str:
+    """Double every backslash that does not start a valid JSON escape sequence."""
+    return _ESCAPE_PATTERN.sub(lambda m: m.group(0) if len(m.group(0)) > 1 else "\\\\", text)
+
+
+def _fix_structure(text: str) -> str:
+    """
+    Single pass over `text` (which starts at the opening '{') that:
+      - stops at the matching closing brace, dropping any trailing noise
+      - removes trailing commas before '}' or ']'
+    Raises TruncatedOutputError when the text ends inside a string or before the object
+    is closed: closing it here would accept a partial file as complete code.
+    Expects invalid escapes to have been fixed already.
+    """
+    out = []
+    last = 0
+    stack = []
+    in_string = False
+    skip_until = -1
+    for match in _STRUCTURE_PATTERN.finditer(text):
+        pos = match.start()
+        if pos < skip_until:
+            continue
+        char = match.group(0)
+        if in_string:
+            if char == "\\":
+                # The next character is escaped, even if it is a quote or backslash.
+                skip_until = pos + 2
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+            continue
+        if char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            # Drop a comma that only has whitespace between it and this closer.
+            if out and out[-1] == "," and not text[last:pos].strip():
+                out.pop()
+            if stack:
+                stack.pop()
+            if not stack:
+                out.append(text[last:pos + 1])
+                return "".join(out)
+        elif char == ",":
+            out.append(text[last:pos])
+            out.append(",")
+            last = pos + 1
+            continue
+        out.append(text[last:pos + 1])
+        last = pos + 1
+
+    where = "inside a string" if in_string else f"with {len(stack)} unclosed bracket(s)"
+    raise TruncatedOutputError(f"Model response ends {where}; it was probably truncated.")
+
+
+def repair_json_text(text: str) -> str:
+    """
+    Apply the local repairs for common model breakage: invalid backslash escapes
+    (e.g. regexes or Windows paths pasted into code), trailing commas and trailing
+    prose after the object. Truncated output is not repaired (TruncatedOutputError).
+    """
+    return _fix_structure(_fix_escapes(text))
+
+
+def loads_lenient(response) -> Dict[str, Any]:
+    """
+    Decode the JSON object embedded in a raw model response.
+
+    Fenced (```json ... ```) or noisy output is handled by decoding from the
+    first object start and ignoring anything after it. Raw newlines and tabs
+    inside strings are accepted. If plain decoding fails, the object is repaired
+    locally and decoded again. A truncated object raises TruncatedOutputError.
+    """
+    text = _response_text(response)
+    starts = list(_candidate_starts(text))
+    if not starts:
+        raise StructuredOutputError("No JSON object found in model response.")
+
+    # Fast path: the C decoder straight from the object start.
+    for start in starts:
+        try:
+            data, _ = _DECODER.raw_decode(text, start)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+
+    # Slow path: repair the most likely candidate.
+    last_error = None
+    for start in starts:
+        try:
+            data = _DECODER.decode(repair_json_text(text[start:]))
+        except (TruncatedOutputError, json.JSONDecodeError) as e:
+            last_error = e
+            continue
+        if isinstance(data, dict):
+            return data
+    if isinstance(last_error, TruncatedOutputError):
+        raise last_error
+    raise StructuredOutputError(f"Could not repair model response: {last_error}")
+
+
+def _unwrap(data: Dict[str, Any], schema) -> Dict[str, Any]:
+    """
+    Models sometimes echo the format instructions and nest the answer under
+    "properties"; unwrap it when the top level lacks the schema's fields.
+    """
+    fields = getattr(schema, "model_fields", None) or getattr(schema, "__fields__", {})
+    if fields and not any(name in data for name in fields) and isinstance(data.get("properties"), dict):
+        return data["properties"]
+    return data
+
+
+def parse_structured_output(response, schema_name: str, validate: bool = True):
+    """
+    Parse a raw model response into the pydantic schema `schema_name`
+    (e.g. "UpdatedComponent", "UpdatedPage", "ComponentUpdateResult").
+
+    With validate=False the decoded dict is returned without touching pydantic.
+    """
+    with span("parse", schema=schema_name) as s:
+        s.add("bytes", len(_response_text(response)))
+        data = loads_lenient(response)
+        if not validate:
+            return data
+        schema = get_schema(schema_name)
+        data = _unwrap(data, schema)
+        validator = getattr(schema, "model_validate", None) or schema.parse_obj
+        try:
+            return validator(data)
+        except Exception as e:
+            raise StructuredOutputError(f"Response does not match {schema_name}: {e}") from e
+
+
+def try_parse_structured_output(response, schema_name: str) -> Optional[Any]:
+    """Like parse_structured_output, but returns None instead of raising."""
+    try:
+        return parse_structured_output(response, schema_name)
+    except StructuredOutputError:
+        return None
@@ -1,31 +1,26 @@
-from langchain.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
-
-class UpdatedComponent(BaseModel):
-    """Represents the updated component."""
-    name: str = Field(..., description="The name of the updated component.")
-    html: str = Field(..., description="The updated HTML code.")
-    css: str = Field(..., description="The updated CSS code.")
-    spec_ts: str = Field(..., description="The updated spec.ts file.")
-    ts: str = Field(..., description="The updated TypeScript (.ts) code.")
-
-class UpdatedPage(BaseModel):
-    """Represents the updated page."""
-    name: str = Field(..., description="The name of the updated page.")
-    html: str = Field(..., description="The updated HTML code for the page.")
-    css: str = Field(..., description="The updated CSS code for the page.")
-    spec_ts: str = Field(..., description="The updated spec.ts file for the page.")
-    ts: str = Field(..., description="The updated TypeScript (.ts) code for the page.")
-
-# Get the format instructions
-output_parser_1 = PydanticOutputParser(pydantic_object=UpdatedComponent)
-output_parser_2 = PydanticOutputParser(pydantic_object=UpdatedPage)
-
-format_instructions_1 = output_parser_1.get_format_instructions()
-format_instructions_2 = output_parser_2.get_format_instructions()
-
-def update_angular_component(html_path, css_path, image_path, lexicon_components, page_name, page_image_path, page_angular_code, page_angular_components, page_angular_components_code, usr_inst):
+from component_diff import materialize_edits, response_format
+from component_interface import page_update_needed
+from llm import encode_image, invoke_structured, read_file
+from schemas import get_format_instructions, get_parser, get_schema, lazy_module_attributes, schema_to_dict
+from tracing import current_span, traced
+
+# Schemas, parsers and format instructions are built on first use (see schemas.py).
+__getattr__ = lazy_module_attributes(__name__, {
+    "UpdatedComponent": (get_schema, "UpdatedComponent"),
+    "UpdatedPage": (get_schema, "UpdatedPage"),
+    "output_parser_1": (get_parser, "UpdatedComponent"),
+    "output_parser_2": (get_parser, "UpdatedPage"),
+    "format_instructions_1": (get_format_instructions, "UpdatedComponent"),
+    "format_instructions_2": (get_format_instructions, "UpdatedPage"),
+})
+
+@traced("testing.update_angular_component")
+def update_angular_component(html_path, css_path, image_path, lexicon_components, page_name, page_image_path, page_angular_code, page_angular_components, page_angular_components_code, usr_inst, response_mode="full", model=None):
     
+    # response_mode="diff" asks for per-file unified diffs instead of full files (see component_diff.py).
+    schema_name, file_rule = response_format("UpdatedComponent", response_mode)
+    format_instructions_1 = get_format_instructions(schema_name)
+
     new_html = read_file(html_path)
     new_css = read_file(css_path)
     new_image = encode_image(image_path)
@@ -64,7 +59,7 @@ def update_angular_component(html_path, css_path, image_path, lexicon_components
 
         # COMPONENT GENERATION
         - Update the `.ts`, `.html`, `.css`, and `.spec.ts` files for the identified component to match the new structure.
-        - **If any file does not require changes**, provide the existing content as-is.
+        - {file_rule}
 
         1. **TypeScript File (.ts)**  
         - Define the component class, decorators, and metadata.  
@@ -112,10 +107,33 @@ def update_angular_component(html_path, css_path, image_path, lexicon_components
         
         <<OUTPUT>>
 """
-## need to get output from model and parse it to json format so send to next invocation of model as input
 
-def update_angular_page(updated_component_name, updated_component_code, page_image_path, page_name, page_code, page_angular_components, page_angular_components_code, usr_inst):
+    # Parse the model output so it can be sent to update_angular_page as input.
+    updated_component = invoke_structured(prompt_step1, schema_name, model, task="component_update")
+    if response_mode == "diff":
+        existing = page_angular_components_code.get(updated_component.name, {}) if isinstance(page_angular_components_code, dict) else {}
+        updated_component = materialize_edits(updated_component, existing, "UpdatedComponent")
+    return updated_component
+
+@traced("testing.update_angular_page")
+def update_angular_page(updated_component_name, updated_component_code, page_image_path, page_name, page_code, page_angular_components, page_angular_components_code, usr_inst, response_mode="full", model=None, skip_unchanged_interface=True):
     
+    # Skip the page call when the component's interface (selector, inputs, outputs,
+    # public methods) is unchanged: the existing page still fits (see component_interface.py).
+    if skip_unchanged_interface:
+        # update_angular_component returns an UpdatedComponent; callers may also pass a dict.
+        code = (updated_component_code if isinstance(updated_component_code, dict)
+                else schema_to_dict(updated_component_code))
+        needed, reasons = page_update_needed([dict(code, name=updated_component_name)], page_angular_components_code)
+        current_span().set(page_update_needed=needed, reasons=reasons)
+        if not needed:
+            return None
+
+    # Diffs need the existing page files as a dict ({"ts": ..., "html": ..., ...}).
+    page_mode = response_mode if isinstance(page_code, dict) else "full"
+    schema_name, file_rule = response_format("UpdatedPage", page_mode)
+    format_instructions_2 = get_format_instructions(schema_name)
+
     page_image = encode_image(page_image_path)
     
     prompt_step2 = f"""
@@ -147,7 +165,7 @@ def update_angular_page(updated_component_name, updated_component_code, page_ima
 
         ## PAGE UPDATING
          Update the `.ts`, `.html`, `.css`, and `.spec.ts` files for the page.
-        - **If any file does not require changes**, provide the existing content as-is.
+        - {file_rule}
 
         ### 1. TYPESCRIPT (.ts) FILE
         - Update the page's class and metadata to reference the updated component.
@@ -191,4 +209,9 @@ def update_angular_page(updated_component_name, updated_component_code, page_ima
         {format_instructions_2}
 
         <<OUTPUT>>
-        """
\ No newline at end of file
+        """
+
+    updated_page = invoke_structured(prompt_step2, schema_name, model, task="page_update")
+    if page_mode == "diff":
+        updated_page = materialize_edits(updated_page, page_code, "UpdatedPage")
+    return updated_page
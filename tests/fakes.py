@@ -0,0 +1,381 @@
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List
+
+# Test doubles and synthetic inputs shared by the tests and benchmarks.py: local stand-ins
+# for the model provider, the model tiers and the Figma API, and generators for sources,
+# designs and screenshots.
+
+# === Model provider ===
+class ModelStubServer:
+    """
+    Local stand-in for the provider, on 127.0.0.1: POST /v1/invoke with a prompt as
+    the body answers after `latency` seconds, unless the request does not fit the
+    endpoint's own tokens-per-minute and requests-per-minute buckets, in which case it
+    answers 429 like the real API. The server object is also the model: `.invoke(prompt)`
+    posts to it and returns a response that reports usage like langchain (a 429 raises
+    urllib's HTTPError).
+    """
+
+    def __init__(self, tpm: int, rpm: int, latency: float = 0.05, completion_tokens: int = 50):
+        import http.server
+
+        from rate_limiter import TokenBucket, estimate_tokens
+
+        stub = self
+        self.tokens = TokenBucket(tpm)
+        self.requests = TokenBucket(rpm)
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.model_name = "model-stub"
+        self.calls = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                prompt = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                total = estimate_tokens(prompt) + stub.completion_tokens
+                with stub._lock:
+                    now = time.monotonic()
+                    limited = stub.tokens.wait_time(total, now) > 0 or stub.requests.wait_time(1, now) > 0
+                    if limited:
+                        stub.rejected += 1
+                    else:
+                        stub.tokens.take(total, now)
+                        stub.requests.take(1, now)
+                        stub.calls += 1
+                if limited:
+                    self._send(429, {"error": "Rate limit reached (model stub)"})
+                    return
+                time.sleep(stub.latency)
+                self._send(200, {"content": f"echo {len(prompt)}",
+                                 "usage": {"input_tokens": total - stub.completion_tokens,
+                                           "output_tokens": stub.completion_tokens, "total_tokens": total}})
+
+        class Server(http.server.ThreadingHTTPServer):
+            request_queue_size = 64  # Bursts from many threads would overflow the default backlog of 5.
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def invoke(self, prompt: str):
+        import urllib.request
+
+        request = urllib.request.Request(f"{self.url}/v1/invoke", data=prompt.encode("utf-8"), method="POST")
+        with urllib.request.urlopen(request) as reply:
+            payload = json.load(reply)
+        response = type("StubResponse", (), {})()
+        response.content = payload["content"]
+        response.usage_metadata = payload["usage"]
+        return response
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# === Model tiers ===
+class FakeTierEndpoint:
+    """
+    Local stand-in for one model tier: answers any prompt with a ComponentUpdateList
+    JSON after `latency` seconds plus a per-token delay, and with unparseable text for
+    a `parse_failure_rate` share of the calls.
+    """
+
+    def __init__(self, model_name: str, latency: float, seconds_per_1k_tokens: float,
+                 parse_failure_rate: float = 0.0, seed: int = 0):
+        self.model_name = model_name
+        self.latency = latency
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.parse_failure_rate = parse_failure_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt: str):
+        from rate_limiter import estimate_tokens
+
+        with self._lock:
+            self.calls += 1
+            broken = self._rng.random() < self.parse_failure_rate
+        time.sleep(self.latency + estimate_tokens(prompt) / 1000 * self.seconds_per_1k_tokens)
+        return "Sorry, I cannot help with that." if broken else '{"components": ["HeaderComponent"]}'
+
+# === Figma REST API ===
+class FigmaStubServer:
+    """
+    Local stand-in for the Figma REST API and its image storage, on 127.0.0.1:
+      - GET /v1/files/<key>?depth=1 -> {"version": <version>}
+      - GET /v1/images/<key>?ids=... -> {"err": null, "images": {id: <render url>}}
+      - GET /renders/<id>.png       -> fake PNG bytes, after `latency` seconds
+    Counts requests per kind so callers can check batching and caching.
+    """
+
+    def __init__(self, version: str = "1", latency: float = 0.02, image_kb: int = 64):
+        import http.server
+
+        stub = self
+        self.version = version
+        self.latency = latency
+        self.image = b"\x89PNG\r\n\x1a\n" + os.urandom(image_kb * 1024)
+        self.counts = {"files": 0, "images": 0, "renders": 0}
+        self._lock = threading.Lock()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                from urllib.parse import parse_qs, urlparse
+
+                url = urlparse(self.path)
+                kind = url.path.split("/")[1] if url.path.startswith("/renders/") else url.path.split("/")[2]
+                with stub._lock:
+                    stub.counts[kind] = stub.counts.get(kind, 0) + 1
+                if kind == "files":
+                    self._send(json.dumps({"version": stub.version}).encode(), "application/json")
+                elif kind == "images":
+                    ids = parse_qs(url.query)["ids"][0].split(",")
+                    base = f"http://127.0.0.1:{stub.port}/renders"
+                    images = {node_id: f"{base}/{node_id.replace(':', '-')}.png" for node_id in ids}
+                    self._send(json.dumps({"err": None, "images": images}).encode(), "application/json")
+                else:
+                    time.sleep(stub.latency)
+                    self._send(stub.image, "image/png")
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# === Synthetic sources ===
+def synthetic_source(kilobytes: int, seed: int = 0) -> str:
+    """Generate roughly `kilobytes` KB of TypeScript-looking code with quotes, regexes and templates."""
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    while size < kilobytes * 1024:
+        n = rng.randint(0, 9999)
+        line = rng.choice([
+            f"  public field{n}: string = 'value {n}';",
+            f'  @Input() label{n} = "Label \\"{n}\\"";',
+            f"  validate{n}(v: string) {{ return /^\\d+$/.test(v); }}",
+            f"  <div class=\"row-{n}\" *ngIf=\"items.length\">{{{{ item{n} }}}}</div>",
+            f"  .block__element--{n} {{ margin: {n % 32}px; }}",
+        ])
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def synthetic_component_response(kilobytes: int, broken: bool = False) -> str:
+    """
+    Build a fenced UpdatedComponent response whose four files total about `kilobytes` KB.
+    With broken=True the JSON gets invalid escapes and a trailing comma, like real model output.
+    """
+    per_file = max(1, kilobytes // 4)
+    payload = {
+        "name": "AccountSummaryComponent",
+        "ts": synthetic_source(per_file, seed=1),
+        "html": synthetic_source(per_file, seed=2),
+        "css": synthetic_source(per_file, seed=3),
+        "spec_ts": synthetic_source(per_file, seed=4),
+    }
+    body = json.dumps(payload, indent=2)
+    if broken:
+        body = body.replace("\\\\d", "\\d").rstrip("}") + ",\n}"
+    return f"Here is the updated component:\n```json\n{body}\n```\n"
+
+# === Synthetic designs and corpora ===
+def synthetic_alt_nodes(depth: int = 4, fanout: int = 4, text_ratio: float = 0.4, vector_ratio: float = 0.1,
+                        seed: int = 0) -> List[Dict]:
+    """
+    Generate a list with one top-level AltNode frame whose tree is `depth` levels deep,
+    with `fanout` children per container. Leaves are TEXT nodes with probability
+    `text_ratio`, VECTOR nodes (with inline SVG) with `vector_ratio`, otherwise RECTANGLEs.
+    """
+    rng = random.Random(seed)
+    counter = [0]
+
+    def node(level: int, node_type: str) -> Dict:
+        counter[0] += 1
+        result = {
+            "id": f"{level}:{counter[0]}",
+            "name": f"{node_type.title()} {counter[0]}",
+            "type": node_type,
+            "position": {"x": rng.randint(0, 1200) + 0.5, "y": rng.randint(0, 4000) + 0.25},
+            "dimensions": {"width": rng.randint(8, 400), "height": rng.randint(8, 200)},
+            "styles": {
+                "background": f"rgba({rng.randint(0, 255)}, {rng.randint(0, 255)}, {rng.randint(0, 255)}, 1)",
+                "border": {"width": 1, "color": "#d0d5dd", "radius": "8px"} if rng.random() < 0.3 else None,
+                "shadow": {"x": 0, "y": 2, "blur": 4, "color": "rgba(0, 0, 0, 0.1)"} if rng.random() < 0.2 else None,
+                "opacity": 1,
+            },
+        }
+        if node_type == "TEXT":
+            result["text"] = " ".join(rng.choice(["Account", "Balance", "Pay", "<Total>", "&", "Due"])
+                                      for _ in range(rng.randint(1, 6)))
+            result["typography"] = {"fontFamily": "Inter", "fontWeight": rng.choice([400, 500, 700]),
+                                    "fontSize": f"{rng.choice([12, 14, 16, 24])}px",
+                                    "lineHeight": "150percent", "letterSpacing": "0px", "textAlign": "left"}
+        elif node_type == "VECTOR":
+            result["svgData"] = f'<svg viewBox="0 0 24 24"><path d="M{rng.randint(0, 24)} 0L24 24Z"/></svg>'
+        elif node_type == "FRAME":
+            result["layout"] = {"display": "flex", "gap": f"{rng.choice([4, 8, 16])}px", "padding": "8px 16px"}
+        return result
+
+    def build(level: int) -> Dict:
+        if level == depth:
+            roll = rng.random()
+            node_type = "TEXT" if roll < text_ratio else "VECTOR" if roll < text_ratio + vector_ratio else "RECTANGLE"
+            return node(level, node_type)
+        frame = node(level, "FRAME")
+        frame["children"] = [build(level + 1) for _ in range(fanout)]
+        return frame
+
+    return [build(0)]
+
+def synthetic_list_screen(items: int = 200, item_depth: int = 2, fanout: int = 4, seed: int = 0) -> List[Dict]:
+    """
+    A list-heavy screen: one frame holding `items` copies of the same card that differ
+    only in their ids, text and vertical position (like list rows or a card grid).
+    """
+    card = synthetic_alt_nodes(depth=item_depth, fanout=fanout, seed=seed)[0]
+    rows = []
+    for index in range(items):
+        row = json.loads(json.dumps(card))
+        row["position"] = {"x": 0, "y": index * row["dimensions"]["height"]}
+        stack = [row]
+        while stack:
+            node = stack.pop()
+            node["id"] = f"{index}-{node['id']}"
+            if node["type"] == "TEXT":
+                node["text"] = f"Row {index} {node['text']}"
+            stack.extend(node.get("children") or [])
+        rows.append(row)
+    return [{"id": "list", "name": "List", "type": "FRAME", "position": {"x": 0, "y": 0},
+             "dimensions": {"width": 1200, "height": items * card["dimensions"]["height"]}, "children": rows}]
+
+def synthetic_figma_document(depth: int = 4, fanout: int = 4, seed: int = 0, pages: int = 2) -> Dict:
+    """
+    Generate a raw Figma file document (DOCUMENT -> CANVAS -> frames) including the
+    bulky properties extract_relevant_metadata is meant to drop.
+    """
+    rng = random.Random(seed)
+    counter = [0]
+
+    def node(level: int) -> Dict:
+        counter[0] += 1
+        leaf = level == depth
+        node_type = rng.choice(["TEXT", "RECTANGLE", "VECTOR"]) if leaf else "FRAME"
+        result = {
+            "id": f"{level}:{counter[0]}",
+            "name": f"{node_type.title()} {counter[0]}",
+            "type": node_type,
+            "scrollBehavior": "SCROLLS",
+            "blendMode": "PASS_THROUGH",
+            "absoluteBoundingBox": {"x": rng.uniform(0, 1200), "y": rng.uniform(0, 4000),
+                                    "width": rng.uniform(8, 400), "height": rng.uniform(8, 200)},
+            "absoluteRenderBounds": {"x": 0, "y": 0, "width": 100, "height": 100},
+            "constraints": {"vertical": "TOP", "horizontal": "LEFT"},
+            "fills": [{"blendMode": "NORMAL", "type": "SOLID",
+                       "color": {"r": rng.random(), "g": rng.random(), "b": rng.random(), "a": 1}}],
+            "strokes": [],
+            "strokeWeight": 1,
+            "strokeAlign": "INSIDE",
+            "effects": [],
+            "interactions": [],
+        }
+        if node_type == "TEXT":
+            result["characters"] = "Account balance " * rng.randint(1, 4)
+            result["style"] = {"fontFamily": "Inter", "fontWeight": 500, "fontSize": 14, "lineHeightPx": 20}
+            result["characterStyleOverrides"] = [0] * 16
+        if not leaf:
+            result["children"] = [node(level + 1) for _ in range(fanout)]
+        return result
+
+    pages = [{"id": f"0:{page}", "name": f"Page {page}", "type": "CANVAS", "children": [node(1)]}
+             for page in range(pages)]
+    return {"id": "0:0", "name": "Document", "type": "DOCUMENT", "children": pages}
+
+def synthetic_angular_corpus(files: int = 20, components_per_file: int = 3, seed: int = 0) -> Dict[str, str]:
+    """
+    Generate {relative path: source} of Angular 7-style TypeScript: components with
+    HttpClientModule-era imports, rxjs operator chains and ViewChild queries.
+    """
+    rng = random.Random(seed)
+    corpus = {}
+    for index in range(files):
+        parts = [
+            "import { Component, OnInit, ViewChild, ElementRef } from '@angular/core';",
+            "import { Http } from '@angular/http';",
+            "import 'rxjs/add/operator/map';",
+            "import { Observable } from 'rxjs/Observable';",
+            "",
+        ]
+        for component in range(components_per_file):
+            name = f"Feature{index}Part{component}"
+            body = [
+                "@Component({",
+                f"  selector: 'app-feature-{index}-{component}',",
+                f"  templateUrl: './feature-{index}-{component}.component.html',",
+                "})",
+                f"export class {name}Component implements OnInit {{",
+                "  @ViewChild('host') host: ElementRef;",
+                "  items: any[] = [];",
+                "",
+                "  constructor(private http: Http) {}",
+                "",
+                "  ngOnInit() {",
+            ]
+            for call in range(rng.randint(2, 8)):
+                body += [
+                    f"    this.http.get('/api/items/{call}')",
+                    "      .map(res => res.json())",
+                    f"      .subscribe(data => this.items{call} = data);",
+                ]
+            body += ["  }", "}", ""]
+            parts += body
+        corpus[f"src/app/feature-{index}/feature-{index}.component.ts"] = "\n".join(parts)
+    return corpus
+
+def synthetic_screenshot(height: int = 2400, width: int = 1440, blocks: int = 120, seed: int = 0):
+    """A page-like RGB array: coloured blocks (cards, text lines, buttons) on white."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    pixels = np.full((height, width, 3), 255, np.uint8)
+    for _ in range(blocks):
+        y, x = rng.integers(0, height - 60), rng.integers(0, width - 300)
+        pixels[y:y + rng.integers(10, 60), x:x + rng.integers(40, 300)] = rng.integers(0, 255, 3)
+    return pixels
@@ -0,0 +1,45 @@
+import json
+
+from benchmarks import REGRESSION_MIN_MS, TARGET_MIN_SIZE, compare_results, missed_targets
+
+
+def _row(ms, peak_kb, size=1000):
+    return {"bench": "main.build_html_document", "size": size, "unit": "nodes", "ms": ms, "peak_kb": peak_kb}
+
+
+def _baseline(tmp_path, rows):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"revision": "abc1234", "results": rows}))
+    return str(path)
+
+
+def test_compare_results_reports_slower_and_larger_runs(tmp_path):
+    baseline = _baseline(tmp_path, [_row(100.0, 1000.0), _row(10.0, 100.0, size=10)])
+    regressions = compare_results(baseline, [_row(130.0, 1500.0), _row(10.5, 100.0, size=10)])
+    assert regressions == [
+        {"bench": "main.build_html_document", "size": 1000, "metric": "ms", "before": 100.0, "after": 130.0},
+        {"bench": "main.build_html_document", "size": 1000, "metric": "peak_kb", "before": 1000.0, "after": 1500.0},
+    ]
+
+
+def test_compare_results_ignores_noise_and_new_sizes(tmp_path):
+    baseline = _baseline(tmp_path, [_row(100.0, 1000.0), _row(1.0, 100.0, size=10)])
+    rows = [
+        _row(115.0, 1100.0),  # Within the threshold.
+        _row(1.0 + REGRESSION_MIN_MS / 2, 100.0, size=10),  # 50% slower, but under REGRESSION_MIN_MS.
+        _row(500.0, 5000.0, size=99999),  # No stored result for this size.
+    ]
+    assert compare_results(baseline, rows) == []
+
+
+def test_missed_targets_only_checks_large_runs():
+    bench = "figma_altnodes.document_to_altnodes"
+    rows = [
+        {"bench": bench, "size": TARGET_MIN_SIZE // 10, "per_second": 10.0},  # Too small to count.
+        {"bench": bench, "size": TARGET_MIN_SIZE, "per_second": 150.0},
+        {"bench": bench, "size": TARGET_MIN_SIZE * 2, "per_second": 90.0},
+        {"bench": "main.build_html_document", "size": TARGET_MIN_SIZE, "per_second": 1.0},  # No target.
+    ]
+    assert missed_targets(rows, targets={bench: 100.0}) == [
+        {"bench": bench, "size": TARGET_MIN_SIZE * 2, "per_second": 90.0, "target": 100.0},
+    ]
@@ -0,0 +1,68 @@
+from codemods import apply_codemods, migrate_rxjs_operators, migrate_view_child_static, unsupported_patterns
+from id_chunking import plan_file
+
+RXJS_IMPORTS = """import 'rxjs/add/operator/map';
+import 'rxjs/add/operator/filter';
+import 'rxjs/add/operator/catch';
+import 'rxjs/add/operator/finally';
+import { HttpClient } from '@angular/common/http';
+"""
+
+
+def _component(body):
+    return RXJS_IMPORTS + f"""export class ListComponent {{
+  items$: Observable<Item[]>;
+  constructor(private http: HttpClient) {{}}
+  load() {{
+    {body}
+  }}
+}}
+"""
+
+
+def test_observable_chains_are_piped():
+    code, count = migrate_rxjs_operators(_component(
+        "this.http.get<Item[]>('/api').map(items => items.length).catch(e => of(0)).subscribe();\n"
+        "    this.items$.filter(items => items.length > 0).finally(() => this.done());\n"
+        "    of(1).map(x => x + 1);"
+    ))
+    assert "this.http.get<Item[]>('/api').pipe(map(items => items.length), catchError(e => of(0))).subscribe();" in code
+    assert "this.items$.pipe(filter(items => items.length > 0), finalize(() => this.done()));" in code
+    assert "of(1).pipe(map(x => x + 1));" in code
+    assert "import { catchError, filter, finalize, map } from 'rxjs/operators';" in code
+    assert "rxjs/add/operator" not in code
+    assert count == 3 + 4
+
+
+def test_promise_chains_are_left_for_the_model():
+    source = _component("navigator.clipboard.writeText('x').catch(e => console.log(e)).finally(() => this.done());")
+    code, _ = apply_codemods(source)
+    assert "writeText('x').catch(e => console.log(e)).finally(() => this.done());" in code
+    assert "import 'rxjs/add/operator/catch';" in code and "import 'rxjs/add/operator/finally';" in code
+    plan = plan_file(source, lines_per_chunk=3)
+    [chain_chunk] = [chunk for chunk in plan["chunks"] if "writeText" in chunk["code"]]
+    assert chain_chunk in plan["pending"]
+
+
+def test_array_map_and_filter_are_left_alone():
+    source = _component("const names = this.items.map(item => item.name).filter(name => !!name);")
+    code, _ = migrate_rxjs_operators(source)
+    assert "this.items.map(item => item.name).filter(name => !!name);" in code
+    assert unsupported_patterns("const names = this.items.map(item => item.name);", ["filter", "map"]) == [
+        "rxjs_patch_operator"]
+    assert unsupported_patterns("const names = this.items.map(item => item.name);") == []
+
+
+def test_view_child_static_skips_modifiers_and_merges_options():
+    code, count = migrate_view_child_static("""export class A {
+  @ViewChild(Foo) public foo: Foo;
+  @ViewChild('ref', {read: ElementRef}) private readonly ref: ElementRef;
+  @ContentChild(Bar, { static: false }) bar: Bar;
+  @ViewChild(Baz) baz: Baz;
+  ngOnInit() { this.foo.x(); this.ref.nativeElement.focus(); this.bar.y(); }
+}""")
+    assert "@ViewChild(Foo, { static: true }) public foo: Foo;" in code
+    assert "@ViewChild('ref', { read: ElementRef, static: true }) private readonly ref: ElementRef;" in code
+    assert "@ContentChild(Bar, { static: false }) bar: Bar;" in code
+    assert "@ViewChild(Baz) baz: Baz;" in code
+    assert count == 1
@@ -0,0 +1,43 @@
+import pytest
+
+from component_diff import DiffApplyError, apply_unified_diff
+
+ORIGINAL = "a\nb\nc\n"
+
+
+@pytest.mark.parametrize("diff, expected", [
+    ("@@ -0,0 +1,1 @@\n+z\n", "z\na\nb\nc\n"),
+    ("@@ -1,0 +2,1 @@\n+z\n", "a\nz\nb\nc\n"),
+    ("@@ -3,0 +4,1 @@\n+d\n", "a\nb\nc\nd\n"),
+], ids=["start", "middle", "end"])
+def test_pure_insertions_go_after_the_given_line(diff, expected):
+    assert apply_unified_diff(ORIGINAL, diff) == expected
+
+
+def test_deletion_only_hunk():
+    assert apply_unified_diff(ORIGINAL, "@@ -2,1 +1,0 @@\n-b\n") == "a\nc\n"
+
+
+def test_context_hunk_replaces_lines():
+    assert apply_unified_diff(ORIGINAL, "--- a/x\n+++ b/x\n@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n") == "a\nB\nc\n"
+
+
+def test_multiple_hunks():
+    original = "".join(f"line {i}\n" for i in range(1, 21))
+    diff = ("@@ -1,3 +1,3 @@\n-line 1\n+first\n line 2\n line 3\n"
+            "@@ -10,0 +11,1 @@\n+inserted\n"
+            "@@ -18,3 +19,2 @@\n line 18\n-line 19\n line 20\n")
+    lines = apply_unified_diff(original, diff).splitlines()
+    assert lines[0] == "first"
+    assert lines[9:12] == ["line 10", "inserted", "line 11"]
+    assert lines[-2:] == ["line 18", "line 20"]
+    assert len(lines) == 20
+
+
+def test_misplaced_line_numbers_are_located_by_content():
+    assert apply_unified_diff(ORIGINAL, "@@ -7,2 +7,2 @@\n b\n-c\n+C\n") == "a\nb\nC\n"
+
+
+def test_hunk_that_does_not_apply_raises():
+    with pytest.raises(DiffApplyError):
+        apply_unified_diff(ORIGINAL, "@@ -1,1 +1,1 @@\n-x\n+y\n")
@@ -0,0 +1,55 @@
+import pytest
+
+import testing
+from component_interface import interface_changes, page_update_needed
+
+CARD_TS = """
+@Component({selector: 'app-card', templateUrl: './card.component.html'})
+export class CardComponent {
+  @Input() title: string;
+  @Output() selected = new EventEmitter<string>();
+  private cache = {};
+  select() { this.selected.emit(this.title); }
+}
+"""
+
+RESTYLED_TS = CARD_TS.replace("select() {", "select() {\n    // restyled\n   ")
+NEW_INPUT_TS = CARD_TS.replace("@Input() title: string;", "@Input() title: string;\n  @Input() subtitle: string;")
+
+EXISTING = {"CardComponent": {"ts": CARD_TS, "html": "<div></div>", "css": "", "spec_ts": ""}}
+
+
+def test_interface_changes():
+    assert interface_changes(CARD_TS, RESTYLED_TS) == []
+    assert interface_changes(CARD_TS, NEW_INPUT_TS) == ["input added: subtitle"]
+
+
+def test_page_update_needed():
+    assert page_update_needed([{"name": "CardComponent", "ts": RESTYLED_TS}], EXISTING) == (False, [])
+    needed, reasons = page_update_needed([{"name": "NewComponent", "ts": CARD_TS}], EXISTING)
+    assert needed and reasons == ["NewComponent: no existing code to compare"]
+
+
+def _update_page(component, monkeypatch):
+    calls = []
+    monkeypatch.setattr(testing, "invoke_structured", lambda *args, **kwargs: calls.append(args) or "page")
+    monkeypatch.setattr(testing, "get_format_instructions", lambda name: "{}")
+    monkeypatch.setattr(testing, "encode_image", lambda path: "")
+    result = testing.update_angular_page(component.name, component, "page.png", "HomePage", "export class HomePage {}",
+                                         ["CardComponent"], EXISTING, "")
+    return result, calls
+
+
+def test_page_step_skipped_for_updated_component_object(monkeypatch):
+    # update_angular_component returns a pydantic UpdatedComponent, not a dict.
+    schema = pytest.importorskip("schemas").get_schema("UpdatedComponent")
+    component = schema(name="CardComponent", html="<section></section>", css="", spec_ts="", ts=RESTYLED_TS)
+    result, calls = _update_page(component, monkeypatch)
+    assert result is None and calls == []
+
+
+def test_page_step_runs_when_object_interface_changes(monkeypatch):
+    schema = pytest.importorskip("schemas").get_schema("UpdatedComponent")
+    component = schema(name="CardComponent", html="<section></section>", css="", spec_ts="", ts=NEW_INPUT_TS)
+    result, calls = _update_page(component, monkeypatch)
+    assert result == "page" and len(calls) == 1
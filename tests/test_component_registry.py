@@ -0,0 +1,105 @@
+import builtins
+import os
+
+import pytest
+
+import component_registry
+from component_registry import ComponentRegistry
+
+CARD_TS = "@Component({selector: 'app-card', templateUrl: './card.component.html'})\nexport class CardComponent {}\n"
+PAGE_TS = "@Component({selector: 'app-home'})\nexport class HomePage {}\n"
+
+
+@pytest.fixture
+def tree(tmp_path):
+    files = {
+        "src/app/card/card.component.ts": CARD_TS,
+        "src/app/card/card.component.html": "<div class='card'></div>",
+        "src/app/card/card.component.css": ".card { color: red; }",
+        "src/app/home/home.component.ts": PAGE_TS,
+        "src/app/home/home.component.html": "<app-card></app-card>",
+        "node_modules/lib/lib.component.ts": "export class LibComponent {}",
+    }
+    for rel_path, content in files.items():
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return tmp_path
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Records every path component_registry opens."""
+    opened = []
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return builtins.open(path, *args, **kwargs)
+
+    monkeypatch.setattr(component_registry, "open", counting_open, raising=False)
+    return opened
+
+
+def _bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_scan_groups_component_files(tree):
+    registry = ComponentRegistry(str(tree))
+    assert registry.component_names() == ["CardComponent", "HomePage"]
+    assert registry.component_code("CardComponent")["css"] == ".card { color: red; }"
+    assert registry.page_inputs("HomePage")["page_angular_components"] == ["CardComponent"]
+
+
+def test_refresh_rereads_only_files_whose_mtime_or_size_changed(tree, reads):
+    registry = ComponentRegistry(str(tree))
+    assert len(reads) == 5
+    reads.clear()
+    assert registry.refresh() == []
+    assert reads == []
+
+    css = tree / "src/app/card/card.component.css"
+    css.write_text(".card { color: blue; }")
+    _bump_mtime(css)
+    assert registry.refresh() == [os.path.join("src", "app", "card", "card.component.css")]
+    assert reads == [str(css)]
+    assert registry.component_code("CardComponent")["css"] == ".card { color: blue; }"
+
+    # Touched but unchanged: read once to compare hashes, not reported, and not read again.
+    reads.clear()
+    _bump_mtime(css)
+    assert registry.refresh() == []
+    assert registry.refresh() == []
+    assert reads == [str(css)]
+
+    (tree / "src/app/card/card.component.html").unlink()
+    assert registry.refresh() == [os.path.join("src", "app", "card", "card.component.html")]
+    assert registry.component_code("CardComponent")["html"] == ""
+
+
+def test_snapshot_spares_rereading_unchanged_files(tree, tmp_path, reads):
+    snapshot = str(tmp_path / "registry.json")
+    ComponentRegistry(str(tree), snapshot_path=snapshot).save_snapshot()
+    reads.clear()
+    registry = ComponentRegistry(str(tree), snapshot_path=snapshot)
+    assert reads == [snapshot]
+    assert registry.component_names() == ["CardComponent", "HomePage"]
+
+
+@pytest.mark.parametrize("written_first", ["scss", "css"])
+def test_scss_is_preferred_over_css_and_the_css_reported(tree, written_first):
+    scss = tree / "src/app/card/card.component.scss"
+    css = tree / "src/app/card/card.component.css"
+    css.unlink()
+    for suffix in (written_first, "css" if written_first == "scss" else "scss"):
+        (scss if suffix == "scss" else css).write_text(f".card {{ /* {suffix} */ }}")
+
+    registry = ComponentRegistry(str(tree))
+    assert registry.component_code("CardComponent")["css"] == ".card { /* scss */ }"
+    assert registry.shadowed_files() == {"CardComponent": [os.path.join("src", "app", "card", "card.component.css")]}
+
+    css.unlink()
+    registry.refresh()
+    assert registry.component_code("CardComponent")["css"] == ".card { /* scss */ }"
+    assert registry.shadowed_files() == {}
@@ -0,0 +1,88 @@
+import copy
+import json
+
+from design_diff import changed_components, diff_designs, load_design
+
+
+def _node(node_id, name, node_type="FRAME", x=0, y=0, children=None, **extra):
+    node = {"id": node_id, "name": name, "type": node_type,
+            "absoluteBoundingBox": {"x": x, "y": y, "width": 100, "height": 40}, **extra}
+    if children is not None:
+        node["children"] = children
+    return node
+
+
+def _page():
+    return _node("1:1", "Home Page", children=[
+        _node("2:1", "Account Summary", children=[
+            _node("3:1", "Balance", "TEXT", characters="$10", style={"fontSize": 14}),
+            _node("3:2", "Balance Chip", "RECTANGLE", fills=[{"type": "SOLID", "color": {"r": 1}}]),
+        ]),
+        _node("2:2", "Footer", y=500, children=[_node("3:3", "Copyright", "TEXT", characters="(c)")]),
+    ])
+
+
+def _find(node, node_id):
+    if node["id"] == node_id:
+        return node
+    for child in node.get("children") or []:
+        found = _find(child, node_id)
+        if found:
+            return found
+    return None
+
+
+def test_diff_compares_nodes_by_id():
+    old, new = _page(), _page()
+    _find(new, "3:1")["characters"] = "$12"
+    _find(new, "2:2")["absoluteBoundingBox"]["y"] = 500.2  # Sub-pixel jitter is not a change.
+    _find(new, "2:1")["children"].reverse()  # A reorder changes the parent...
+    new["children"].append(_node("2:9", "Banner"))  # ...added and removed children do not.
+    _find(new, "2:2")["children"].clear()
+
+    assert diff_designs(old, new) == {
+        "added": ["2:9"],
+        "removed": ["3:3"],
+        "changed": {"2:1": ["children"], "3:1": ["characters"]},
+    }
+    assert diff_designs(old, copy.deepcopy(old)) == {"added": [], "removed": [], "changed": {}}
+
+
+def test_changes_map_to_the_nearest_component_deepest_first():
+    old, new = _page(), _page()
+    _find(new, "3:2")["fills"] = [{"type": "SOLID", "color": {"r": 0}}]
+    _find(new, "3:1")["style"] = {"fontSize": 16}
+    _find(new, "1:1")["absoluteBoundingBox"]["width"] = 1440
+    _find(new, "2:2")["children"].clear()
+    names = ["AccountSummaryComponent", "BalanceChipComponent", "FooterComponent", "HomePageComponent"]
+
+    result = changed_components(old, new, component_names=names, page_component="HomePage")
+    # The chip maps to its own component (depth 2), the balance text to Account Summary
+    # (depth 1), the removed copyright (looked up in the old design) to the footer.
+    assert result["components"] == ["BalanceChipComponent", "AccountSummaryComponent", "FooterComponent"]
+    # A change to the page node itself is left for the model.
+    assert result["unmapped"] == ["1:1"]
+    assert result["ambiguous"]
+
+    by_id = changed_components(old, new, component_map={"3:1": "BalanceComponent", "1:1": "HomePageComponent"})
+    assert by_id["components"] == ["BalanceComponent", "HomePageComponent"]
+    # Without a page component, everything else rolls up to the page.
+    assert (by_id["unmapped"], by_id["ambiguous"]) == ([], False)
+
+
+def test_altnode_designs_and_raw_figma_files(tmp_path):
+    def alt(text):
+        return [{"id": "1:1", "name": "Card", "type": "FRAME", "position": {"x": 0, "y": 0},
+                 "dimensions": {"width": 10, "height": 10},
+                 "children": [{"id": "1:2", "name": "Label", "type": "TEXT", "text": text}]}]
+
+    result = changed_components(alt("Hi"), alt("Hello"), component_names=["CardComponent"])
+    assert (result["components"], result["ambiguous"]) == (["CardComponent"], False)
+
+    path = tmp_path / "design.json"
+    path.write_text(json.dumps({"document": _node("0:0", "Document", "DOCUMENT", children=[_page()]),
+                                "components": {}}))
+    design = load_design(str(path))
+    chip = _find(design, "3:2")
+    assert chip["fills"] == [{"type": "SOLID", "color": {"r": 1}}]
+    assert chip["absoluteBoundingBox"] == {"x": 0, "y": 0, "width": 100, "height": 40}
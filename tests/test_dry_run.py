@@ -0,0 +1,94 @@
+import json
+import math
+import socket
+
+import pytest
+
+import llm
+from batch_runner import load_manifest
+from dry_run import MESSAGE_TOKENS, count_tokens, estimate_pages, estimate_project
+from id_chunking import CONTINUE_MESSAGE
+from model_router import configure_router
+from tests.fakes import synthetic_angular_corpus
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    """Fail the test on any real model call or network connection."""
+    def no_model(*args, **kwargs):
+        raise AssertionError("dry run reached llm._invoke")
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("dry run opened a network connection")
+
+    monkeypatch.setattr(llm, "_invoke", no_model)
+    monkeypatch.setattr(socket.socket, "connect", no_network)
+    configure_router()
+    yield
+    assert llm._DRY_RUN is None
+    configure_router()
+
+
+def _write_tree(root, files):
+    for rel_path, source in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+
+
+def test_project_estimate_counts_calls_continuations_and_tokens(tmp_path):
+    _write_tree(tmp_path, synthetic_angular_corpus(files=2, components_per_file=1))
+
+    report = estimate_project(str(tmp_path))
+    assert (report["calls"], report["continuations"]) == (1, 0)
+    assert report["model_chunks"] == report["unique_model_chunks"] > 0
+    assert report["local_chunks"] + report["model_chunks"] == report["chunks"]
+    assert list(report["routes"]) == ["chunk_upgrade/fast"]
+    prompt, completion = report["prompt_tokens"], report["completion_tokens"]
+    model_name = report["routes"]["chunk_upgrade/fast"]["model"]
+
+    # A smaller completion limit splits the same answer over continuation rounds, each
+    # resending the conversation so far.
+    limit = 100
+    rounds = math.ceil(completion / limit)
+    per_round = limit + count_tokens(CONTINUE_MESSAGE, model_name) + 2 * MESSAGE_TOKENS
+    report = estimate_project(str(tmp_path), max_completion_tokens=limit)
+    assert (report["calls"], report["continuations"]) == (rounds, rounds - 1)
+    assert report["completion_tokens"] == completion
+    assert report["prompt_tokens"] == rounds * prompt + per_round * rounds * (rounds - 1) // 2
+
+
+def test_page_estimate_records_prompts_without_calling_a_model(tmp_path):
+    pytest.importorskip("pydantic")
+    pytest.importorskip("langchain")
+    for name in ("page.html", "page.css"):
+        (tmp_path / name).write_text("<div class='card'>Balance</div>")
+    for name in ("frame.png", "page.png"):
+        (tmp_path / name).write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(64))
+    component = {"ts": "export class HeaderComponent {\n  title = 'Home';\n}\n", "html": "<h1>{{ title }}</h1>",
+                 "css": "h1 { margin: 0; }", "spec_ts": ""}
+    job = {
+        "id": "home", "pipeline": "testing", "page_name": "HomePage",
+        "html_path": str(tmp_path / "page.html"), "css_path": str(tmp_path / "page.css"),
+        "image_path": str(tmp_path / "frame.png"), "page_image_path": str(tmp_path / "page.png"),
+        "page_angular_code": "export class HomePage {}", "page_angular_components": ["HeaderComponent"],
+        "page_angular_components_code": {"HeaderComponent": component},
+    }
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([job]))
+
+    jobs = load_manifest(str(manifest))
+    report = estimate_pages(jobs)
+    # A model call would have raised and been reported as a job error.
+    assert report["errors"] == {}
+    assert (report["calls"], report["continuations"]) == (2, 0)
+    assert list(report["routes"]) == ["component_update/large", "page_update/large"]
+    routes = report["routes"].values()
+    assert report["prompt_tokens"] == sum(route["prompt_tokens"] for route in routes) > 0
+    # The component answer is the existing component (plus an @Input), so it costs at least its code.
+    update = report["routes"]["component_update/large"]
+    assert update["completion_tokens"] >= count_tokens(component["ts"] + component["html"], update["model"])
+
+    # Without an interface change the page step is skipped.
+    report = estimate_pages(jobs, assume_interface_change=False)
+    assert (report["calls"], list(report["routes"])) == (1, ["component_update/large"])
@@ -0,0 +1,95 @@
+import pytest
+
+from figma import _has_nodes, extract_document_parallel, load_shards, project
+from tests.fakes import synthetic_figma_document
+
+
+def test_parallel_extraction_matches_serial(tmp_path):
+    document = synthetic_figma_document(depth=3, fanout=3, pages=3)
+    expected = project(document, "full")
+    assert extract_document_parallel(document, workers=2, min_nodes=0) == expected
+    index_path = extract_document_parallel(document, workers=2, shard_dir=str(tmp_path), min_nodes=0)
+    assert load_shards(index_path) == expected
+
+
+def test_small_documents_are_extracted_serially(monkeypatch, tmp_path):
+    import figma
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("process pool used for a small document")
+
+    monkeypatch.setattr(figma, "ProcessPoolExecutor", no_pool)
+    document = synthetic_figma_document(depth=2, fanout=2, pages=2)
+    assert extract_document_parallel(document, workers=4) == project(document, "full")
+    index_path = extract_document_parallel(document, workers=4, shard_dir=str(tmp_path))
+    assert load_shards(index_path) == project(document, "full")
+
+
+def test_projection_picks_sub_keys_and_filters_children():
+    box = {"x": 1, "y": 2, "width": 30, "height": 40}
+    document = {"id": "0:0", "name": "Doc", "type": "DOCUMENT", "children": [
+        {"id": "1:1", "name": "Card", "type": "FRAME", "cornerRadius": 0, "layoutMode": "",
+         "absoluteBoundingBox": dict(box, rotation=0), "strokes": [{"type": "SOLID", "color": {}}, "odd"],
+         "effects": [], "children": [
+             {"id": "1:2", "name": "Title", "type": "TEXT", "characters": "Hi", "absoluteBoundingBox": box,
+              "style": {"fontSize": 16, "fontWeight": 700, "fontFamily": "Inter"}},
+             {"id": "1:3", "name": "Hidden", "type": "TEXT", "visible": False, "characters": "x"},
+         ]},
+    ]}
+
+    card = project(document, "lexicon")["children"][0]
+    assert card == {"id": "1:1", "name": "Card", "type": "FRAME", "cornerRadius": 0,
+                    "absoluteBoundingBox": {"width": 30, "height": 40},
+                    "strokes": [{"type": "SOLID"}, "odd"], "children": [
+                        {"id": "1:2", "name": "Title", "type": "TEXT", "characters": "Hi",
+                         "absoluteBoundingBox": {"width": 30, "height": 40},
+                         "style": {"fontSize": 16, "fontWeight": 700}},
+                    ]}
+
+    title = project(document, "diff")["children"][0]["children"][0]
+    # A box with only wanted keys is shared, like the "full" projection does.
+    assert title["absoluteBoundingBox"] is box
+    assert title["style"] == {"fontFamily": "Inter", "fontWeight": 700, "fontSize": 16}
+    assert project(document, "diff")["children"][0]["children"][1]["characters"] == "x"
+
+
+def test_has_nodes():
+    document = {"children": [{"children": [{}, {}]}, {}]}
+    assert _has_nodes(document, 5)
+    assert not _has_nodes(document, 6)
+
+
+def test_export_images_batches_and_caches(tmp_path):
+    pytest.importorskip("requests")
+    from tests.fakes import FigmaStubServer
+    from figma import IMAGE_IDS_PER_REQUEST, export_images
+
+    stub = FigmaStubServer(latency=0, image_kb=1)
+    node_ids = [f"1:{index}" for index in range(120)]
+    versions = {node_id: "a" for node_id in node_ids}
+
+    def export(**kwargs):
+        before = dict(stub.counts)
+        paths = export_images("FILE", "token", node_ids, cache_dir=str(tmp_path), workers=4, api_url=stub.url,
+                              **kwargs)
+        return paths, {kind: stub.counts.get(kind, 0) - before.get(kind, 0) for kind in stub.counts}
+
+    try:
+        paths, requests = export()
+        assert len(paths) == len(node_ids)
+        # One file-version request, ids batched IMAGE_IDS_PER_REQUEST per render request.
+        assert requests == {"files": 1, "images": -(-len(node_ids) // IMAGE_IDS_PER_REQUEST),
+                            "renders": len(node_ids)}
+
+        # Warm cache: only the version is checked, nothing is rendered or downloaded.
+        paths, requests = export()
+        assert len(paths) == len(node_ids)
+        assert requests == {"files": 1, "images": 0, "renders": 0}
+
+        # Per-node content versions: after a cold run only the changed frame is re-rendered.
+        export(versions=versions)
+        paths, requests = export(versions=dict(versions, **{node_ids[0]: "b"}))
+        assert len(paths) == len(node_ids)
+        assert requests == {"files": 0, "images": 1, "renders": 1}
+    finally:
+        stub.close()
@@ -0,0 +1,29 @@
+from id_chunking import format_report, update_code, update_project
+
+COMPONENT = """import { Component } from '@angular/core';
+
+@Component({ selector: 'app-root', template: '<p>hi</p>' })
+export class AppComponent {}
+"""
+
+
+def test_update_code_returns_the_report_without_printing(tmp_path, capsys):
+    source = tmp_path / "app.component.ts"
+    source.write_text(COMPONENT)
+    output = tmp_path / "out.ts"
+    code, summary = update_code(str(source), str(output))
+    assert code == output.read_text() == COMPONENT
+    assert summary["files"] == 1 and summary["local_chunks"] == summary["chunks"]
+    assert capsys.readouterr().out == ""
+
+
+def test_update_project_returns_the_report_without_printing(tmp_path, capsys):
+    src = tmp_path / "src"
+    (src / "app").mkdir(parents=True)
+    (src / "app" / "app.component.ts").write_text(COMPONENT)
+    summary = update_project(str(src), str(tmp_path / "out"))
+    assert (tmp_path / "out" / "app" / "app.component.ts").read_text() == COMPONENT
+    assert summary["files"] == 1 and summary["incomplete_files"] == 0
+    assert capsys.readouterr().out == ""
+    assert "unfinished" not in format_report(summary)
+    assert "2 file(s) still have unfinished chunks" in format_report(dict(summary, incomplete_files=2))
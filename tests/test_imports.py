@@ -0,0 +1,9 @@
+import pytest
+
+from benchmarks import HEAVY_MODULES, PIPELINE_MODULES, measure_import_time
+
+
+@pytest.mark.parametrize("module", PIPELINE_MODULES)
+def test_pipeline_modules_import_lazily(module):
+    imported = measure_import_time(module)["imported"]
+    assert sorted({name for name in imported if name.split(".")[0] in HEAVY_MODULES}) == []
@@ -0,0 +1,129 @@
+import http.client
+import json
+
+import pytest
+
+from ingest_server import PreviewSession, make_server, parse_batch, start_in_thread
+from tests.fakes import synthetic_alt_nodes
+
+
+@pytest.fixture
+def server():
+    server = make_server(port=0)
+    start_in_thread(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    connection.request(method, path, body=data, headers={"Content-Type": "application/json", **(headers or {})})
+    response = connection.getresponse()
+    payload = response.read().decode("utf-8")
+    connection.close()
+    return response, payload
+
+
+def frames(count, seed=0):
+    nodes = []
+    for index in range(count):
+        node = synthetic_alt_nodes(depth=2, fanout=3, seed=seed + index)[0]
+        node["id"] = f"frame-{index}"
+        nodes.append(node)
+    return nodes
+
+
+def test_post_get_delete_round_trip(server):
+    nodes = frames(2)
+    nodes[0]["children"][0] = {"id": "label", "name": "Label", "type": "TEXT", "text": "Live preview text",
+                               "position": {"x": 0, "y": 0}, "dimensions": {"width": 100, "height": 20},
+                               "styles": {}}
+    response, body = request(server, "POST", "/altnodes?session=s1", nodes)
+    assert response.status == 200
+    result = json.loads(body)
+    assert result["nodes"] == 2 and result["rendered"] == 2
+
+    response, document = request(server, "GET", "/preview.html?session=s1")
+    assert response.status == 200
+    assert "Live preview text" in document
+
+    # Unchanged nodes are reused, not re-rendered.
+    response, body = request(server, "POST", "/altnodes?session=s1", {"altNodes": nodes[:1]})
+    assert json.loads(body)["reused"] == 1
+
+    response, body = request(server, "GET", "/altnodes?session=s1")
+    assert [node["id"] for node in json.loads(body)] == ["frame-0", "frame-1"]
+
+    response, body = request(server, "DELETE", "/altnodes?session=s1")
+    assert response.status == 200 and json.loads(body)["nodes"] == 0
+    response, document = request(server, "GET", "/preview.html?session=s1")
+    assert "Live preview text" not in document
+
+
+def test_replace_and_remove(server):
+    request(server, "POST", "/altnodes", frames(3))
+    response, body = request(server, "POST", "/altnodes", {"altNodes": [], "remove": ["frame-1"]})
+    assert json.loads(body) == {**json.loads(body), "nodes": 2, "removed": 1}
+    response, body = request(server, "POST", "/altnodes", {"altNodes": frames(1), "replace": True})
+    assert json.loads(body)["nodes"] == 1
+
+
+@pytest.mark.parametrize("payload", [
+    {"altNodes": [], "remove": "frame-0"},
+    {"altNodes": [{"name": "no id"}]},
+    {"altNodes": {"id": "x"}},
+    {"altNodes": [], "replace": "yes"},
+    "frame-0",
+])
+def test_invalid_batches_are_rejected(server, payload):
+    request(server, "POST", "/altnodes", frames(1))
+    response, _ = request(server, "POST", "/altnodes", payload)
+    assert response.status == 400
+    _, body = request(server, "GET", "/altnodes")
+    assert [node["id"] for node in json.loads(body)] == ["frame-0"]
+
+
+def test_parse_batch_does_not_iterate_strings():
+    with pytest.raises(ValueError):
+        parse_batch({"altNodes": [], "remove": "abc"})
+
+
+def test_render_error_leaves_session_unchanged():
+    session = PreviewSession()
+    session.apply(frames(2))
+    before = session.document()
+    broken = dict(frames(1, seed=5)[0], id="frame-1", children=7)
+    with pytest.raises(TypeError):
+        session.apply([broken], remove=["frame-0"])
+    assert [node["id"] for node in session.alt_nodes()] == ["frame-0", "frame-1"]
+    assert session.document() == before
+
+
+def test_foreign_origins_are_rejected(server):
+    response, _ = request(server, "POST", "/altnodes", frames(1), headers={"Origin": "https://evil.example"})
+    assert response.status == 403
+    _, body = request(server, "GET", "/altnodes")
+    assert json.loads(body) == []
+
+    # The Figma plugin UI posts from an opaque origin.
+    response, _ = request(server, "POST", "/altnodes", frames(1), headers={"Origin": "null"})
+    assert response.status == 200
+    assert response.getheader("Access-Control-Allow-Origin") == "null"
+
+
+@pytest.mark.parametrize("method", ["GET", "POST", "DELETE"])
+def test_invalid_session_names_are_rejected(server, method):
+    path = "/" if method == "GET" else "/altnodes"
+    response, _ = request(server, method, path + '?session=%22%3E%3C%2Fiframe%3E%3Cscript%3Ealert(1)%3C%2Fscript%3E',
+                          frames(1) if method == "POST" else None)
+    assert response.status == 400
+    assert server.sessions == {}
+
+
+def test_live_page_embeds_the_session_name(server):
+    response, body = request(server, "GET", "/?session=review-2_b")
+    assert response.status == 200
+    assert 'src="/preview.html?session=review-2_b"' in body
+    assert 'new EventSource("/events?session=review-2_b")' in body
@@ -0,0 +1,82 @@
+import json
+
+from lexicon_index import LexiconIndex, load_design, narrow_lexicon
+
+
+def _alt(node_type, width, height, children=None, text=None, font_size=None, flex=False, border=None, shadow=None):
+    node = {"id": f"{node_type}-{width}x{height}", "name": node_type.title(), "type": node_type,
+            "dimensions": {"width": width, "height": height},
+            "layout": {"display": "flex"} if flex else {"display": "block"},
+            "styles": {"border": border, "shadow": shadow}, "children": children or []}
+    if text is not None:
+        node.update(text=text, typography={"fontSize": f"{font_size}px", "fontWeight": 600})
+    return node
+
+
+def _button(width=120, label="Continue"):
+    return _alt("FRAME", width, 40, flex=True, border={"radius": "8px"},
+                children=[_alt("TEXT", width - 32, 20, text=label, font_size=14)])
+
+
+def _card():
+    return _alt("FRAME", 360, 240, border={"radius": "16px"}, shadow={"blur": 12}, children=[
+        _alt("TEXT", 300, 32, text="Account balance", font_size=24),
+        _alt("TEXT", 300, 20, text="Updated today at noon", font_size=12),
+        _alt("RECTANGLE", 320, 1),
+        _alt("FRAME", 320, 120, children=[_alt("VECTOR", 24, 24), _alt("TEXT", 200, 20, text="$1,204.00", font_size=16)]),
+    ])
+
+
+CATALOG = [
+    {"name": "lx-button", "selector": "lx-button", "node": _button()},
+    {"name": "lx-card", "selector": "lx-card", "node": _card()},
+    {"name": "lx-avatar", "selector": "lx-avatar", "node": _alt("ELLIPSE", 40, 40)},
+    {"name": "lx-tooltip", "usage": "Wrap any element"},  # No example node: listed, never matched.
+]
+
+
+def test_nearest_neighbours_rank_the_matching_component_first():
+    index = LexiconIndex(CATALOG)
+    assert index.names == ["lx-button", "lx-card", "lx-avatar"]
+
+    candidates = index.match(_button(width=160, label="Sign in"), k=2)
+    assert [name for name, _ in candidates] == ["lx-button", "lx-card"]
+    assert candidates[0][1] < candidates[1][1]
+    assert index.match(_card(), k=1)[0] == ("lx-card", 0.0)
+    assert [name for name, _ in index.match(_alt("ELLIPSE", 48, 48), k=1)] == ["lx-avatar"]
+    # Filtered Figma nodes fingerprint like AltNodes.
+    figma_button = {"type": "FRAME", "layoutMode": "HORIZONTAL", "cornerRadius": 8,
+                    "absoluteBoundingBox": {"width": 140, "height": 40},
+                    "children": [{"type": "TEXT", "characters": "Buy now", "style": {"fontSize": 14, "fontWeight": 600}}]}
+    assert index.match(figma_button, k=1)[0][0] == "lx-button"
+    assert index.match(_button(), k=3, max_distance=0.0) == [("lx-button", 0.0)]
+
+
+def test_regions_narrow_the_catalog_for_the_prompt():
+    page = _alt("FRAME", 1440, 900, children=[_card(), _button(width=200, label="Transfer")])
+    index = LexiconIndex(CATALOG)
+    matches = index.match_design([page], k=1)
+    assert [region["candidates"][0][0] for region in matches] == ["lx-card", "lx-button"]
+
+    catalog = json.loads(narrow_lexicon(CATALOG, [page], k=1))
+    assert list(catalog["candidates_by_region"].values()) == [["lx-card"], ["lx-button"]]
+    assert [entry["name"] for entry in catalog["components"]] == ["lx-tooltip", "lx-card", "lx-button"]
+    assert all("node" not in entry for entry in catalog["components"])
+    # Free-text catalogs and catalogs without example nodes are passed through.
+    assert narrow_lexicon("Use lx-button for actions.", [page]) == "Use lx-button for actions."
+    assert narrow_lexicon([CATALOG[3]], [page]) == [CATALOG[3]]
+
+
+def test_load_design_takes_the_frames_of_a_raw_figma_file(tmp_path):
+    frame = {"id": "1:1", "name": "Home", "type": "FRAME", "absoluteBoundingBox": {"x": 0, "y": 0, "width": 10, "height": 10},
+             "fills": [{"type": "SOLID"}], "children": []}
+    document = {"id": "0:0", "type": "DOCUMENT", "children": [
+        {"id": "0:1", "type": "CANVAS", "children": [frame, dict(frame, id="1:2", visible=False)]},
+    ]}
+    path = tmp_path / "design.json"
+    path.write_text(json.dumps({"document": document}))
+    assert load_design(str(path)) == [{"id": "1:1", "name": "Home", "type": "FRAME",
+                                       "absoluteBoundingBox": {"width": 10, "height": 10}, "children": []}]
+
+    path.write_text(json.dumps(_button()))
+    assert load_design(str(path)) == [_button()]
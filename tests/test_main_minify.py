@@ -0,0 +1,25 @@
+from main import build_html_document
+
+
+def _node(node_id, node_type="FRAME", x=0, y=0, children=(), **extra):
+    return {"id": node_id, "type": node_type, "position": {"x": x, "y": y},
+            "dimensions": {"width": 10, "height": 10}, "children": list(children), **extra}
+
+
+def test_minify_leaves_text_and_svg_style_attributes_alone():
+    text = _node("1:2", "TEXT", text='style="a: b"')
+    svg = '<svg width="10" height="10">\n  <path style="fill: red" d="M0 0"/>\n</svg>'
+    vector = _node("1:3", "VECTOR", svgData=svg)
+    html = build_html_document([_node("1:1", children=[text, vector])], minify=True)
+    assert '>style="a: b"</span>' in html
+    assert '<path style="fill: red" d="M0 0"/>' in html
+
+
+def test_minify_compacts_template_style_attributes():
+    items = [_node(f"2:{i}", x=0, y=12.3456 * i, children=[_node(f"3:{i}", "TEXT", text="item")])
+             for i in range(2)]
+    html = build_html_document([_node("2:0", children=items)], minify=True)
+    assert 'style="left:0;top:12.35px"' in html
+    assert 'style="left: ' not in html
+    plain = build_html_document([_node("2:0", children=items)])
+    assert 'style="left: 0px; top: 12.3456px"' in plain
@@ -0,0 +1,103 @@
+import pytest
+
+from llm import invoke_model, invoke_structured
+from model_router import ModelRouter, configure_router, format_stats
+from rate_limiter import configure_scheduler, estimate_tokens
+from tests.fakes import FakeTierEndpoint, synthetic_source
+
+
+@pytest.fixture
+def tiers():
+    fast = FakeTierEndpoint("fake-fast", 0.0, 0.0)
+    large = FakeTierEndpoint("fake-large", 0.0, 0.0)
+    configure_scheduler(tpm=0, rpm=0)
+    yield fast, large
+    configure_router()
+    configure_scheduler()
+
+
+def test_tier_for_task_and_prompt_size():
+    router = ModelRouter(fast_max_tokens=100)
+    assert router.tier_for("component_list", 100000) == "fast"
+    assert router.tier_for("component_update", 10) == "large"
+    assert router.tier_for("chunk_upgrade", 100) == "fast"
+    assert router.tier_for("chunk_upgrade", 101) == "large"
+    # No task, or one without a tier, keeps the large model.
+    assert router.tier_for(None, 10) == "large"
+    assert router.tier_for("unknown_task", 10) == "large"
+    assert ModelRouter(task_tiers={"page_update": "fast"}).tier_for("page_update", 10) == "fast"
+
+
+def test_calls_reach_the_tier_the_router_picks(tiers):
+    fast, large = tiers
+    configure_router(models={"fast": fast, "large": large}, fast_max_tokens=200)
+    short, long = synthetic_source(1, seed=1)[:400], synthetic_source(4, seed=2)
+    assert estimate_tokens(short) <= 200 < estimate_tokens(long)
+
+    invoke_model(short, task="chunk_upgrade")
+    assert (fast.calls, large.calls) == (1, 0)
+    invoke_model(long, task="chunk_upgrade")
+    invoke_model(short + " ", task="component_update")
+    assert (fast.calls, large.calls) == (1, 2)
+    # An explicit model bypasses the tiers.
+    invoke_model(long + " ", model=fast, task="component_update")
+    assert (fast.calls, large.calls) == (2, 2)
+
+
+def test_fast_tier_parse_failure_escalates_to_large(tiers):
+    pytest.importorskip("pydantic")
+    from structured_output import StructuredOutputError
+
+    fast, large = tiers
+    fast.parse_failure_rate = 1.0
+    router = configure_router(models={"fast": fast, "large": large})
+
+    result = invoke_structured("Which components changed?", "ComponentUpdateList", task="component_list")
+    assert result.components == ["HeaderComponent"]
+    assert (fast.calls, large.calls) == (1, 1)
+    stats = router.stats()
+    assert stats["component_list/fast"]["parse_failures"] == 1
+    assert stats["component_list/fast"]["escalations"] == 1
+    assert stats["component_list/large"]["parse_failures"] == 0
+
+    router = configure_router(models={"fast": fast, "large": large}, escalate=False)
+    with pytest.raises(StructuredOutputError):
+        invoke_structured("Which components changed now?", "ComponentUpdateList", task="component_list")
+    assert (fast.calls, large.calls) == (2, 1)
+    assert router.stats()["component_list/fast"]["escalations"] == 0
+
+
+def test_route_stats_record_latency_errors_and_parse_failures(tiers):
+    pytest.importorskip("pydantic")
+
+    class Broken:
+        model_name = "broken"
+
+        def invoke(self, prompt):
+            raise RuntimeError("endpoint down")
+
+    fast, large = tiers
+    fast.latency, fast.parse_failure_rate = 0.01, 1.0
+    router = configure_router(models={"fast": fast, "large": large})
+    prompts = [f"Which components changed in round {i}?" for i in range(4)]
+    for prompt in prompts:
+        invoke_structured(prompt, "ComponentUpdateList", task="component_list")
+    with pytest.raises(RuntimeError):
+        invoke_model("Update the header", model=Broken(), task="component_update")
+
+    stats = router.stats()
+    assert set(stats) == {"component_list/fast", "component_list/large", "component_update/explicit"}
+    fast_route = stats["component_list/fast"]
+    assert fast_route["calls"] == 4
+    assert fast_route["errors"] == 0
+    assert fast_route["parse_failure_rate"] == 1.0
+    assert fast_route["escalations"] == 4
+    assert fast_route["mean_prompt_tokens"] == sum(map(estimate_tokens, prompts)) / 4
+    # The fake answers after 10 ms.
+    assert fast_route["mean_ms"] >= 10 and fast_route["p95_ms"] >= 10
+    assert stats["component_list/large"]["parse_failure_rate"] == 0.0
+    assert (stats["component_update/explicit"]["calls"], stats["component_update/explicit"]["errors"]) == (1, 1)
+    assert "component_list/fast" in format_stats(stats)
+
+    router.reset_stats()
+    assert router.stats() == {}
@@ -0,0 +1,120 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from llm import invoke_model
+from rate_limiter import ModelScheduler, configure_scheduler, estimate_tokens, is_rate_limit_error
+from tests.fakes import ModelStubServer, synthetic_source
+
+
+@pytest.fixture
+def stub():
+    server = ModelStubServer(tpm=30000, rpm=600, latency=0.01)
+    yield server
+    server.close()
+    configure_scheduler()
+
+
+def _burst(call, prompts, workers=8):
+    def attempt(prompt):
+        try:
+            call(prompt)
+            return True
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(attempt, prompts))
+
+
+def _prompts(count=28, kilobytes=4):
+    prompts = [synthetic_source(kilobytes, seed=i) for i in range(count)]
+    # More tokens than the endpoint's per-minute budget.
+    assert sum(estimate_tokens(prompt) + 50 for prompt in prompts) > 30000
+    return prompts
+
+
+def test_stub_endpoint_rejects_requests_over_its_budget(stub):
+    prompts = _prompts()
+    assert _burst(stub.invoke, prompts) < len(prompts)
+    assert stub.rejected > 0
+
+
+def test_scheduled_calls_stay_within_the_endpoint_budget(stub):
+    prompts = _prompts()
+    # The endpoint's exact budget, without headroom: reserving the completion tokens up
+    # front must be enough to avoid every 429.
+    scheduler = configure_scheduler(tpm=30000, rpm=600, max_concurrency=8, max_retries=0, headroom=1.0)
+    assert _burst(lambda prompt: invoke_model(prompt, model=stub), prompts) == len(prompts)
+    assert stub.rejected == 0
+    assert stub.calls == scheduler.stats["requests"] == len(prompts)
+
+
+def test_identical_in_flight_prompts_are_coalesced():
+    scheduler = ModelScheduler(tpm=0, rpm=0, max_concurrency=4)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        first = pool.submit(scheduler.run, fn, 10, key="same")
+        started.wait(5)
+        others = [pool.submit(scheduler.run, fn, 10, key="same") for _ in range(2)]
+        while scheduler.stats["coalesced"] < 2:
+            time.sleep(0.01)
+        release.set()
+        assert [future.result() for future in [first] + others] == ["answer"] * 3
+    assert len(calls) == 1
+
+
+def test_short_requests_are_admitted_first():
+    scheduler = ModelScheduler(tpm=0, rpm=0, max_concurrency=1)
+    release = threading.Event()
+    order = []
+
+    def call(name):
+        def fn():
+            order.append(name)
+            if name == "blocker":
+                release.wait(5)
+            return name
+        return fn
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        blocker = pool.submit(scheduler.run, call("blocker"), 10)
+        while not order:
+            time.sleep(0.01)
+        long = pool.submit(scheduler.run, call("long"), 20000)
+        while len(scheduler._waiting) < 1:
+            time.sleep(0.01)
+        short = pool.submit(scheduler.run, call("short"), 10)
+        while len(scheduler._waiting) < 2:
+            time.sleep(0.01)
+        release.set()
+        blocker.result(), long.result(), short.result()
+    assert order == ["blocker", "short", "long"]
+
+
+@pytest.mark.parametrize("completion_tokens", [1024, 300])
+def test_prompt_tokens_fall_back_to_the_estimate(completion_tokens):
+    import tracing
+
+    tracing.enable()
+    tracing.reset()
+    try:
+        ModelScheduler(tpm=0, rpm=0).run(lambda: "no usage reported", 100, completion_tokens=completion_tokens)
+        [call] = [record for record in tracing.records() if record["name"] == "model.call"]
+    finally:
+        tracing.disable()
+        tracing.reset()
+    assert call["prompt_tokens"] == 100
@@ -0,0 +1,80 @@
+from scaffold import MAX_SCAFFOLD_DEPTH, MAX_SCAFFOLD_NODES, component_names, scaffold_design, write_component
+
+
+def _node(node_id, name, node_type, children=None, layout=None, **extra):
+    return {"id": node_id, "name": name, "type": node_type, "position": {"x": 10, "y": 20},
+            "dimensions": {"width": 100, "height": 30}, "layout": layout or {"display": "block"},
+            "styles": {"opacity": 1}, "children": children or [], **extra}
+
+
+def _login_card(layout=None):
+    return _node("1:1", "Login Card", "FRAME", layout=layout or {"display": "flex", "gap": "8px"}, children=[
+        _node("1:2", "Title", "TEXT", text="Sign in {now}"),
+        _node("1:3", "Email Input", "FRAME", children=[_node("1:4", "Placeholder", "TEXT", text="you@example.com")]),
+        _node("1:5", "Submit Button", "INSTANCE", children=[_node("1:6", "Label", "TEXT", text="Continue")]),
+    ])
+
+
+def test_component_names():
+    assert component_names("Account Summary") == {"class": "AccountSummaryComponent",
+                                                  "selector": "app-account-summary",
+                                                  "file": "account-summary.component"}
+    assert component_names("AccountSummaryComponent")["selector"] == "app-account-summary"
+    assert component_names("")["class"] == "GeneratedComponent"
+
+
+def test_simple_frame_becomes_a_component():
+    result = scaffold_design([_login_card()])
+    assert result["needs_model"] == []
+    [component] = result["components"]
+    assert component["name"] == "LoginCardComponent"
+    assert component["html"] == (
+        '<div class="login-card">\n'
+        '  <span class="login-card__title">Sign in &#123;now&#125;</span>\n'
+        '  <input type="text" class="login-card__email" placeholder="you@example.com" aria-label="you@example.com"'
+        ' (input)="emailChange.emit($any($event.target).value)" />\n'
+        '  <button type="button" class="login-card__submit" (click)="submitClick.emit()">Continue</button>\n'
+        '</div>\n'
+    )
+    assert "selector: 'app-login-card'" in component["ts"]
+    assert "@Output() emailChange = new EventEmitter<string>();" in component["ts"]
+    assert "@Output() submitClick = new EventEmitter<void>();" in component["ts"]
+    assert component["css"].startswith(":host {\n  display: block;\n}\n")
+    assert ".login-card {\n" in component["css"] and "  position: relative;\n" in component["css"]
+    assert "cursor: pointer;" in component["css"]
+    assert 'toContain("Sign in {now}")' in component["spec_ts"]
+    assert "expect(component.submitClick.emit).toHaveBeenCalled();" in component["spec_ts"]
+
+
+def _title_rule(card):
+    css = scaffold_design([card])["components"][0]["css"]
+    return css.split(".login-card__title {")[1].split("}")[0]
+
+
+def test_positions_are_kept_outside_auto_layout():
+    assert "left:" not in _title_rule(_login_card())
+    assert "left: 10px;" in _title_rule(_login_card(layout={"display": "block"}))
+
+
+def test_complex_frames_are_left_for_the_model(tmp_path):
+    unsupported = _node("2:1", "Chart", "FRAME", children=[_node("2:2", "Slice", "BOOLEAN_OPERATION")])
+    large = _node("3:1", "Grid", "FRAME", children=[_node(f"3:{i}", "Cell", "RECTANGLE")
+                                                    for i in range(2, MAX_SCAFFOLD_NODES + 2)])
+    deep = leaf = _node("4:0", "Deep", "FRAME")
+    for level in range(1, MAX_SCAFFOLD_DEPTH + 2):
+        child = _node(f"4:{level}", "Level", "GROUP")
+        leaf["children"].append(child)
+        leaf = child
+
+    result = scaffold_design([unsupported, _login_card(), large, deep], component_map={"1:1": "SignInComponent"})
+    assert [component["name"] for component in result["components"]] == ["SignInComponent"]
+    assert result["needs_model"] == [
+        {"id": "2:1", "name": "Chart", "reasons": ["unsupported node type BOOLEAN_OPERATION (2:2)"]},
+        {"id": "3:1", "name": "Grid", "reasons": [f"{MAX_SCAFFOLD_NODES + 1} nodes (more than {MAX_SCAFFOLD_NODES})"]},
+        {"id": "4:0", "name": "Deep", "reasons": [f"nested deeper than {MAX_SCAFFOLD_DEPTH} levels"]},
+    ]
+
+    directory = write_component(result["components"][0], str(tmp_path))
+    assert sorted(path.name for path in (tmp_path / "sign-in").iterdir()) == [
+        "sign-in.component.css", "sign-in.component.html", "sign-in.component.spec.ts", "sign-in.component.ts"]
+    assert directory == str(tmp_path / "sign-in")
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from structured_output import StructuredOutputError, TruncatedOutputError, loads_lenient, parse_structured_output
+
+
+def test_repairs_fences_trailing_commas_and_escapes():
+    response = 'Here it is:\n```json\n{"name": "A", "ts": "/^\\d+$/.test(v)", "css": "",}\n```\nDone.'
+    assert loads_lenient(response) == {"name": "A", "ts": "/^\\d+$/.test(v)", "css": ""}
+
+
+def test_truncated_string_is_not_accepted():
+    response = '{"name": "A", "html": "<p></p>", "css": "", "ts": "x", "spec_ts": "trunc'
+    with pytest.raises(TruncatedOutputError):
+        loads_lenient(response)
+
+
+def test_unclosed_object_is_not_accepted():
+    with pytest.raises(TruncatedOutputError):
+        loads_lenient('{"name": "A", "files": ["a", "b"]')
+
+
+def test_truncation_is_a_structured_output_error():
+    # invoke_structured retries/escalates on StructuredOutputError.
+    with pytest.raises(StructuredOutputError):
+        parse_structured_output('{"name": "A", "ts": "export class', "UpdatedComponent", validate=False)
+
+
+def test_parses_schema():
+    pytest.importorskip("pydantic")
+    payload = {"name": "A", "html": "<p></p>", "css": "", "spec_ts": "", "ts": "export class A {}"}
+    result = parse_structured_output(json.dumps(payload), "UpdatedComponent")
+    assert result.ts == "export class A {}"
@@ -0,0 +1,105 @@
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import id_chunking
+from upgrade_journal import UpgradeJournal, worker_id
+
+LEGACY_SERVICE = """import { Injectable } from '@angular/core';
+import { Http, RequestOptions } from '@angular/http';
+
+@Injectable()
+export class ItemService {
+  constructor(private http: Http) {}
+  load() { return this.http.get('/items').map(res => res.json()); }
+}
+"""
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = UpgradeJournal(str(tmp_path / "journal.db"))
+    journal.add_chunks({f"key-{i}": f"code {i}" for i in range(20)})
+    return journal
+
+
+def _dead_worker():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}:dead"
+
+
+def test_concurrent_claims_never_overlap(journal):
+    claimed = []
+    lock = threading.Lock()
+
+    def drain():
+        while True:
+            batch = journal.claim(3)
+            if not batch:
+                return
+            with lock:
+                claimed.extend(chunk["key"] for chunk in batch)
+
+    threads = [threading.Thread(target=drain) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(f"key-{i}" for i in range(20))
+
+
+def test_claims_of_a_crashed_process_are_released(journal):
+    assert len(journal.claim(5, _dead_worker())) == 5
+    live = journal.claim(5, worker_id())
+    assert len(journal.claim(100)) == 10
+    assert journal.release_abandoned() == 5
+    # Only the dead process's claims come back; the live worker keeps its chunks.
+    reclaimed = journal.claim(100)
+    assert len(reclaimed) == 5
+    assert not {chunk["key"] for chunk in reclaimed} & {chunk["key"] for chunk in live}
+
+
+def test_expired_leases_can_be_claimed_again(tmp_path):
+    journal = UpgradeJournal(str(tmp_path / "journal.db"), lease_seconds=0)
+    journal.add_chunks({"a": "code"})
+    assert journal.claim(1, worker_id())
+    assert [chunk["key"] for chunk in journal.claim(1)] == ["a"]
+
+    journal = UpgradeJournal(str(tmp_path / "journal.db"), lease_seconds=600)
+    assert journal.claim(1) == []
+
+
+def test_failed_chunks_are_retried(tmp_path):
+    journal = UpgradeJournal(str(tmp_path / "journal.db"), max_attempts=2)
+    journal.add_chunks({"a": "code"})
+    for _ in range(2):
+        journal.fail([chunk["key"] for chunk in journal.claim(1)], "RateLimitError")
+    assert journal.counts()["chunks"] == {"failed": 1}
+    assert journal.claim(1) == []
+    assert journal.retry_failed() == 1
+    assert [chunk["key"] for chunk in journal.claim(1)] == ["a"]
+
+
+def test_update_project_finishes_after_an_outage(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "item.service.ts").write_text(LEGACY_SERVICE)
+    journal_path = str(tmp_path / "journal.db")
+
+    def outage(chunks):
+        raise ConnectionError("provider unavailable")
+
+    monkeypatch.setattr(id_chunking, "call_llm", outage)
+    summary = id_chunking.update_project(str(src), str(tmp_path / "out"), lines_per_chunk=4, journal_path=journal_path)
+    assert summary["incomplete_files"] == 1
+    assert UpgradeJournal(journal_path).counts()["chunks"].get("failed")
+
+    monkeypatch.setattr(id_chunking, "call_llm",
+                        lambda chunks: "\n".join(f"Chunk {chunk['id']}:\n// upgraded" for chunk in chunks))
+    summary = id_chunking.update_project(str(src), str(tmp_path / "out"), lines_per_chunk=4, journal_path=journal_path)
+    assert summary["incomplete_files"] == 0
+    assert "// upgraded" in (tmp_path / "out" / "item.service.ts").read_text()
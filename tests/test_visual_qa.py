@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+import visual_qa
+from visual_qa import ScreenshotDiff
+
+
+def page_with_button(color):
+    pixels = np.full((400, 600, 3), 255, np.uint8)
+    pixels[40:60, 40:400] = (33, 33, 33)  # a heading
+    pixels[150:250, 150:450] = color  # a 300x100 button
+    return pixels
+
+
+def hex_color(value):
+    return tuple(int(value[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def test_identical_screenshots_are_accurate():
+    design = page_with_button(hex_color("#1976d2"))
+    assert ScreenshotDiff(design, design.copy()).accurate
+
+
+def test_rounding_noise_is_accurate():
+    design = page_with_button(hex_color("#1976d2"))
+    noise = np.random.default_rng(0).integers(-3, 4, design.shape)
+    implementation = np.clip(design.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    assert ScreenshotDiff(design, implementation).accurate
+
+
+def test_button_recolor_is_a_difference():
+    design = page_with_button(hex_color("#1976d2"))
+    implementation = page_with_button(hex_color("#2196f3"))
+    report = ScreenshotDiff(design, implementation).report()
+    assert not report["accurate"]
+    assert report["changed_fraction"] > 0.1
+    x0, y0, x1, y1 = report["regions"][0]["box"]
+    assert x0 <= 150 and y0 <= 150 and x1 >= 450 and y1 >= 250
+
+
+def test_color_change_is_sent_to_the_model(tmp_path, monkeypatch):
+    from PIL import Image
+
+    design_path, implementation_path = tmp_path / "design.png", tmp_path / "impl.png"
+    Image.fromarray(page_with_button(hex_color("#1976d2"))).save(design_path)
+    Image.fromarray(page_with_button(hex_color("#2196f3"))).save(implementation_path)
+
+    prompts = []
+
+    def fake_invoke(prompt, schema_name, model=None, task=None):
+        prompts.append(prompt)
+        return {"assessment": "DIFFERENCES_FOUND", "differences": []}
+
+    monkeypatch.setattr(visual_qa, "invoke_structured", fake_invoke)
+    monkeypatch.setattr(visual_qa, "get_format_instructions", lambda name: "{}")
+    monkeypatch.setattr(visual_qa, "schema_to_dict", dict)
+    result = visual_qa.visual_qa(str(design_path), str(implementation_path))
+    assert result["model_called"]
+    assert len(prompts) == 1
+    assert "verified identical" not in prompts[0]
@@ -0,0 +1,248 @@
+import atexit
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# === Pipeline tracing ===
+# Spans time each pipeline stage (Figma fetch, metadata extraction, HTML rendering,
+# image encoding, prompt assembly, model calls, parsing, chunk upgrades) and carry
+# counters such as bytes, prompt_tokens, completion_tokens, retries and queued_ms
+# (time spent waiting on the rate limiter).
+#
+# Tracing is off unless PIPELINE_TRACE is set (to a .jsonl path, or to 1 to only
+# print the summary) or enable() is called. When it is off, span() returns a shared
+# no-op object and @traced functions cost one extra call and a flag check.
+
+# Counters summed per stage in the summary report.
+COUNTERS = ("bytes", "prompt_tokens", "completion_tokens", "retries", "queued_ms")
+
+_enabled = False
+_export_path: Optional[str] = None
+_records: List[Dict] = []
+_records_lock = threading.Lock()
+_local = threading.local()
+_span_ids = itertools.count(1)
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, counter: str, amount=1):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """A timed stage. Use as a context manager; nested spans record their parent."""
+    __slots__ = ("name", "attrs", "counters", "span_id", "parent_id", "started_at", "_start")
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.counters: Dict[str, float] = {}
+        self.span_id = next(_span_ids)
+        self.parent_id = None
+
+    def set(self, **attrs):
+        """Attach attributes (file name, model, status, ...) to the span."""
+        self.attrs.update(attrs)
+
+    def add(self, counter: str, amount=1):
+        """Increase a counter such as "bytes", "prompt_tokens" or "retries"."""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent_id = stack[-1].span_id if stack else None
+        stack.append(self)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        _stack().pop()
+        record = {
+            "name": self.name,
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "thread": threading.get_ident(),
+            "start": self.started_at,
+            "duration_ms": duration * 1000,
+            **self.counters,
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        with _records_lock:
+            _records.append(record)
+        return False
+
+
+def _stack() -> List[Span]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+# === API ===
+def span(name: str, **attrs):
+    """Context manager timing one stage: `with span("figma.fetch") as s: ...; s.add("bytes", n)`."""
+    return Span(name, attrs) if _enabled else NOOP_SPAN
+
+
+def current_span():
+    """The innermost open span on this thread (a no-op span if none or tracing is off)."""
+    if not _enabled:
+        return NOOP_SPAN
+    stack = _stack()
+    return stack[-1] if stack else NOOP_SPAN
+
+
+def traced(name: Optional[str] = None, result_bytes: bool = False) -> Callable:
+    """
+    Decorator wrapping every call of a function in a span (named after the function
+    by default). With result_bytes=True the length of the returned str/bytes is
+    recorded as "bytes".
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, {}) as s:
+                result = func(*args, **kwargs)
+                if result_bytes and isinstance(result, (str, bytes)):
+                    s.add("bytes", len(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def enable(export_path: Optional[str] = None):
+    """Start recording spans. With `export_path`, spans are written there as JSONL at exit."""
+    global _enabled, _export_path
+    _enabled = True
+    _export_path = export_path
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def records() -> List[Dict]:
+    with _records_lock:
+        return list(_records)
+
+
+def reset():
+    with _records_lock:
+        _records.clear()
+
+
+# === Export ===
+def export_jsonl(path: str, spans: Optional[List[Dict]] = None):
+    """Write one JSON object per span to `path`."""
+    spans = records() if spans is None else spans
+    with open(path, "w", encoding="utf-8") as f:
+        for record in spans:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def load_jsonl(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary(spans: Optional[List[Dict]] = None) -> Dict[str, Dict]:
+    """
+    Aggregate spans per stage name: count, total/self/mean/p95/max milliseconds and the
+    summed COUNTERS. Self time excludes child spans, so for a pipeline step it is the
+    time spent assembling prompts rather than waiting on the model or parsing.
+    """
+    spans = records() if spans is None else spans
+    child_ms: Dict[int, float] = {}
+    for record in spans:
+        if record.get("parent") is not None:
+            child_ms[record["parent"]] = child_ms.get(record["parent"], 0.0) + record["duration_ms"]
+
+    stages: Dict[str, Dict] = {}
+    durations: Dict[str, List[float]] = {}
+    for record in spans:
+        stage = stages.setdefault(record["name"], {"count": 0, "errors": 0, "total_ms": 0.0, "self_ms": 0.0})
+        stage["count"] += 1
+        stage["errors"] += "error" in record
+        stage["total_ms"] += record["duration_ms"]
+        stage["self_ms"] += max(0.0, record["duration_ms"] - child_ms.get(record["id"], 0.0))
+        for counter in COUNTERS:
+            if counter in record:
+                stage[counter] = stage.get(counter, 0) + record[counter]
+        durations.setdefault(record["name"], []).append(record["duration_ms"])
+
+    for name, stage in stages.items():
+        stage["mean_ms"] = stage["total_ms"] / stage["count"]
+        stage["p95_ms"] = _percentile(durations[name], 0.95)
+        stage["max_ms"] = max(durations[name])
+    return stages
+
+
+def format_summary(stages: Dict[str, Dict]) -> str:
+    """Render summary() as a table, slowest stages (by self time) first."""
+    lines = [f"{'stage':<40} {'count':>6} {'total ms':>10} {'self ms':>10} {'p95 ms':>9}  counters"]
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]["self_ms"]):
+        counters = " ".join(f"{c}={stage[c]:g}" for c in COUNTERS if c in stage)
+        if stage["errors"]:
+            counters += f" errors={stage['errors']}"
+        lines.append(f"{name:<40} {stage['count']:>6} {stage['total_ms']:>10.1f} "
+                     f"{stage['self_ms']:>10.1f} {stage['p95_ms']:>9.1f}  {counters}")
+    return "\n".join(lines)
+
+
+def _export_at_exit():
+    if not _records:
+        return
+    if _export_path:
+        export_jsonl(_export_path)
+    print(format_summary(summary()), file=sys.stderr)
+
+
+_env = os.environ.get("PIPELINE_TRACE", "")
+if _env and _env.lower() not in ("0", "false", "no"):
+    enable(None if _env.lower() in ("1", "true", "yes") else _env)
+atexit.register(_export_at_exit)
+
+# === Main Execution ===
+if __name__ == '__main__':
+    # python tracing.py trace.jsonl -> summary report of a recorded trace
+    print(format_summary(summary(load_jsonl(sys.argv[1]))))
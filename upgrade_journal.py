@@ -0,0 +1,206 @@
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+# === Durable job journal for upgrade runs ===
+# Records per-file and per-chunk status in SQLite so an interrupted run resumes
+# where it stopped, and several workers (threads or processes) can claim pending
+# chunks without stepping on each other. Chunks are keyed by their normalized-content
+# hash (see id_chunking.normalize_chunk), so deduplication carries over between runs.
+
+# A claimed chunk whose worker has not reported back after this many seconds is
+# considered abandoned (e.g. the process died on another machine) and can be claimed
+# again. Claims of dead processes on this machine are released at the start of a run
+# (see UpgradeJournal.release_abandoned).
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    source_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    key TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    result TEXT,
+    worker TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS chunks_status ON chunks (status);
+"""
+
+
+def worker_id() -> str:
+    """A new worker name, "<host>:<pid>:<random>", so claims can be traced back to their process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists, but belongs to another user (or the platform cannot tell).
+    return True
+
+
+class UpgradeJournal:
+    """
+    SQLite journal of an upgrade run.
+
+    File status is "pending" or "done". Chunk status is "pending", "claimed", "done"
+    or "failed"; a done chunk stores the model's upgraded code in `result`, or NULL
+    when the model left it unchanged.
+    """
+
+    def __init__(self, path: str, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """One short-lived connection per operation, so any thread or process can use the journal."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    # --- Files ---
+    def file_done(self, path: str, source_hash: str) -> bool:
+        """True if `path` was already written for exactly this source content."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT source_hash, status FROM files WHERE path = ?", (path,)).fetchone()
+        return bool(row) and row[0] == source_hash and row[1] == "done"
+
+    def mark_file(self, path: str, source_hash: str, status: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO files (path, source_hash, status, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET source_hash = excluded.source_hash, "
+                "status = excluded.status, updated_at = excluded.updated_at",
+                (path, source_hash, status, time.time()),
+            )
+
+    # --- Chunks ---
+    def add_chunks(self, chunks: Dict[str, str]):
+        """Register distinct chunks ({key: normalized code}); already known keys keep their state."""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR IGNORE INTO chunks (key, code) VALUES (?, ?)", chunks.items())
+            conn.execute("COMMIT")
+
+    def claim(self, limit: int, worker: Optional[str] = None) -> List[Dict]:
+        """
+        Atomically claim up to `limit` pending (or abandoned) chunks for `worker`.
+        Returns [{"key", "code"}].
+        """
+        worker = worker or worker_id()
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same rows.
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT key, code FROM chunks WHERE status = 'pending' "
+                "OR (status = 'claimed' AND claimed_at < ?) LIMIT ?",
+                (now - self.lease_seconds, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE chunks SET status = 'claimed', worker = ?, claimed_at = ? WHERE key = ?",
+                [(worker, now, key) for key, _ in rows],
+            )
+            conn.execute("COMMIT")
+        return [{"key": key, "code": code} for key, code in rows]
+
+    def complete(self, results: Dict[str, Optional[str]]):
+        """Mark chunks done with their upgraded code (None = unchanged by the model)."""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE chunks SET status = 'done', result = ?, error = NULL WHERE key = ?",
+                [(result, key) for key, result in results.items()],
+            )
+            conn.execute("COMMIT")
+
+    def fail(self, keys: Iterable[str], error: str):
+        """Return chunks to the queue after an error, or mark them failed after max_attempts."""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE chunks SET attempts = attempts + 1, error = ?, worker = NULL, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE key = ?",
+                [(error, self.max_attempts, key) for key in keys],
+            )
+            conn.execute("COMMIT")
+
+    def retry_failed(self) -> int:
+        """Put failed chunks back in the queue (e.g. after fixing an API key or quota). Returns how many."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE chunks SET status = 'pending', attempts = 0, worker = NULL WHERE status = 'failed'"
+            ).rowcount
+
+    def release_abandoned(self) -> int:
+        """
+        Return the chunks claimed by processes on this machine that no longer run
+        (a crashed earlier run) to the queue, without waiting for their lease to expire.
+        Returns how many.
+        """
+        host = socket.gethostname()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            dead = []
+            for (worker,) in conn.execute("SELECT DISTINCT worker FROM chunks WHERE status = 'claimed'").fetchall():
+                worker_host, _, rest = (worker or "").partition(":")
+                pid = rest.partition(":")[0]
+                if worker_host == host and pid.isdigit() and not _process_alive(int(pid)):
+                    dead.append(worker)
+            released = 0
+            for worker in dead:
+                released += conn.execute(
+                    "UPDATE chunks SET status = 'pending', worker = NULL WHERE status = 'claimed' AND worker = ?",
+                    (worker,),
+                ).rowcount
+            conn.execute("COMMIT")
+        return released
+
+    def results(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        """{key: {"status", "result"}} for the given keys."""
+        keys = list(keys)
+        found = {}
+        with self._connect() as conn:
+            for offset in range(0, len(keys), 500):
+                batch = keys[offset:offset + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, status, result in conn.execute(
+                    f"SELECT key, status, result FROM chunks WHERE key IN ({placeholders})", batch
+                ):
+                    found[key] = {"status": status, "result": result}
+        return found
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Status counts for files and chunks."""
+        with self._connect() as conn:
+            return {
+                table: dict(conn.execute(f"SELECT status, COUNT(*) FROM {table} GROUP BY status").fetchall())
+                for table in ("files", "chunks")
+            }
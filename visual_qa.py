@@ -0,0 +1,319 @@
+import base64
+import io
+import json
+import os
+import sys
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from llm import invoke_structured, read_file
+from schemas import get_format_instructions, schema_to_dict
+from tracing import span, traced
+
+# === Visual QA prefilter ===
+# The QA prompt (Changes.txt) compares a Figma screenshot with the rendered Angular page.
+# Most pages in a run are (nearly) unchanged, so the screenshots are compared locally
+# first: the implementation is scaled and shifted onto the design, a per-pixel
+# difference mask is summarised per grid cell, and changed cells are merged into
+# regions. Without changed regions the page is ACCURATE and no model call is made;
+# otherwise only the changed regions (with some context) are sent to the model.
+
+# QA instructions sent with every model call.
+QA_PROMPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Changes.txt")
+
+# A pixel differs when its color distance to the design (see color_distance) is
+# above this: color rounding between Figma and the browser stays below it, a shade
+# change such as #1976d2 -> #2196f3 (distance ~86) does not.
+COLOR_TOLERANCE = 20
+
+# The difference mask is summarised per CELL_SIZE x CELL_SIZE cell; a cell is changed
+# when at least this fraction of its pixels differ.
+CELL_SIZE = 16
+CELL_CHANGED_FRACTION = 0.05
+
+# Regions with fewer differing pixels than this are ignored (a caret, a stray pixel row).
+MIN_REGION_PIXELS = 48
+
+# The implementation may be offset from the design by up to this many pixels.
+MAX_SHIFT = 24
+
+# Context kept around each changed region in the crops sent to the model.
+REGION_PADDING = 24
+
+# With more regions than this, or crops covering more than this fraction of the page,
+# the full screenshots are sent instead.
+MAX_REGIONS = 6
+MAX_CROP_FRACTION = 0.5
+
+
+# === Images ===
+def load_image(path: str):
+    """Read an image file as an RGB uint8 array of shape (height, width, 3)."""
+    import numpy as np  # Imported on use, like Pillow: only the prefilter needs them.
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def encode_png(pixels) -> str:
+    """Base64 PNG of an RGB array (the format encode_image produces for files)."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG", optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def _best_shift(reference, moving, max_shift: int) -> int:
+    """Offset (in pixels) of the 1-D profile `moving` that best matches `reference`."""
+    import numpy as np
+
+    best, best_error = 0, np.inf
+    for shift in range(-max_shift, max_shift + 1):
+        if shift >= 0:
+            a, b = reference[shift:], moving[:len(moving) - shift]
+        else:
+            a, b = reference[:shift], moving[-shift:]
+        overlap = min(len(a), len(b))
+        if overlap < len(reference) // 2:
+            continue
+        error = np.abs(a[:overlap] - b[:overlap]).mean()
+        if error < best_error:
+            best, best_error = shift, error
+    return best
+
+
+def align_images(design, implementation, max_shift: int = MAX_SHIFT):
+    """
+    Map `implementation` onto the design's pixel grid: scale it to the design width
+    (screenshots are often taken at a different device pixel ratio) and shift it by
+    the offset that best lines up the row and column intensity profiles.
+    Uncovered pixels are white. Returns (aligned, scale, (dx, dy)).
+    """
+    import numpy as np
+
+    height, width = design.shape[:2]
+    scale = width / implementation.shape[1]
+    if scale != 1:
+        # Nearest-neighbour resampling by index arrays.
+        new_height = max(1, round(implementation.shape[0] * scale))
+        rows = np.minimum((np.arange(new_height) / scale).astype(np.int64), implementation.shape[0] - 1)
+        cols = np.minimum((np.arange(width) / scale).astype(np.int64), implementation.shape[1] - 1)
+        implementation = implementation[rows][:, cols]
+
+    design_gray = design.mean(axis=2)
+    implementation_gray = implementation.mean(axis=2)
+    common_height = min(height, implementation.shape[0])
+    dy = _best_shift(design_gray.mean(axis=1), implementation_gray.mean(axis=1), max_shift)
+    dx = _best_shift(design_gray[:common_height].mean(axis=0), implementation_gray[:common_height].mean(axis=0),
+                     max_shift)
+
+    aligned = np.full_like(design, 255)
+    # Implementation pixel (y, x) lands on design pixel (y + dy, x + dx).
+    src_y0, dst_y0 = max(0, -dy), max(0, dy)
+    src_x0, dst_x0 = max(0, -dx), max(0, dx)
+    rows = min(implementation.shape[0] - src_y0, height - dst_y0)
+    cols = min(implementation.shape[1] - src_x0, width - dst_x0)
+    if rows > 0 and cols > 0:
+        aligned[dst_y0:dst_y0 + rows, dst_x0:dst_x0 + cols] = \
+            implementation[src_y0:src_y0 + rows, src_x0:src_x0 + cols]
+    return aligned, scale, (dx, dy)
+
+
+# === Difference regions ===
+def color_distance(a, b):
+    """
+    Per-pixel perceptual distance between two RGB arrays ("redmean" weighted Euclidean
+    distance: green counts most, red and blue depending on how red the pixel is).
+    """
+    import numpy as np
+
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    red_mean = (a[..., 0] + b[..., 0]) / 2
+    delta = a - b
+    return np.sqrt((2 + red_mean / 256) * delta[..., 0] ** 2 + 4 * delta[..., 1] ** 2
+                   + (2 + (255 - red_mean) / 256) * delta[..., 2] ** 2)
+
+
+def changed_cells(design, aligned, color_tolerance: float = COLOR_TOLERANCE, cell_size: int = CELL_SIZE):
+    """
+    Number of differing pixels per cell, as a (rows, cols) array, and the fraction of
+    differing pixels over the whole image.
+    """
+    import numpy as np
+
+    mask = color_distance(design, aligned) > color_tolerance
+    height, width = mask.shape
+    padded = np.zeros((-(-height // cell_size) * cell_size, -(-width // cell_size) * cell_size), dtype=np.int32)
+    padded[:height, :width] = mask
+    counts = padded.reshape(padded.shape[0] // cell_size, cell_size, padded.shape[1] // cell_size, cell_size)
+    return counts.sum(axis=(1, 3)), float(mask.mean())
+
+
+def changed_regions(counts, image_shape, cell_size: int = CELL_SIZE,
+                    cell_fraction: float = CELL_CHANGED_FRACTION,
+                    min_pixels: int = MIN_REGION_PIXELS) -> List[Dict]:
+    """
+    Merge touching changed cells (8-neighbourhood) into regions.
+    Returns [{"box": [x0, y0, x1, y1], "changed_pixels": n}], largest first.
+    """
+    changed = counts >= cell_size * cell_size * cell_fraction
+    seen = set()
+    regions = []
+    grid_rows, grid_cols = changed.shape
+    for start in zip(*changed.nonzero()):
+        start = (int(start[0]), int(start[1]))
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = deque([start])
+        top, left, bottom, right = start[0], start[1], start[0], start[1]
+        pixels = 0
+        while queue:
+            row, col = queue.popleft()
+            pixels += int(counts[row, col])
+            top, bottom = min(top, row), max(bottom, row)
+            left, right = min(left, col), max(right, col)
+            for next_row in (row - 1, row, row + 1):
+                for next_col in (col - 1, col, col + 1):
+                    cell = (next_row, next_col)
+                    if (0 <= next_row < grid_rows and 0 <= next_col < grid_cols and cell not in seen
+                            and changed[next_row, next_col]):
+                        seen.add(cell)
+                        queue.append(cell)
+        if pixels >= min_pixels:
+            box = [left * cell_size, top * cell_size,
+                   min((right + 1) * cell_size, image_shape[1]), min((bottom + 1) * cell_size, image_shape[0])]
+            regions.append({"box": box, "changed_pixels": pixels})
+    regions.sort(key=lambda region: -region["changed_pixels"])
+    return regions
+
+
+class ScreenshotDiff:
+    """Local comparison of a design screenshot and an implementation screenshot."""
+
+    def __init__(self, design, implementation, max_shift: int = MAX_SHIFT,
+                 color_tolerance: float = COLOR_TOLERANCE, cell_size: int = CELL_SIZE):
+        self.design = design
+        self.aligned, self.scale, self.shift = align_images(design, implementation, max_shift)
+        counts, self.changed_fraction = changed_cells(design, self.aligned, color_tolerance, cell_size)
+        self.regions = changed_regions(counts, design.shape, cell_size)
+
+    @classmethod
+    def from_files(cls, design_path: str, implementation_path: str, **kwargs) -> "ScreenshotDiff":
+        return cls(load_image(design_path), load_image(implementation_path), **kwargs)
+
+    @property
+    def accurate(self) -> bool:
+        return not self.regions
+
+    def crop_boxes(self, padding: int = REGION_PADDING) -> Optional[List[List[int]]]:
+        """
+        Padded boxes of the changed regions, or None when the changes are too many or
+        too large for crops to be worth it (send the full screenshots then).
+        """
+        height, width = self.design.shape[:2]
+        boxes = [[max(0, x0 - padding), max(0, y0 - padding), min(width, x1 + padding), min(height, y1 + padding)]
+                 for x0, y0, x1, y1 in (region["box"] for region in self.regions)]
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+        if len(boxes) > MAX_REGIONS or area > MAX_CROP_FRACTION * width * height:
+            return None
+        return boxes
+
+    def crops(self, padding: int = REGION_PADDING) -> List[Dict]:
+        """
+        Base64 PNG pairs to send to the model: one per changed region, or a single
+        full-page pair (box None) when crop_boxes() declines.
+        """
+        boxes = self.crop_boxes(padding)
+        if boxes is None:
+            return [{"box": None, "design": encode_png(self.design), "implementation": encode_png(self.aligned)}]
+        return [{"box": [x0, y0, x1, y1],
+                 "design": encode_png(self.design[y0:y1, x0:x1]),
+                 "implementation": encode_png(self.aligned[y0:y1, x0:x1])}
+                for x0, y0, x1, y1 in boxes]
+
+    def report(self) -> Dict:
+        return {
+            "accurate": self.accurate,
+            "changed_fraction": self.changed_fraction,
+            "scale": self.scale,
+            "shift": list(self.shift),
+            "regions": self.regions,
+        }
+
+
+# === Visual QA ===
+@traced("visual_qa.page")
+def visual_qa(design_path: str, implementation_path: str, model=None, prefilter: bool = True) -> Dict:
+    """
+    QA one page: the Figma screenshot against the Angular screenshot.
+    With `prefilter` (the default) the screenshots are compared locally first; an
+    unchanged page returns ACCURATE without a model call, and a changed one sends only
+    the changed regions. Returns the VisualQAResult as a dict, plus "prefilter" (the
+    local comparison report, or None) and "model_called".
+    """
+    if prefilter:
+        with span("visual_qa.prefilter") as s:
+            diff = ScreenshotDiff.from_files(design_path, implementation_path)
+            s.set(regions=len(diff.regions))
+        if diff.accurate:
+            return {"assessment": "ACCURATE", "differences": [], "prefilter": diff.report(), "model_called": False}
+        pairs = diff.crops()
+    else:
+        diff = None
+        pairs = [{"box": None, "design": encode_png(load_image(design_path)),
+                  "implementation": encode_png(load_image(implementation_path))}]
+
+    images = ""
+    for index, pair in enumerate(pairs, 1):
+        where = f"region {pair['box']} (x0, y0, x1, y1 in design pixels)" if pair["box"] else "full page"
+        images += f"""
+        Pair {index}, {where}:
+        - Figma Design: {pair['design']}
+        - Angular Implementation: {pair['implementation']}
+"""
+    cropped_note = ("The images are crops of the regions where a local pixel comparison found the "
+                    "screenshots to differ." if pairs[0]["box"] else "")
+
+    prompt = f"""
+        {read_file(QA_PROMPT_PATH)}
+
+        <<INPUTS>>
+        {cropped_note}
+        {images}
+        <<INPUTS>>
+
+        <<OUTPUT>>
+
+        Provide the assessment in the following JSON format:
+        {get_format_instructions("VisualQAResult")}
+        ONLY return the JSON object. Do not include any additional text.
+
+        <<OUTPUT>>
+"""
+    result = schema_to_dict(invoke_structured(prompt, "VisualQAResult", model, task="visual_qa"))
+    result["prefilter"] = diff.report() if diff else None
+    result["model_called"] = True
+    return result
+
+
+def visual_qa_pages(pairs: List[Tuple[str, str]], model=None, prefilter: bool = True) -> Dict:
+    """
+    QA a set of (design screenshot, implementation screenshot) pairs.
+    Returns {"results": [...], "model_calls": n, "skipped": n}.
+    """
+    results = [visual_qa(design, implementation, model=model, prefilter=prefilter) for design, implementation in pairs]
+    calls = sum(result["model_called"] for result in results)
+    return {"results": results, "model_calls": calls, "skipped": len(results) - calls}
+
+
+# === Main Execution ===
+if __name__ == '__main__':
+    # python visual_qa.py design.png angular.png [--local]
+    if "--local" in sys.argv:
+        print(json.dumps(ScreenshotDiff.from_files(sys.argv[1], sys.argv[2]).report(), indent=2))
+    else:
+        print(json.dumps(visual_qa(sys.argv[1], sys.argv[2]), indent=2))